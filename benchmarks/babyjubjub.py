@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import argparse
+import secrets
+import time
+from scripts.babyjubjub_utils.sapling_jubjub import (JUBJUB_A, JUBJUB_D, JUBJUB_GENERATOR, Fq, Point, _generator_table,
+                                                     batch_generator_mul, batch_mul, decode_points, encode_points,
+                                                     generator_mul, q_j)
+from scripts.util import append_to_csv
+
+
+def legacy_inv(a):
+    """
+    Previous FieldElement.inv: square and multiply over the 256 chars binary string of q - 2
+    """
+    ret = Fq(1)
+    for c in format(q_j - 2, '0256b'):
+        ret = ret * ret
+        if int(c):
+            ret = ret * a
+    return ret
+
+
+def legacy_add(p1, p2):
+    """
+    Previous Point.__add__: affine formulas, two field divisions per addition
+    """
+    u1, v1, u2, v2 = p1.u, p1.v, p2.u, p2.v
+    u3 = (u1*v2 + v1*u2) * legacy_inv(Fq.ONE + JUBJUB_D*u1*u2*v1*v2)
+    v3 = (v1*v2 - JUBJUB_A*u1*u2) * legacy_inv(Fq.ONE - JUBJUB_D*u1*u2*v1*v2)
+    return Point(u3, v3)
+
+
+def legacy_mul(point, s):
+    """
+    Previous Point.__mul__: affine double and add over the bits of the scalar
+    """
+    ret = Point.ZERO
+    for c in format(s.s, '0253b'):
+        ret = legacy_add(ret, ret)
+        if int(c):
+            ret = legacy_add(ret, point)
+    return ret
+
+
+def rate(function, scalars):
+    """
+    :return: tuple with the results and the operations per second
+    """
+    start = time.perf_counter()
+    results = [function(s) for s in scalars]
+    return results, len(scalars) / (time.perf_counter() - start)
+
+
+def batch_rate(function, scalars):
+    """
+    :return: tuple with the results and the operations per second of a batch API
+    """
+    start = time.perf_counter()
+    results = function(scalars)
+    return results, len(scalars) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="keypairs and Diffie-Hellman keys per second on BabyJubJub")
+    parser.add_argument("--keypairs", type=int, default=20, help="number of random private keys")
+    parser.add_argument("--legacy", type=int, default=3, help="number of private keys also run on the previous affine code")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    scalars = [Fq(secrets.randbelow(q_j)) for _ in range(args.keypairs)]
+    # a public key of another party, for the Diffie-Hellman keys
+    other = JUBJUB_GENERATOR * Fq(secrets.randbelow(q_j))
+
+    start = time.perf_counter()
+    _generator_table()
+    row = {'TABLE_TIME': time.perf_counter() - start}
+
+    legacy, row['LEGACY_KEYPAIRS_S'] = rate(lambda s: legacy_mul(JUBJUB_GENERATOR, s), scalars[:args.legacy])
+    wnaf, row['WNAF_KEYPAIRS_S'] = rate(lambda s: JUBJUB_GENERATOR * s, scalars)
+    fixed, row['FIXED_BASE_KEYPAIRS_S'] = rate(generator_mul, scalars)
+    dh, row['DH_KEYS_S'] = rate(lambda s: other * s, scalars)
+    legacy_dh = [legacy_mul(other, s) for s in scalars[:args.legacy]]
+    batch, row['BATCH_KEYPAIRS_S'] = batch_rate(batch_generator_mul, scalars)
+    # the Diffie-Hellman keys with many public keys, i.e. one for each bidder
+    batch_dh, row['BATCH_DH_KEYS_S'] = batch_rate(lambda scalars: batch_mul(fixed, scalars), scalars)
+
+    # compressed public keys, one at a time and from a contiguous buffer
+    start = time.perf_counter()
+    decoded = [Point.from_bytes(bytes(p)) for p in fixed]
+    row['DECODE_KEYS_S'] = len(fixed) / (time.perf_counter() - start)
+    buf = encode_points(fixed)
+    batch_decoded, row['BATCH_DECODE_KEYS_S'] = batch_rate(lambda _: decode_points(buf), fixed)
+
+    assert all(a == b for a, b in zip(decoded, fixed)), 'decompressed keys differ from the points'
+    assert batch_decoded == [(p.u.s, p.v.s) for p in fixed], 'batch decompressed keys differ from the points'
+    assert all(a == b for a, b in zip(legacy, wnaf)), 'wNAF multiplication differs from the affine double and add'
+    assert all(a == b for a, b in zip(wnaf, fixed)), 'fixed base multiplication differs from the wNAF multiplication'
+    assert all(a == b for a, b in zip(legacy_dh, dh)), 'Diffie-Hellman keys differ from the affine double and add'
+    assert all(a == b for a, b in zip(fixed, batch)), 'batch fixed base multiplication differs from generator_mul'
+    assert all(a == p * s for a, p, s in zip(batch_dh, fixed, scalars)), 'batch multiplication differs from Point.__mul__'
+    assert all(p.is_on_curve() for p in fixed + dh), 'point not on the curve'
+
+    print(f"keypairs per second: legacy {row['LEGACY_KEYPAIRS_S']:.1f} | wNAF {row['WNAF_KEYPAIRS_S']:.1f} | "
+          f"fixed base {row['FIXED_BASE_KEYPAIRS_S']:.1f} (table {row['TABLE_TIME'] * 1000:.0f} ms) | "
+          f"batch {row['BATCH_KEYPAIRS_S']:.1f} | DH keys per second {row['DH_KEYS_S']:.1f} | batch {row['BATCH_DH_KEYS_S']:.1f} | "
+          f"decompressed keys per second {row['DECODE_KEYS_S']:.1f} | batch {row['BATCH_DECODE_KEYS_S']:.1f}")
+    if args.csv is not None:
+        append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
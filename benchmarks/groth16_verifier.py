@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import secrets
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from scripts.proving_system.bn254 import CURVE_ORDER, G1, G2, g1_mul, g2_mul
+from scripts.proving_system.groth16_verifier import verify, verify_batch
+from scripts.util import append_to_csv
+
+
+def _g1_json(point):
+    return [str(point[0]), str(point[1]), '1']
+
+
+def _g2_json(point):
+    return [[str(point[0][0]), str(point[0][1])], [str(point[1][0]), str(point[1][1])], ['1', '0']]
+
+
+def synthetic_proofs(directory, tiles, public_signals, keys=1):
+    """
+    Write valid Groth16 proofs in the snarkjs format without a circuit, from the trapdoor of a random setup:
+    with A = s*G1, C = t*G1 and B = (alpha*beta + gamma*x + delta*t) / s * G2 the verification equation holds
+    :param directory: where to write a tile_<i> folder for each proof
+    :param tiles: number of proofs
+    :param public_signals: number of public signals of each proof
+    :param keys: number of distinct verification keys, the tiles are assigned round robin
+    :return: list of (vkey path, public path, proof path)
+    """
+    setups = []
+    for _ in range(keys):
+        alpha, beta, gamma, delta = (secrets.randbelow(CURVE_ORDER - 1) + 1 for _ in range(4))
+        ic = [secrets.randbelow(CURVE_ORDER) for _ in range(public_signals + 1)]
+        vkey = {'protocol': 'groth16', 'curve': 'bn128', 'nPublic': public_signals,
+                'vk_alpha_1': _g1_json(g1_mul(G1, alpha)), 'vk_beta_2': _g2_json(g2_mul(G2, beta)),
+                'vk_gamma_2': _g2_json(g2_mul(G2, gamma)), 'vk_delta_2': _g2_json(g2_mul(G2, delta)),
+                'IC': [_g1_json(g1_mul(G1, x)) for x in ic]}
+        setups.append((alpha, beta, gamma, delta, ic, vkey))
+
+    triples = []
+    for i in range(tiles):
+        alpha, beta, gamma, delta, ic, vkey = setups[i % keys]
+        public = [secrets.randbelow(256) if j % 2 else secrets.randbelow(CURVE_ORDER) for j in range(public_signals)]
+        x = (ic[0] + sum(signal * point for signal, point in zip(public, ic[1:]))) % CURVE_ORDER
+        s, t = secrets.randbelow(CURVE_ORDER - 1) + 1, secrets.randbelow(CURVE_ORDER)
+        b = (alpha * beta + gamma * x + delta * t) * pow(s, -1, CURVE_ORDER) % CURVE_ORDER
+        proof = {'pi_a': _g1_json(g1_mul(G1, s)), 'pi_b': _g2_json(g2_mul(G2, b)), 'pi_c': _g1_json(g1_mul(G1, t)),
+                 'protocol': 'groth16', 'curve': 'bn128'}
+
+        tile = Path(directory) / f'tile_{i}'
+        tile.mkdir(parents=True, exist_ok=True)
+        for name, content in (('vkey.json', vkey), ('public.json', [str(s) for s in public]), ('proof.json', proof)):
+            with open(tile / name, 'w') as outfile:
+                json.dump(content, outfile)
+        triples.append((tile / 'vkey.json', tile / 'public.json', tile / 'proof.json'))
+    return triples
+
+
+def tamper(public_path):
+    """
+    Copy of the public signals with the first one changed
+    """
+    with open(public_path, 'r') as public_file:
+        public = json.load(public_file)
+    public[0] = str((int(public[0]) + 1) % CURVE_ORDER)
+    tampered = Path(public_path).with_name('public_tampered.json')
+    with open(tampered, 'w') as outfile:
+        json.dump(public, outfile)
+    return tampered
+
+
+def snarkjs_verify(triple):
+    vkey_path, public_path, proof_path = triple
+    return 'OK!' in subprocess.getoutput(f'snarkjs groth16 verify {vkey_path} {public_path} {proof_path}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark of the native groth16 verifier, per tile vs batched")
+    parser.add_argument("--proof-path", type=str, help="proof directory of an image, by default synthetic proofs")
+    parser.add_argument("--tiles", type=int, default=16, help="number of synthetic proofs")
+    parser.add_argument("--public", type=int, default=256, help="public signals of each synthetic proof")
+    parser.add_argument("--keys", type=int, default=1, help="distinct verification keys of the synthetic proofs")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.proof_path is not None:
+            tiles = sorted(x for x in Path(args.proof_path).iterdir() if x.is_dir())
+            triples = [(d / 'vkey.json', d / 'public.json', d / 'proof.json') for d in tiles]
+        else:
+            triples = synthetic_proofs(tmp_dir, args.tiles, args.public, args.keys)
+        row = {'TILES': len(triples), 'SOURCE': args.proof_path or f'synthetic_{args.public}'}
+
+        start = time.perf_counter()
+        per_tile = [verify(*triple) for triple in triples]
+        row['PER_TILE_TIME'] = time.perf_counter() - start
+        # the first verification also loads the keys, that are cached for the batch
+        start = time.perf_counter()
+        batched = verify_batch(triples)
+        row['BATCH_TIME'] = time.perf_counter() - start
+        assert all(per_tile) and batched, 'valid proofs rejected by the native verifier'
+
+        # a single wrong public signal must invalidate the tile and the whole batch
+        wrong = (triples[-1][0], tamper(triples[-1][1]), triples[-1][2])
+        assert not verify(*wrong) and not verify_batch(triples[:-1] + [wrong]), 'tampered proof accepted'
+
+        if shutil.which('snarkjs') is not None:
+            start = time.perf_counter()
+            reference = [snarkjs_verify(triple) for triple in triples + [wrong]]
+            row['SNARKJS_TIME'] = time.perf_counter() - start
+            assert reference == per_tile + [False], 'native verifier and snarkjs disagree'
+            print(f'Cross-checked against snarkjs on {len(triples) + 1} proofs')
+
+        print(f"[{row['TILES']} tiles] per tile: {row['PER_TILE_TIME']:.2f} s | batched: {row['BATCH_TIME']:.2f} s"
+              + (f" | snarkjs: {row['SNARKJS_TIME']:.2f} s" if 'SNARKJS_TIME' in row else ''))
+        if args.csv is not None:
+            append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
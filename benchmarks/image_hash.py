@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import secrets
+import time
+import numpy as np
+from scripts.image_ops.image_hash import image_hash_enc, key_commitment, pack_bytes, tile_outputs
+from scripts.proving_system.ciminion import decrypt, encrypt
+from scripts.proving_system.poseidon import P, SPONGE_WIDTH, partial_rounds, poseidon, sponge_hash
+from scripts.util import append_to_csv
+
+# circomlibjs test vectors
+POSEIDON_VECTORS = {(1, 2): 7853200120776062878684798364095072458815029376092732009249414926327459813530,
+                    (1, 2, 3, 4): 18821383157269793795438455681495246036402687001665670618754263018637548127333}
+
+
+def check_circuit(input_path, public_path):
+    """
+    Compare the reference outputs with the public signals of a resize_cnft tile: the outputs come first, in the
+    order encrypted_image, tag_image, out, comm_ciminion_keys, and ImageHashEnc doesn't expose the last ciphertext
+    :return: list with the name of the mismatching outputs
+    """
+    with open(input_path, 'r') as input_file:
+        circuit_input = json.load(input_file)
+    with open(public_path, 'r') as public_file:
+        public = [int(x) for x in json.load(public_file)]
+    image = np.array(circuit_input['full_image'], dtype=np.uint8)
+    keys = [circuit_input['master_key0'], circuit_input['master_key1']]
+    hash_value, ciphertext, tag = image_hash_enc(image, keys, circuit_input['nonce'], circuit_input['IV'])
+    n = len(ciphertext)
+    expected = {'encrypted_image': (public[:n - 1], ciphertext[:n - 1]),
+                'tag_image': (public[n], tag),
+                'out': (public[n + 1], hash_value),
+                'comm_ciminion_keys': (public[n + 2:n + 4], key_commitment(keys, circuit_input['randomness'], 2))}
+    return [name for name, (actual, reference) in expected.items() if actual != reference]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="throughput of the reference Poseidon sponge and Ciminion per MB of image")
+    parser.add_argument("--size", type=int, default=128, help="side of the random image")
+    parser.add_argument("--tile", type=int, default=32, help="side of the tiles of the parallel run")
+    parser.add_argument("--workers", type=int, help="processes of the parallel run, the number of cores as default")
+    parser.add_argument("--input", type=str, help="input json of a resize_cnft tile, to cross-check with --public")
+    parser.add_argument("--public", type=str, help="public.json of the same tile")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    for inputs, expected in POSEIDON_VECTORS.items():
+        assert poseidon(list(inputs)) == expected, f'Poseidon{inputs} differs from circomlib'
+    if args.input is not None:
+        mismatches = check_circuit(args.input, args.public)
+        assert not mismatches, f'outputs different from the circuit: {mismatches}'
+        print('Reference outputs identical to the public signals of the circuit')
+
+    # constants of the sponge and of the commitment
+    start = time.perf_counter()
+    for t in (SPONGE_WIDTH + 1, 4):
+        partial_rounds(t)
+    row = {'CONSTANTS_TIME': time.perf_counter() - start}
+
+    image = np.random.default_rng(0).integers(0, 256, size=(args.size, args.size, 3), dtype=np.uint8)
+    megabytes = image.size / 2 ** 20
+    keys, nonce, iv = [secrets.randbelow(P) for _ in range(2)], secrets.randbelow(P), secrets.randbelow(P)
+    row['SIZE'] = f'{args.size}x{args.size}x3'
+
+    start = time.perf_counter()
+    elements = pack_bytes(image)
+    row['PACK_TIME_MB'] = (time.perf_counter() - start) / megabytes
+    start = time.perf_counter()
+    sponge_hash(elements)
+    row['SPONGE_TIME_MB'] = (time.perf_counter() - start) / megabytes
+    plaintext = elements + [0] if len(elements) % 2 else elements
+    start = time.perf_counter()
+    ciphertext, tag = encrypt(keys, nonce, iv, plaintext)
+    row['CIMINION_TIME_MB'] = (time.perf_counter() - start) / megabytes
+    assert decrypt(keys, nonce, iv, ciphertext, tag) == plaintext, 'Ciminion decryption differs from the plaintext'
+
+    tiles = [image[y:y + args.tile, x:x + args.tile] for y in range(0, args.size, args.tile)
+             for x in range(0, args.size, args.tile)]
+    start = time.perf_counter()
+    tile_outputs(tiles, keys, [nonce] * len(tiles), [iv] * len(tiles), secrets.randbelow(P), args.workers)
+    row['PARALLEL_TIME_MB'] = (time.perf_counter() - start) / megabytes
+
+    print(f"[{row['SIZE']}] per MB: packing {row['PACK_TIME_MB']:.3f} s | sponge {row['SPONGE_TIME_MB']:.2f} s | "
+          f"ciminion {row['CIMINION_TIME_MB']:.2f} s | {len(tiles)} tiles in parallel {row['PARALLEL_TIME_MB']:.2f} s "
+          f"(constants {row['CONSTANTS_TIME']:.2f} s)")
+    if args.csv is not None:
+        append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from scripts.util import append_to_csv, generate_random_image, write_input
+
+FIELDS = {'master_key0': '1', 'master_key1': '2', 'nonce': '3', 'IV': '4', 'randomness': '5'}
+
+
+def legacy_input(output_path, img, rsz):
+    """
+    Previous path of generate_input: every pixel becomes a python str before json.dump
+    """
+    json_input = dict(FIELDS, full_image=img.astype(str).tolist(), resize_image=rsz.astype(str).tolist())
+    with open(output_path, 'w') as outfile:
+        json.dump(json_input, outfile)
+
+
+def streaming_input(output_path, img, rsz):
+    write_input(output_path, FIELDS, {'full_image': img, 'resize_image': rsz})
+
+
+def measure(writer, output_path, img, rsz):
+    """
+    Measure wall time and peak python memory of an input writer, in two runs since tracemalloc slows the allocations
+    :return: tuple with seconds and peak KB
+    """
+    start = time.perf_counter()
+    writer(output_path, img, rsz)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    writer(output_path, img, rsz)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark of the circuit input writer, legacy json.dump vs streaming")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[64, 256, 1024], help="side of the square tiles")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            img = generate_random_image(size)
+            rsz = img[::8, ::8]
+            row = {'SIZE': f'{size}x{size}'}
+            outputs = {}
+            for name, writer in (('LEGACY', legacy_input), ('STREAMING', streaming_input)):
+                outputs[name] = os.path.join(tmp_dir, f'{name}.json')
+                row[f'{name}_TIME'], row[f'{name}_MEMORY'] = measure(writer, outputs[name], img, rsz)
+
+            # both files must describe the same signals
+            with open(outputs['LEGACY']) as legacy, open(outputs['STREAMING']) as streaming:
+                expected, actual = json.load(legacy), json.load(streaming)
+            assert all(json.dumps(expected[k]).replace('"', '') == json.dumps(actual[k]) for k in ('full_image', 'resize_image'))
+
+            row['SPEEDUP'] = row['LEGACY_TIME'] / row['STREAMING_TIME']
+            print(f"[{row['SIZE']}] legacy: {row['LEGACY_TIME']:.3f} s, {row['LEGACY_MEMORY']:.0f} KB | "
+                  f"streaming: {row['STREAMING_TIME']:.3f} s, {row['STREAMING_MEMORY']:.0f} KB | x{row['SPEEDUP']:.1f}")
+            if args.csv is not None:
+                append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
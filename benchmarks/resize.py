@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import resource
+import time
+import tracemalloc
+import numpy as np
+from scripts.image_ops.image_transformation import bilinear_resize
+from scripts.util import append_to_csv
+
+
+def random_shape(rng, max_side, divisible):
+    """
+    Random (height, width, resized height, resized width), respecting the divisibility rule of Check_Resize if divisible
+    """
+    shape = []
+    for _ in range(2):
+        if divisible:
+            step, samples = rng.integers(1, 16), rng.integers(2, 33)
+            shape.append((step * (samples - 1) + 1, samples))
+        else:
+            shape.append((rng.integers(2, max_side + 1), rng.integers(2, max_side + 1)))
+    return shape[0][0], shape[1][0], shape[0][1], shape[1][1]
+
+
+def differential_test(tf, cases, max_side, seed):
+    """
+    Compare the numpy resize with the TensorFlow one on random images, after round().astype(np.uint8) and on the
+    float32 output, for shapes that respect the divisibility rule and for any shape
+    :return: number of mismatching cases
+    """
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for case in range(cases):
+        h, w, rh, rw = random_shape(rng, max_side, divisible=case % 2 == 0)
+        image = rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+        expected = tf.compat.v1.image.resize(image, [rh, rw], align_corners=True,
+                                             method=tf.image.ResizeMethod.BILINEAR).numpy()
+        actual = bilinear_resize(image, rh, rw)
+        if not np.array_equal(expected.round().astype(np.uint8), actual.round().astype(np.uint8)) or \
+                not np.array_equal(expected, actual):
+            mismatches += 1
+            print(f'Mismatch on {h}x{w} -> {rh}x{rw}')
+    return mismatches
+
+
+def measure(resize, image, height, width, repeat):
+    """
+    :return: tuple with seconds per resize and peak python memory in KB
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        resize(image, height, width)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    resize(image, height, width)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="numpy bilinear resize vs tf.compat.v1.image.resize")
+    parser.add_argument("--cases", type=int, default=500, help="random shapes of the differential test")
+    parser.add_argument("--max-side", type=int, default=300, help="max side of the shapes that ignore the divisibility rule")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, default=1025, help="side of the image of the speed benchmark")
+    parser.add_argument("--resize", type=int, default=129, help="side of the resized image of the speed benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
+    import tensorflow as tf
+    row = {'TF_IMPORT_TIME': time.perf_counter() - start,
+           'TF_IMPORT_RSS': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before}
+
+    mismatches = differential_test(tf, args.cases, args.max_side, args.seed)
+    print(f'Differential test: {args.cases - mismatches}/{args.cases} random shapes identical to TensorFlow')
+
+    def tf_resize(image, height, width):
+        return tf.compat.v1.image.resize(image, [height, width], align_corners=True,
+                                         method=tf.image.ResizeMethod.BILINEAR).numpy()
+
+    image = np.random.default_rng(args.seed).integers(0, 256, size=(args.size, args.size, 3), dtype=np.uint8)
+    row['SIZE'] = f'{args.size}x{args.size}->{args.resize}x{args.resize}'
+    row['TF_TIME'], row['TF_MEMORY'] = measure(tf_resize, image, args.resize, args.resize, args.repeat)
+    row['NUMPY_TIME'], row['NUMPY_MEMORY'] = measure(bilinear_resize, image, args.resize, args.resize, args.repeat)
+    row['MISMATCHES'] = mismatches
+    print(f"[{row['SIZE']}] tensorflow: {row['TF_TIME'] * 1000:.2f} ms (import {row['TF_IMPORT_TIME']:.1f} s, "
+          f"+{row['TF_IMPORT_RSS'] / 1024:.0f} MB RSS) | numpy: {row['NUMPY_TIME'] * 1000:.2f} ms, "
+          f"{row['NUMPY_MEMORY']:.0f} KB")
+    if args.csv is not None:
+        append_to_csv(row, args.csv)
+    if mismatches:
+        raise ValueError(f'{mismatches} shapes differ from TensorFlow')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import argparse
+import random
+import time
+from smartcontract.scripts.secp256k1 import curve, is_on_curve, point_add, point_neg, scalar_mult
+from scripts.util import append_to_csv
+
+# k * g of secp256k1
+KNOWN_ANSWERS = {
+    1: curve.g,
+    2: (0xc6047f9441ed7d6d3045406e95c07cd85c778e4b8cef3ca7abac09b95c709ee5,
+        0x1ae168fea63dc339a3c58419466ceaeef7f632653266d0e1236431a950cfe52a),
+    3: (0xf9308a019258c31049344f85f89d5229b531c845836f99b08601f113bce036f9,
+        0x388f7b0f632de8140fe337e62a37f3566500a99934c2231b6cb9fd7584b8e672),
+    curve.n - 1: (curve.g[0], curve.p - curve.g[1]),
+    curve.n: None,
+}
+
+
+def legacy_inverse_mod(k, p):
+    """
+    Previous inverse_mod: extended Euclidean algorithm
+    """
+    if k < 0:
+        return p - legacy_inverse_mod(-k, p)
+    s, old_s = 0, 1
+    r, old_r = p, k
+    while r != 0:
+        quotient = old_r // r
+        old_r, r = r, old_r - quotient * r
+        old_s, s = s, old_s - quotient * s
+    return old_s % p
+
+
+def legacy_point_add(point1, point2):
+    """
+    Previous point_add: affine addition with an inversion, and curve checks of the inputs and of the result
+    """
+    assert is_on_curve(point1)
+    assert is_on_curve(point2)
+    if point1 is None:
+        return point2
+    if point2 is None:
+        return point1
+    x1, y1 = point1
+    x2, y2 = point2
+    if x1 == x2 and y1 != y2:
+        return None
+    if x1 == x2:
+        m = (3 * x1 * x1 + curve.a) * legacy_inverse_mod(2 * y1, curve.p)
+    else:
+        m = (y1 - y2) * legacy_inverse_mod(x1 - x2, curve.p)
+    x3 = m * m - x1 - x2
+    y3 = y1 + m * (x3 - x1)
+    result = (x3 % curve.p, -y3 % curve.p)
+    assert is_on_curve(result)
+    return result
+
+
+def legacy_scalar_mult(k, point):
+    """
+    Previous scalar_mult: affine double and add
+    """
+    assert is_on_curve(point)
+    if k % curve.n == 0 or point is None:
+        return None
+    result, addend = None, point
+    while k:
+        if k & 1:
+            result = legacy_point_add(result, addend)
+        addend = legacy_point_add(addend, addend)
+        k >>= 1
+    assert is_on_curve(result)
+    return result
+
+
+def check_known_answers(scalars):
+    """
+    Compare scalar_mult with the known multiples of g, with the previous implementation on random scalars, for the
+    base point (comb) and for another point (wNAF), and point_add with the group law
+    :return: list with the mismatching checks
+    """
+    mismatches = [f'{k} * g' for k, expected in KNOWN_ANSWERS.items() if scalar_mult(k, curve.g) != expected]
+    other = legacy_scalar_mult(scalars[0], curve.g)
+    for k in scalars:
+        if scalar_mult(k, curve.g) != legacy_scalar_mult(k, curve.g):
+            mismatches.append(f'{k:#x} * g')
+        if scalar_mult(k, other) != legacy_scalar_mult(k, other):
+            mismatches.append(f'{k:#x} * P')
+    if point_add(other, other) != legacy_point_add(other, other) or point_add(curve.g, other) != legacy_point_add(curve.g, other):
+        mismatches.append('point_add')
+    if point_add(other, point_neg(other)) is not None or scalar_mult(-1, other) != point_neg(other):
+        mismatches.append('point_neg')
+    return mismatches
+
+
+def rate(function, scalars):
+    """
+    :return: operations per second
+    """
+    start = time.perf_counter()
+    for k in scalars:
+        function(k)
+    return len(scalars) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="keypairs and Diffie-Hellman keys per second on secp256k1")
+    parser.add_argument("--keypairs", type=int, default=100, help="number of random private keys")
+    parser.add_argument("--legacy", type=int, default=20, help="number of private keys also run on the previous affine code")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    scalars = [random.randrange(1, curve.n) for _ in range(args.keypairs)]
+    # first use of the comb table
+    start = time.perf_counter()
+    scalar_mult(1, curve.g)
+    row = {'TABLE_TIME': time.perf_counter() - start}
+
+    mismatches = check_known_answers(scalars[:args.legacy])
+    assert not mismatches, f'results different from the previous implementation: {mismatches}'
+    print('Known answers and previous implementation match')
+    other = scalar_mult(scalars[0], curve.g)
+    row['LEGACY_KEYPAIRS_S'] = rate(lambda k: legacy_scalar_mult(k, curve.g), scalars[:args.legacy])
+    row['KEYPAIRS_S'] = rate(lambda k: scalar_mult(k, curve.g), scalars)
+    row['LEGACY_DH_KEYS_S'] = rate(lambda k: legacy_scalar_mult(k, other), scalars[:args.legacy])
+    row['DH_KEYS_S'] = rate(lambda k: scalar_mult(k, other), scalars)
+
+    print(f"keypairs per second: legacy {row['LEGACY_KEYPAIRS_S']:.1f} | comb {row['KEYPAIRS_S']:.1f} "
+          f"(table {row['TABLE_TIME'] * 1000:.0f} ms) | DH keys per second: legacy {row['LEGACY_DH_KEYS_S']:.1f} | "
+          f"wNAF {row['DH_KEYS_S']:.1f}")
+    if args.csv is not None:
+        append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from scripts.resource_monitor import run_stage
+from scripts.util import append_to_csv
+
+# scripts of the pipeline, run without arguments they print their usage and exit with 1
+STAGE_SCRIPTS = ['./scripts/compile_circuit.sh', './scripts/proving_system/setup_prover.sh',
+                 './scripts/proving_system/prover.sh', './scripts/proving_system/verifier.sh']
+
+
+def check_scripts(work_dir):
+    """
+    Run each script of the pipeline as a stage
+    :param work_dir: working directory of the stages, anything they write stays out of the repository
+    :return: list with the scripts that didn't start or didn't exit with their usage
+    """
+    failures = []
+    for script in STAGE_SCRIPTS:
+        try:
+            record, _ = run_stage([str(Path(script).resolve())], cwd=work_dir)
+        except OSError as error:
+            failures.append(f'{script}: {error}')
+            continue
+        if record.returncode != 1:
+            failures.append(f'{script}: exit code {record.returncode}')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="smoke check and overhead of the stage resource accounting")
+    parser.add_argument("--megabytes", type=int, default=200, help="memory allocated by the test stage")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        failures = check_scripts(work_dir)
+        assert not failures, f'stages not started: {failures}'
+        print('Every pipeline script runs as a stage')
+
+        stage = [sys.executable, '-c', f'b = bytearray({args.megabytes} * 2 ** 20); import time; time.sleep(0.5)']
+        start = time.perf_counter()
+        subprocess.run(stage, check=True, cwd=work_dir)
+        row = {'PLAIN_TIME': time.perf_counter() - start}
+        record, _ = run_stage(stage, cwd=work_dir)
+    row['MONITORED_TIME'] = record.wall_time
+    row['PEAK_RSS_MB'] = record.peak_rss / 1024
+    assert record.returncode == 0, 'the test stage failed'
+    assert row['PEAK_RSS_MB'] >= args.megabytes, f"peak RSS {row['PEAK_RSS_MB']:.0f} MB below the allocated memory"
+
+    print(f"{args.megabytes} MB stage: plain {row['PLAIN_TIME']:.3f} s | monitored {row['MONITORED_TIME']:.3f} s | "
+          f"peak RSS {row['PEAK_RSS_MB']:.0f} MB | {len(record.samples)} samples")
+    if args.csv is not None:
+        append_to_csv(row, args.csv)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import argparse
+import statistics
+import subprocess
+import sys
+from scripts.util import append_to_csv
+
+# cold start budget in ms of each CLI: the import of its module, heavy dependencies must load lazily
+BUDGETS = {
+    'image_verify': 150,
+    'contract_management': 150,
+    'scripts.image_ops.image_decrypt.image_decrypt': 250,
+    'image_proof': 400,
+}
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter with -X importtime
+    :return: tuple with the cumulative ms of the module and a dictionary from each imported module to its self ms
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        raise ValueError(f'Unable to import {module}:\n{process.stderr.splitlines()[-1]}')
+    cumulative, self_times = None, {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(self_us) / 1000
+        if name.strip() == module and not name[1:].startswith(' '):
+            cumulative = int(cumulative_us) / 1000
+    return cumulative, self_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold start of the CLIs, fails when one goes over its budget")
+    parser.add_argument("--cli", type=str, nargs='+', default=list(BUDGETS), help="modules of the CLIs to measure")
+    parser.add_argument("--budget", type=str, nargs='+', default=[], help="override a budget, as module=ms")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each CLI, the median is compared")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports printed for each CLI")
+    parser.add_argument("--csv", type=str, help="append the results to this csv file")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS)
+    budgets.update({module: float(ms) for module, ms in (budget.split('=') for budget in args.budget)})
+
+    over_budget = []
+    for module in args.cli:
+        try:
+            runs = [import_times(module) for _ in range(args.repeat)]
+        except ValueError as error:
+            print(f'[{module}] {error}')
+            over_budget.append(module)
+            continue
+        median = statistics.median(cumulative for cumulative, _ in runs)
+        heaviest = sorted(runs[-1][1].items(), key=lambda item: item[1], reverse=True)[:args.top]
+        budget = budgets.get(module)
+        status = 'ok' if budget is None or median <= budget else 'OVER BUDGET'
+        print(f'[{module}] {median:.1f} ms (budget {budget} ms) {status}')
+        print('    ' + ', '.join(f'{name} {ms:.1f} ms' for name, ms in heaviest))
+        if status != 'ok':
+            over_budget.append(module)
+        if args.csv is not None:
+            append_to_csv({'CLI': module, 'IMPORT_TIME': median, 'BUDGET': budget}, args.csv)
+
+    if over_budget:
+        print(f'Over budget: {over_budget}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
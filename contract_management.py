@@ -2,7 +2,7 @@
 
 import argparse
 from sha3 import keccak_256 # https://stackoverflow.com/questions/46279121/how-can-i-find-keccak-256-hash-in-python con Crypto.hash
-from scripts.babyjubjub_utils.sapling_jubjub import Fq, Point
+from scripts.babyjubjub_utils.sapling_jubjub import Fq, Point, generator_mul
 from scripts.util import generate_random_field_element
 
 
@@ -24,10 +24,9 @@ def generate_keypair():
     Arguments are taken from https://eips.ethereum.org/EIPS/eip-2494
     :return: list with the public and private key
     """
-    G = Point(Fq(995203441582195749578291179787384436505546430278305826713579947235728471134), 
-              Fq(5472060717959818805561601436314318772137091100104008585924551046643952123905))
     private_key = generate_random_field_element()
-    public_key = G * Fq(private_key)
+    # multiple of the generator G of the EIP, from its precomputed table
+    public_key = generator_mul(Fq(private_key))
     if not public_key.is_on_curve():
         raise ValueError("Public key is not on curve")
     
@@ -3,17 +3,29 @@
 import argparse
 import json
 import os
-from scripts.image_ops.image_splitter import max_pixels_per_frame, slice_image
-from scripts.image_ops.image_transformation import extract_image_vector, resize_image
+import re
+from pathlib import Path
+from scripts.image_ops.image_splitter import iter_tiles, max_pixels_per_frame, tile_bounds, tile_resize_shape
+from scripts.image_ops.image_transformation import image_shape, resize_image
+from scripts.image_ops.tile_planner import plan_grid, plan_tiles, print_plan
+from scripts.proving_system.batch_queue import BATCH_DIR, BatchQueue, run_queue
+from scripts.proving_system.cost_model import fit_cost_model, load_cost_model, predict_costs, select_ptau_power
+from scripts.proving_system.proof_store import load_manifest, restore_proof, store_proof, tile_key
+from scripts.proving_system.scheduler import prove_tiles
 from scripts.util import append_to_csv, generate_circuit, generate_input, generate_parameters, measure_command, parse_operation, upload_proof, extract_contraints
 
 CIRCUIT_NAME = 'image'
+CIRCUIT_TEMPLATE = 'resize_cnft'
 JSON_INPUT = 'input.json'
+POT = '/home/marco/Documents/Ricerca/privacy-nft/Benchmark_Circuits/powersoftau/28pot.ptau'
+PROOF_PARAMS = './input/params.json'
+# parameters of each image of a batch, they are kept out of the proof folders
+BATCH_PARAMS_DIR = './input/batch_params'
 
 def test_circuit(circuit_name, input_path, pot_path, input_array=[],verbose=True):
     r1cs_path = 'output/compiled_circuit/compiled_{}/{}.r1cs'
     print(f'./scripts/compile_circuit.sh ./circuits/benchmark/{circuit_name}.circom {input_path}')
-    t_c,m_c = measure_command(f'./scripts/compile_circuit.sh ./circuits/benchmark/{circuit_name}.circom {input_path} ', time=True, memory=False)
+    t_c,m_c = measure_command(f'./scripts/compile_circuit.sh ./circuits/benchmark/{circuit_name}.circom {input_path} ', time=True, memory=True)
     print(f'./scripts/compile_circuit.sh ./circuits/benchmark/{circuit_name}.circom {input_path}')
     if verbose:
         print(f'[{circuit_name}] Compile Circuit: {t_c} seconds, {m_c} KB')
@@ -22,14 +34,14 @@ def test_circuit(circuit_name, input_path, pot_path, input_array=[],verbose=True
         print(f'[{circuit_name}] Constraints: {constraints}')
         
     print(f'./scripts/proving_system/setup_prover.sh {circuit_name} {pot_path}')
-    t_sp,m_sp = measure_command(f'./scripts/proving_system/setup_prover.sh {circuit_name} {pot_path}',time=True, memory=False)
+    t_sp,m_sp = measure_command(f'./scripts/proving_system/setup_prover.sh {circuit_name} {pot_path}',time=True, memory=True)
     if verbose:
         print(f'[{circuit_name}] Setup Prover: {t_sp} seconds, {m_sp} KB')
     print(f'./scripts/proving_system/prover.sh {circuit_name} ')
-    t_p,m_p = measure_command(f'./scripts/proving_system/prover.sh {circuit_name} ', time=True, memory=False)
+    t_p,m_p = measure_command(f'./scripts/proving_system/prover.sh {circuit_name} ', time=True, memory=True)
     if verbose:
         print(f'[{circuit_name}] Prover: {t_p} seconds, {m_p} KB')
-    t_v,m_v = measure_command(f'./scripts/proving_system/verifier.sh {circuit_name}', time=True, memory=False)
+    t_v,m_v = measure_command(f'./scripts/proving_system/verifier.sh {circuit_name}', time=True, memory=True)
     if verbose:
         print(f'[{circuit_name}] Verifier: {t_v} seconds, {m_v} KB')
     
@@ -48,17 +60,219 @@ def test_circuit(circuit_name, input_path, pot_path, input_array=[],verbose=True
 
 
 
-if __name__ == '__main__':
-    POT = '/home/marco/Documents/Ricerca/privacy-nft/Benchmark_Circuits/powersoftau/28pot.ptau'
-    # HFULL, WFULL, HRESIZE, WRESIZE = (160+1),(90+1),(80+1),(45+1) 
-    HFULL, WFULL, HRESIZE, WRESIZE = (64),(64),(8),(8) 
-    PROOF_PARAMS = './input/params.json'
-    generate_parameters(PROOF_PARAMS)
+def layout_image(args, image_path, infos, frame_pixel):
+    """
+    Choose the tiles of an image and describe them for the verification and the decryption
+    :param args: parsed command line arguments
+    :param image_path: path to the image
+    :param infos: height and width of the resized image
+    :param frame_pixel: number of pixels to divide in the greatest dimension of the frame
+    :return: tuple with the shape of the image, the frame pixels, the plan (None for the default tiles) and the image info
+    """
+    shape = image_shape(image_path)
+    if frame_pixel is None and args.max_constraints is not None:
+        step = ((shape[0] - 1) // (infos['height'] - 1), (shape[1] - 1) // (infos['width'] - 1))
+        _, frame_pixel = max_pixels_per_frame(image_path, max_constraints=args.max_constraints, template=CIRCUIT_TEMPLATE,
+                                              step=step)
 
-    with open(PROOF_PARAMS, 'r') as file:
+    plan = None
+    if args.grid:
+        tile_shape = None if frame_pixel is None or args.max_constraints is not None else (frame_pixel, frame_pixel)
+        plan = plan_grid(image_path, tile_shape, (infos['height'], infos['width']), args.max_constraints, template=CIRCUIT_TEMPLATE)
+        print_plan(plan)
+    elif args.plan:
+        plan = plan_tiles(image_path, frame_pixel, (infos['height'], infos['width']), template=CIRCUIT_TEMPLATE)
+        print_plan(plan)
+
+    if args.grid:
+        image_info = {'name': os.path.basename(image_path).split('.')[0],
+                      'tiles': len(plan['tiles']) - 1,
+                      'tiles_size': [[h, w] for _, _, h, w in plan['tiles']],
+                      'tiles_offset': [[y, x] for y, x, _, _ in plan['tiles']],
+                      'grid': plan['grid'],
+                      'resize_step': [(shape[0] - 1) // (infos['height'] - 1), (shape[1] - 1) // (infos['width'] - 1)]}
+    else:
+        dimension, bounds = tile_bounds(shape[0], shape[1], frame_pixel, plan=plan)
+        tiles_size = [[length + padding, shape[1]] if dimension == 0 else [shape[0], length + padding]
+                      for _, length, padding in bounds]
+        image_info = {'name': os.path.basename(image_path).split('.')[0],
+                      'tiles': len(bounds) - 1,
+                      'tiles_size': tiles_size}
+        if plan is not None:
+            image_info['tiles_padding'] = [padding for _, _, padding in plan['tiles']]
+            image_info['tiles_dimension'] = plan['dimension']
+    return shape, frame_pixel, plan, image_info
+
+
+def prove_image(args, proof_input):
+    """
+    Slice the image in tiles and prove all of them with the parallel scheduler
+    :param args: parsed command line arguments
+    :param proof_input: dictionary with commitment randomness and ciminion keys
+    :return: list with the measures of each tile
+    """
+    op, infos = parse_operation(args.operation)
+    if op != 'resize':
+        raise ValueError(f'Operation {op} is not implemented')
+
+    if args.save_image is not None:
+        resize_image(args.image, infos['height'], infos['width'], args.save_image)
+
+    shape, frame_pixel, plan, image_info = layout_image(args, args.image, infos, args.frame_pixel)
+    with open('./output/image_info.json', 'w') as outfile:
+        json.dump(image_info, outfile)
+
+    # proofs are stored by the hash of the pixels of each tile, its circuit and the parameters,
+    # with --incremental only the tiles whose inputs changed are proved again
+    manifest = load_manifest(image_info['name'])
+    contract = CIRCUIT_NAME if args.generate_contract else None
+    keys, reused = {}, []
+
+    def jobs():
+        # the tiles are extracted one at a time, a tile is proved while the input of the next one is written
+        for i, tile in enumerate(iter_tiles(args.image, frame_pixel, args.save_tiles, plan=plan)):
+            h, w, _ = tile.shape
+            rh, rw = tile_resize_shape(tile.shape, shape, (infos['height'], infos['width']))
+            generate_circuit({'HFULL': h, 'WFULL': w, 'HRESIZE': rh, 'WRESIZE': rw}, f'./circuits/base/{CIRCUIT_TEMPLATE}.circom', id=f'tile_{i}')
+            circuit = f'{CIRCUIT_TEMPLATE}_tile_{i}'
+            keys[i] = tile_key(tile, [h, w, rh, rw], f'./circuits/benchmark/{circuit}.circom', proof_input)
+            if args.incremental and restore_proof(image_info['name'], i, keys[i], circuit, manifest,
+                                                  None if contract is None else f'{contract}_{i}'):
+                reused.append(i)
+                print(f'[{circuit}] Unchanged tile, reused proof {keys[i][:12]}')
+                continue
+            input_file = f'./input/input_tile_{i}.json'
+            generate_input(input_file, h, w, rh, rw, proof_input['commitment_randomness'], proof_input['ciminion_keys'], image=tile)
+            yield {'circuit': circuit, 'template': CIRCUIT_TEMPLATE, 'input': input_file, 'shape': [h, w, rh, rw], 'tile': i}
+
+    def on_proved(i, job, tile_contract):
+        store_proof(image_info['name'], i, keys[i], job['circuit'], manifest, tile_contract)
+
+    memory_budget = None if args.memory_budget is None else args.memory_budget * 1024
+    csv_path = './output/benchmark_tiles.csv' if args.generate_csv else None
+    measures = prove_tiles(jobs(), args.pot, workers=args.workers, memory_budget=memory_budget, csv_path=csv_path,
+                           contract=contract, on_proved=on_proved)
+    if args.incremental:
+        print(f'Proved {len(measures)} tiles, reused {len(reused)} unchanged tiles')
+    return measures
+
+
+
+def batch_images(source, operation, frame_pixel=None):
+    """
+    List the images of a batch: the png images of a folder, or a json manifest with a list of image paths or of
+    objects {"image": path, "operation": ..., "frame_pixel": ...}, relative paths start from the manifest folder
+    :param source: path to the folder or to the manifest
+    :param operation: operation of the images without one
+    :param frame_pixel: frame pixels of the images without one
+    :return: list of (name, path, operation, frame_pixel)
+    """
+    source = Path(source)
+    if source.is_dir():
+        entries = [{'image': str(path)} for path in sorted(source.glob('*.png'))]
+    else:
+        with open(source, 'r') as json_file:
+            entries = [{'image': entry} if isinstance(entry, str) else entry for entry in json.load(json_file)]
+    images = []
+    for entry in entries:
+        path = source.parent / entry['image'] if not source.is_dir() and not os.path.isabs(entry['image']) else Path(entry['image'])
+        # the name is used in the name of the circuits and of the contracts
+        name = re.sub(r'\W', '_', path.name.split('.')[0])
+        images.append((name, str(path), entry.get('operation', operation), entry.get('frame_pixel', frame_pixel)))
+    return images
+
+
+def batch_input(args, task):
+    """
+    Input stage of the batch queue: the parameters of the image (kept if already generated), the image info and the
+    low resolution image in the folder of the image, the circuit and the input of each tile
+    :param args: parsed command line arguments
+    :param task: image task of the queue, with image, path, operation and frame_pixel
+    :return: list with the job of each tile
+    """
+    op, infos = parse_operation(task['operation'])
+    if op != 'resize':
+        raise ValueError(f'Operation {op} is not implemented')
+    name = task['image']
+    params_path = Path(BATCH_PARAMS_DIR) / f'{name}.json'
+    if not params_path.is_file():
+        os.makedirs(BATCH_PARAMS_DIR, exist_ok=True)
+        generate_parameters(params_path)
+    with open(params_path, 'r') as file:
         proof_input = json.load(file)
 
-    circuit_name = f'resize_cnft'
+    shape, frame_pixel, plan, image_info = layout_image(args, task['path'], infos, task['frame_pixel'])
+    image_info['name'] = name
+    image_dir = Path(BATCH_DIR) / name
+    os.makedirs(image_dir, exist_ok=True)
+    with open(image_dir / 'image_info.json', 'w') as outfile:
+        json.dump(image_info, outfile)
+    resize_image(task['path'], infos['height'], infos['width'], str(image_dir / 'low_image.png'))
+
+    jobs = []
+    os.makedirs('./input/batch', exist_ok=True)
+    for i, tile in enumerate(iter_tiles(task['path'], frame_pixel, plan=plan)):
+        h, w, _ = tile.shape
+        rh, rw = tile_resize_shape(tile.shape, shape, (infos['height'], infos['width']))
+        generate_circuit({'HFULL': h, 'WFULL': w, 'HRESIZE': rh, 'WRESIZE': rw}, f'./circuits/base/{CIRCUIT_TEMPLATE}.circom', id=f'{name}_tile_{i}')
+        input_file = f'./input/batch/{name}_tile_{i}.json'
+        generate_input(input_file, h, w, rh, rw, proof_input['commitment_randomness'], proof_input['ciminion_keys'], image=tile)
+        jobs.append({'circuit': f'{CIRCUIT_TEMPLATE}_{name}_tile_{i}', 'template': CIRCUIT_TEMPLATE, 'input': input_file, 'shape': [h, w, rh, rw]})
+    return jobs
+
+
+def prove_batch(args):
+    """
+    Enqueue the images of --batch in the durable queue and run it, an interrupted batch resumes from the last
+    completed stage of each tile
+    :param args: parsed command line arguments
+    """
+    queue = BatchQueue()
+    try:
+        for name, path, operation, frame_pixel in batch_images(args.batch, args.operation, args.frame_pixel):
+            queue.add_image(name, path, operation, frame_pixel)
+        queue.recover(retry_failed=args.retry_failed)
+        memory_budget = None if args.memory_budget is None else args.memory_budget * 1024
+        contract = CIRCUIT_NAME if args.generate_contract else None
+        status = run_queue(queue, lambda task: batch_input(args, task), args.pot, cpu_workers=args.workers,
+                           memory_workers=args.memory_workers, memory_budget=memory_budget, contract=contract)
+    finally:
+        queue.close()
+    print(f'Batch: {status}')
+
+def check_frame(args):
+    """
+    Print the greatest frame whose predicted constraints stay under --max-constraints, with its predicted
+    time and memory for each stage and the powers of tau it needs
+    :param args: parsed command line arguments
+    """
+    _, infos = parse_operation(args.operation)
+    shape = image_shape(args.image)
+    step = ((shape[0] - 1) // (infos['height'] - 1), (shape[1] - 1) // (infos['width'] - 1))
+    dimension, pixels = max_pixels_per_frame(args.image, max_constraints=args.max_constraints, template=CIRCUIT_TEMPLATE,
+                                             step=step)
+    print((dimension, pixels))
+
+    height, width, _ = shape
+    frame = (pixels, width, 3) if dimension == 0 else (height, pixels, 3)
+    try:
+        h_resize, w_resize = tile_resize_shape(frame, shape, (infos['height'], infos['width']))
+    except ValueError:
+        h_resize, w_resize = frame[:2]
+    costs = predict_costs(CIRCUIT_TEMPLATE, frame[0], frame[1], h_resize, w_resize, load_cost_model())
+    print(f'Frame {frame[0]}x{frame[1]}: {costs}')
+    print(f'Powers of tau: 2^{select_ptau_power(costs["CONSTRAINTS"])}')
+
+
+def benchmark_circuit(proof_input):
+    """
+    Benchmark the circuit template on a random image of fixed dimensions
+    :param proof_input: dictionary with commitment randomness and ciminion keys
+    """
+    # HFULL, WFULL, HRESIZE, WRESIZE = (160+1),(90+1),(80+1),(45+1) 
+    HFULL, WFULL, HRESIZE, WRESIZE = (64),(64),(8),(8) 
+
+    circuit_name = CIRCUIT_TEMPLATE
 
     generate_circuit({'HFULL': HFULL, 'WFULL':WFULL, 'HRESIZE':HRESIZE, 'WRESIZE' : WRESIZE }, f'./circuits/base/{circuit_name}.circom',id=HFULL*WFULL)
     input_file = f'./input/input_{HFULL}_{WFULL}.json'
@@ -67,4 +281,60 @@ if __name__ == '__main__':
     measures = test_circuit(f'{circuit_name}_{HFULL*WFULL}', input_file, POT, [HFULL, WFULL, HRESIZE, WRESIZE])
     measures['DIM_FULL'] = f'{int(HFULL)}*{int(WFULL)}*3' 
     measures['DIM_RES'] = f'{int(HRESIZE)}*{int(WRESIZE)}*3' 
-    append_to_csv(measures,'./benchmark_circuits_resize_final.csv')
\ No newline at end of file
+    append_to_csv(measures,'./benchmark_circuits_resize_final.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="prove the resize of an image, tile by tile")
+    parser.add_argument("--image", type=str, help="path to the png image to prove, if missing a random image is benchmarked")
+    parser.add_argument("--operation", type=str, default="resize_8x8", help="operation to prove, i.e. resize_22x22")
+    parser.add_argument("--frame-pixel", type=int, help="number of pixels to divide in the greatest dimension of the frame")
+    parser.add_argument("--check-pixel", type=int, help="print the maximum number of pixels per frame that respects this threshold and exit")
+    parser.add_argument("--max-constraints", type=int, help="size the frames so that the constraints predicted by the cost model stay under this value")
+    parser.add_argument("--fit-cost-model", type=str, nargs='+', help="fit the cost model from these csv files (produced by --generate-csv) and exit")
+    parser.add_argument("--plan", action="store_true", help="choose the tiles that minimize compile, setup and prove cost, and print the plan")
+    parser.add_argument("--grid", action="store_true", help="tile the image in a grid of rows x cols, with square tiles of --frame-pixel pixels or the greatest tiles under --max-constraints")
+    parser.add_argument("--save-tiles", type=str, help="path where to save the tiles")
+    parser.add_argument("--save-image", type=str, help="path where to save the low resolution image")
+    parser.add_argument("--generate-csv", action="store_true", help="append the time and memory of each tile to a csv file")
+    parser.add_argument("--generate-contract", action="store_true", help="generate the solidity verifier of each tile")
+    parser.add_argument("--pot", type=str, default=POT, help="path to the powers of tau file")
+    parser.add_argument("--workers", type=int, help="number of tiles proved concurrently, the number of cores as default")
+    parser.add_argument("--batch", type=str, help="folder of png images or json manifest of images to prove through the resumable batch queue")
+    parser.add_argument("--memory-workers", type=int, help="with --batch, number of memory bound stages (compile, setup, prove) at the same time, a quarter of the cores as default")
+    parser.add_argument("--retry-failed", action="store_true", help="with --batch, retry the images and tiles that failed in a previous run")
+    parser.add_argument("--incremental", action="store_true", help="keep the existing parameters and prove only the tiles that changed since the last proof of the image")
+    parser.add_argument("--memory-budget", type=int, help="RAM budget in MB for concurrent stages, 80%% of the available memory as default")
+    args = parser.parse_args()
+
+    if args.fit_cost_model is not None:
+        model = fit_cost_model(args.fit_cost_model)
+        print(json.dumps(model, indent=2))
+        return
+
+    if args.check_pixel is not None:
+        print(max_pixels_per_frame(args.image, args.check_pixel))
+        return
+
+    if args.batch is not None:
+        prove_batch(args)
+        return
+
+    if args.max_constraints is not None and args.frame_pixel is None and not args.plan and not args.grid:
+        check_frame(args)
+        return
+
+    if not (args.incremental and os.path.isfile(PROOF_PARAMS)):
+        generate_parameters(PROOF_PARAMS)
+
+    with open(PROOF_PARAMS, 'r') as file:
+        proof_input = json.load(file)
+
+    if args.image is None:
+        benchmark_circuit(proof_input)
+    else:
+        prove_image(args, proof_input)
+
+
+if __name__ == '__main__':
+    main()
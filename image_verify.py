@@ -6,8 +6,10 @@ from scripts.util import verify_proof
 def main():
     parser = argparse.ArgumentParser(description="proof verifier from IPFS")
     parser.add_argument("--proof-path",type=str,help="path dir, where there is the proof")
+    parser.add_argument("--workers",type=int,help="number of concurrent verifier workers, default one per core")
+    parser.add_argument("--native",action='store_true',help="verify in python with one batched pairing check, without snarkjs")
     args = parser.parse_args()
-    verify_proof(args.proof_path)
+    verify_proof(args.proof_path, args.workers, args.native)
     
 
 if __name__ == '__main__':
@@ -4,8 +4,9 @@
 #check if passed the correct number of arguments, one that is circom file name
 
 if [ $# -lt 2 ]; then
-    echo "Usage: $0 <circom file name> <input file name> [--nodejs]"
+    echo "Usage: $0 <circom file name> <input file name> [--nodejs] [--skip-compile]"
     echo "[--nodejs] is optional, if not passed, the script will use Cpp to generate the witness"
+    echo "[--skip-compile] is optional, if passed the circuit already compiled (i.e. restored from the cache) is only used to generate the witness"
     exit 1
 fi
 
@@ -28,7 +29,9 @@ mkdir -p output/compiled_circuit/compiled_${CIRCOM_FILENAME} > /dev/null
 
 # Compile the circuits in the circuit directory
 
-circom ${1} --r1cs --c --output output/compiled_circuit/compiled_${CIRCOM_FILENAME} -l ${CIRCOMLIB_PATH} 
+if [[ $* != *--skip-compile* ]]; then
+    circom ${1} --r1cs --c --output output/compiled_circuit/compiled_${CIRCOM_FILENAME} -l ${CIRCOMLIB_PATH} 
+fi
 
 # Generate the witness
 if [[ $* == *--nodejs* ]]; then
@@ -38,7 +41,9 @@ if [[ $* == *--nodejs* ]]; then
 else
     echo "Compiling with [Cpp] ..."
     cd output/compiled_circuit/compiled_${CIRCOM_FILENAME}/${CIRCOM_FILENAME}_cpp
-    make
+    if [[ $* != *--skip-compile* ]]; then
+        make
+    fi
     
     ./${CIRCOM_FILENAME} ../../../../${2} ../${CIRCOM_FILENAME}_witness.wtns
 fi
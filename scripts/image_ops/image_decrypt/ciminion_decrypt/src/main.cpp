@@ -43,6 +43,44 @@ void initialize_round_constants(Vec<T> &rc, T (*convert)(const uint8_t *, long),
 }
 
 
+/**
+ * Read tag, ciphertexts, nonce and IV from the binary sidecar of public.json (public.bin): a header of 160 bytes
+ * with magic "PSIG", version, count, size and mtime of the json and the (start, length) of each section, followed
+ * by one 32 bytes little endian limb for each public signal.
+ *
+ * @return 0 on success, 1 on error.
+ */
+int read_public_bin(const char *path, long unsigned int ciphertext_len, ZZ_p &tag, Vec<ZZ_p> &cipher_text, ZZ_p &nonce, ZZ_p &IV)
+{
+	const long HEADER_SIZE = 160;
+	const long LIMB_SIZE = 32;
+	std::ifstream file(path, std::ios::binary);
+	if (!file.is_open()) {
+		std::cerr << "Unable to open the public signals file." << std::endl;
+		return 1;
+	}
+	std::vector<uint8_t> data((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+	if ((long) data.size() < HEADER_SIZE || std::string(data.begin(), data.begin() + 4) != "PSIG") {
+		std::cerr << "The public signals file is not correctly formatted" << std::endl;
+		return 1;
+	}
+	uint64_t count = 0;
+	for (int i = 7; i >= 0; i--)
+		count = (count << 8) | data[8 + i];
+	if ((uint64_t) data.size() != HEADER_SIZE + count * LIMB_SIZE || count < ciphertext_len + 5) {
+		std::cerr << "Ciphertext len is greater than the number of ciphertexts in the public signals file" << std::endl;
+		return 1;
+	}
+
+	const uint8_t *limbs = data.data() + HEADER_SIZE;
+	tag = ZZ_p_from_bytes(limbs + 2 * LIMB_SIZE, LIMB_SIZE);
+	for (long unsigned int i = 0; i < ciphertext_len; i++)
+		cipher_text[i] = ZZ_p_from_bytes(limbs + (i + 3) * LIMB_SIZE, LIMB_SIZE);
+	nonce = ZZ_p_from_bytes(limbs + (count - 2) * LIMB_SIZE, LIMB_SIZE);
+	IV = ZZ_p_from_bytes(limbs + (count - 1) * LIMB_SIZE, LIMB_SIZE);
+	return 0;
+}
+
 
 
 // make >/dev/null  && make install >/dev/null  && ./bin/main ./example.json 2 2134 3423412331 && make clean >/dev/null
@@ -59,16 +97,11 @@ int main(int argc, char* argv[]) {
 
     // Verify that the user specified the path to the JSON file
     if (argc < 5) {
-        std::cerr << "It must be specified only the json file path, ciphertext len, master_key[0] and master_key[1]" << std::endl;
-        return 1;
-    }
-
-	// Open the file containing the JSON
-    std::ifstream file(argv[1]);
-    if (!file.is_open()) {
-        std::cerr << "Unable to open json file." << std::endl;
+        std::cerr << "It must be specified only the json (or public.bin) file path, ciphertext len, master_key[0] and master_key[1] [--raw]" << std::endl;
         return 1;
     }
+	// with --raw the plaintext is written to stdout as bytes instead of a printed list
+	bool raw = argc > 5 && std::string(argv[5]) == "--raw";
 
 	// Setup the ciphertexts from the JSON file
 	long unsigned int ciphertext_len = std::atoi(argv[2]);
@@ -89,6 +122,21 @@ int main(int argc, char* argv[]) {
 
 
 
+	// Read the binary sidecar of the public signals, without parsing decimal strings
+	std::string path(argv[1]);
+	if (path.size() > 4 && path.compare(path.size() - 4, 4, ".bin") == 0) {
+		if (read_public_bin(argv[1], ciphertext_len, tag, cipher_text, nonce, IV) != 0)
+			return 1;
+	}
+	else {
+
+	// Open the file containing the JSON
+    std::ifstream file(argv[1]);
+    if (!file.is_open()) {
+        std::cerr << "Unable to open json file." << std::endl;
+        return 1;
+    }
+
 	// Parse the JSON file
 	std::string jsonStr((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
     try {
@@ -119,6 +167,7 @@ int main(int argc, char* argv[]) {
         std::cerr << "Error during json parsing " << e.what() << std::endl;
         return 1;
     }
+	}
 
 	// Generate round constants
 	Vec<ZZ_p> rcs_n;
@@ -141,6 +190,21 @@ int main(int argc, char* argv[]) {
 
 	Vec<ZZ_p> Mseq_dec = ciminion.decrypt(MK, nonce, cipher_text, tag);
 	
+	// Write the decrypted message as raw bytes, one byte for each plaintext
+	if (raw) {
+		std::vector<uint8_t> bytes(ciphertext_len);
+		for (long unsigned int i = 0; i < ciphertext_len; i++) {
+			long value = conv<long>(rep(Mseq_dec[i]));
+			if (value < 0 || value > 255) {
+				std::cerr << "Plaintext " << i << " is not a byte, use the printed output." << std::endl;
+				return 1;
+			}
+			bytes[i] = (uint8_t) value;
+		}
+		fwrite(bytes.data(), 1, bytes.size(), stdout);
+		return 0;
+	}
+
 	// Print the decrypted message as a vector
 	cout << "[";
 	for (long unsigned int i = 0; i < ciphertext_len - 1; i++)
@@ -23,4 +23,5 @@ const long DIGESTSIZE = NUMBER_OF_ROUND_CONSTANTS_N*ELEMENTSIZE_IN_BYTES;
 
 ZZ_p ZZ_p_from_bytes(const uint8_t *, long);
 template <class T> void initialize_round_constants(Vec<T> &, T (*convert)(const uint8_t *, long), const string &);
+int read_public_bin(const char *, long unsigned int, ZZ_p &, Vec<ZZ_p> &, ZZ_p &, ZZ_p &);
 void test_ZZ_p();
@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import reduce
 import json
+import os
 import subprocess
 from pathlib import Path
-import cv2
-from alive_progress import alive_bar
 import numpy as np
+from scripts.proving_system.public_signals import public_bin
 
+# decrypted images bigger than this (in bytes) are written to a memory mapped .npy instead of being kept in RAM
+MEMMAP_BYTES = 1 << 30
 
-def get_encrypted_image(root_dir,base_name = 'image'):
+
+def get_encrypted_image(root_dir,base_name = 'image', tiles_size = None, tiles = None):
     """
     Get the encrypted image from the snarkjs_circuit folder, it's necessary that tiles must be written in folder as [proof_name]_0 ... [proof_name]_n.
     :param root_dir: The root directory of the project that contains snarkjs_circuit folder.
     :param proof_name: The name of the proof.
+    :param tiles_size: Size of each tile, if given the public signals are returned as binary sidecars (public.bin), converted only once.
+    :param tiles: If not None, indices of the only tiles to return.
     :return: List with the paths to the encrypted tile image.
     """
     public_json_paths = []
@@ -22,9 +28,14 @@ def get_encrypted_image(root_dir,base_name = 'image'):
     for proof_dir in Path(root_dir).iterdir():
 
         if proof_dir.is_dir() and proof_dir.name.startswith(base_name):
+            if tiles is not None and int(proof_dir.name.split('_')[1]) not in tiles:
+                continue
             public_json_file = proof_dir / "public.json"
 
-            if public_json_file.is_file():
+            if public_json_file.is_file() and tiles_size is not None:
+                tile_idx = int(proof_dir.name.split('_')[1])
+                public_json_paths.append(public_bin(public_json_file, tiles_size[tile_idx]).resolve())
+            elif public_json_file.is_file():
                 public_json_paths.append(public_json_file.resolve())
 
     return sorted(public_json_paths, key=lambda x: int(str(x).split(f'{base_name}_')[1][0]))
@@ -37,8 +48,10 @@ def compile_ciminion_dec(base_path = './scripts/image_ops/image_decrypt/ciminion
     :param base_path: The base path of the ciminion_decrypt program.
     :return: Path to the ciminion_decrypt program.
     """
-    if (Path(base_path).parent / 'bin/ciminion_decrypt').is_file():
-        return (Path(base_path).parent / 'bin/ciminion_decrypt').resolve()
+    binary = Path(base_path).parent / 'bin/ciminion_decrypt'
+    # rebuild when the sources are newer than the binary, i.e. to read the public.bin sidecars
+    if binary.is_file() and all(source.stat().st_mtime <= binary.stat().st_mtime for source in Path(base_path).iterdir()):
+        return binary.resolve()
     
     
     subprocess.run(['g++', '-I./include', '-Wall', '-g', '-O2', '-std=c++11', '-pthread', '-march=native', '-c', 'main.cpp', '-o', 'main.o'], cwd=base_path)
@@ -51,35 +64,93 @@ def compile_ciminion_dec(base_path = './scripts/image_ops/image_decrypt/ciminion
     return (Path(base_path).parent / 'bin/ciminion_decrypt').resolve()
 
 
-def decrypt_tile(enc_tile_path,ciphertext_shape, master_keys):
+def decrypt_tile(enc_tile_path,ciphertext_shape, master_keys, dec_path = None):
     """
-    Decrypt a tile image using ciminion_decrypt program
+    Decrypt a tile image using ciminion_decrypt program, the plaintext is read as raw bytes from its stdout
     :param enc_tile_path: Path to the encrypted tile image.
     :param ciphertext_shape: Shape of the ciphertext.
     :param master_keys: List with the two master keys, for ciminion authencated encryption scheme.
+    :param dec_path: Path to the ciminion_decrypt program, compiled if None.
     :return: Decrypted tile image.
     """
-    dec_path = compile_ciminion_dec()
+    dec_path = compile_ciminion_dec() if dec_path is None else dec_path
+    length = reduce(lambda x,y:x*y,ciphertext_shape)
+
+    process = subprocess.run([str(dec_path), str(enc_tile_path), str(length), str(master_keys[0]), str(master_keys[1]), '--raw'],
+                             capture_output=True)
+    if process.returncode != 0 or len(process.stdout) != length:
+        raise ValueError(f'Unable to decrypt {enc_tile_path}: {process.stderr.decode().strip()}')
+    return np.frombuffer(process.stdout, dtype=np.uint8).reshape(ciphertext_shape)
 
-    image_string = subprocess.getoutput(f'{dec_path} {enc_tile_path} {reduce(lambda x,y:x*y,ciphertext_shape)} {master_keys[0]} {master_keys[1]}')
-    image = image_string.replace("[", "").replace("]", "").replace("'", "")
-    
-    image = np.array(image.split(',')).astype(int)
-    image =  np.reshape(image, ciphertext_shape)
-    return image
 
-def decrypt_image(parameters_path, full_shape, output_path = './output/decrypted_image.png',proof_path = './proofs'):
+def tile_regions(image_info, full_shape):
+    """
+    Region of the image covered by each tile, without the padding added by the tiling plan
+    :param image_info: The image_info.json of the proof.
+    :param full_shape: Shape of the full image.
+    :return: List with (y, x, height, width) of each tile.
+    """
+    if 'tiles_offset' in image_info:
+        # grid tiles are placed at their offset, the pixels shared by overlapping tiles are the same
+        return [(y, x, h, w) for (y, x), (h, w) in zip(image_info['tiles_offset'], image_info['tiles_size'])]
+
+    dim = image_info.get('tiles_dimension', full_shape.index(max((full_shape[0],full_shape[1]))))
+    tiles_padding = image_info.get('tiles_padding', [0]*(image_info['tiles']+1))
+    regions, start = [], 0
+    for (height, width), padding in zip(image_info['tiles_size'], tiles_padding):
+        if dim == 0:
+            regions.append((start, 0, height - padding, width))
+            start += height - padding
+        else:
+            regions.append((0, start, height, width - padding))
+            start += width - padding
+    return regions
+
+
+def parse_roi(roi, full_shape):
+    """
+    Parse a region of interest in the form y0:y1,x0:x1, a missing bound is the border of the image
+    :param roi: String with the region of interest, i.e. 0:64,128:
+    :param full_shape: Shape of the full image.
+    :return: Tuple (y0, y1, x0, x1), clipped to the image.
+    """
+    try:
+        bounds = [bound.split(':') for bound in roi.split(',')]
+        (y0, y1), (x0, x1) = [(int(start or 0), int(stop) if stop else size) for (start, stop), size in zip(bounds, full_shape[:2])]
+    except ValueError:
+        raise ValueError(f"The region of interest must be in the form y0:y1,x0:x1, not {roi}")
+    y0, y1, x0, x1 = max(y0, 0), min(y1, full_shape[0]), max(x0, 0), min(x1, full_shape[1])
+    if y0 >= y1 or x0 >= x1:
+        raise ValueError(f"The region of interest {roi} is empty")
+    return y0, y1, x0, x1
+
+
+def roi_tiles(regions, roi):
+    """
+    Tiles that intersect the region of interest
+    :param regions: Region of each tile, as returned by tile_regions.
+    :param roi: Tuple (y0, y1, x0, x1).
+    :return: List with the indices of the tiles.
     """
-    Decrypt an image using ciminion_decrypt program
+    y0, y1, x0, x1 = roi
+    return [i for i, (y, x, height, width) in enumerate(regions) if y < y1 and y + height > y0 and x < x1 and x + width > x0]
+
+
+def decrypt_image(parameters_path, full_shape, output_path = './output/decrypted_image.png',proof_path = './proofs', workers = None, roi = None):
+    """
+    Decrypt an image using ciminion_decrypt program, the tiles are decrypted concurrently and written straight into
+    the decrypted image (a memory mapped .npy next to output_path for images bigger than MEMMAP_BYTES).
+    With a region of interest only the tiles that intersect it are decrypted, and the image is cropped to it.
     :param parameters_path: Path to the parameters.json file, that contains at least the master keys.
     :param full_shape: Shape of the full image.
     :param output_path: Path to the output file.
-    :param base_name: The name of the proof.
-    :return: Decrypted image.
+    :param proof_path: The proof folder, for all the tiles.
+    :param workers: Number of tiles decrypted at the same time, the number of cores as default.
+    :param roi: If not None, region of interest as a tuple (y0, y1, x0, x1) or a string y0:y1,x0:x1.
+    :return: Decrypted image (or region of interest).
     """
-    json_tiles = get_encrypted_image(proof_path,base_name = 'tile')
-    
-
+    import cv2
+    from alive_progress import alive_bar
     image_info_file = Path(proof_path) / 'image_info.json'
     if image_info_file.exists():
         with open(image_info_file, 'r') as json_file:
@@ -87,28 +158,38 @@ def decrypt_image(parameters_path, full_shape, output_path = './output/decrypted
     else:
         raise ValueError("The file image_info.json doesn't exist in the proof directory")
     
-    
+    regions = tile_regions(image_info, full_shape)
+    roi = (0, full_shape[0], 0, full_shape[1]) if roi is None else parse_roi(roi, full_shape) if isinstance(roi, str) else roi
+    y0, y1, x0, x1 = roi
+    json_tiles = get_encrypted_image(proof_path,base_name = 'tile',tiles_size = image_info['tiles_size'], tiles = set(roi_tiles(regions, roi)))
 
-    decrypted_tiles = [0]*(image_info['tiles']+1)
-    dim = full_shape.index(max((full_shape[0],full_shape[1])))
-    
     with open(parameters_path, 'r') as file:
         parameters = json.load(file)
 
-    with alive_bar(len(json_tiles),bar = 'smooth',spinner = 'waves2') as bar:
-        for tile in json_tiles:
-            tile_idx = int(tile.parent.name.split('_')[1])
-            height = image_info['tiles_size'][tile_idx][0]
-            width = image_info['tiles_size'][tile_idx][1]
-            
-            shape = (height,width,full_shape[2])
-            decrypted_tiles[tile_idx] = (decrypt_tile(tile, shape, parameters['ciminion_keys']))
+    shape = (y1 - y0, x1 - x0, full_shape[2])
+    if output_path is not None and reduce(lambda x,y:x*y,shape) > MEMMAP_BYTES:
+        image = np.lib.format.open_memmap(Path(output_path).with_suffix('.npy'), mode='w+', dtype=np.uint8, shape=shape)
+    else:
+        image = np.zeros(shape, dtype=np.uint8)
+    # compiled once, before the tiles run concurrently
+    dec_path = compile_ciminion_dec()
 
+    def decrypt(tile):
+        tile_idx = int(tile.parent.name.split('_')[1])
+        height, width = image_info['tiles_size'][tile_idx]
+        y, x, region_height, region_width = regions[tile_idx]
+        decrypted_tile = decrypt_tile(tile, (height,width,full_shape[2]), parameters['ciminion_keys'], dec_path)
+        # intersection of the tile with the region of interest
+        top, bottom = max(y, y0), min(y + region_height, y1)
+        left, right = max(x, x0), min(x + region_width, x1)
+        image[top - y0:bottom - y0, left - x0:right - x0] = decrypted_tile[top - y:bottom - y, left - x:right - x]
+
+    workers = min(workers or os.cpu_count(), len(json_tiles)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor, alive_bar(len(json_tiles),bar = 'smooth',spinner = 'waves2') as bar:
+        for future in as_completed([executor.submit(decrypt, tile) for tile in json_tiles]):
+            future.result()
             bar()
 
-    
-    image = np.concatenate(decrypted_tiles, axis=dim)
-
     if output_path is not None:
         cv2.imwrite(output_path, image)
     return image
@@ -120,10 +201,12 @@ if __name__ == '__main__':
     parser.add_argument('--full-shape', type=str, help='Shape of the full image in the form i.e 64x64x3.')
     parser.add_argument('--output-path', type=str, default='./output/decrypted_image.png', help='Path to the output file.')
     parser.add_argument('--proof-path', type=str, help='The proof folder, for all the tiles.')
+    parser.add_argument('--workers', type=int, help='Number of tiles decrypted at the same time, the number of cores as default.')
+    parser.add_argument('--roi', type=str, help='Decrypt only the region of interest y0:y1,x0:x1, i.e. 0:64,128:256.')
     
     args = parser.parse_args()
     full_shape = tuple(map(int, args.full_shape.split('x')))
-    decrypt_image(args.parameters, full_shape, args.output_path, args.proof_path)
+    decrypt_image(args.parameters, full_shape, args.output_path, args.proof_path, args.workers, args.roi)
 
 
-# ./scripts/image_ops/image_decrypt/image_decrypt.py --parameters ./input/parameters.json --full-shape 301x208x3 --proof-path ... 
\ No newline at end of file
+# python -m scripts.image_ops.image_decrypt.image_decrypt --parameters ./input/parameters.json --full-shape 301x208x3 --proof-path ... 
\ No newline at end of file
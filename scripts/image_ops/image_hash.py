@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Reference of the public outputs of the circuit template resize_cnft without circom: the 28 bytes packing and the
+# Poseidon sponge of ImageHashEnc (image_hash.circom), the Ciminion encryption of the packed image and the Poseidon
+# commitment of the keys
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+from scripts.proving_system.ciminion import encrypt
+from scripts.proving_system.poseidon import poseidon, sponge_hash
+
+BYTES_PER_ELEMENT = 28
+PADDING_BYTE = 7
+
+TileOutputs = namedtuple('TileOutputs', ['hash', 'ciphertext', 'tag', 'commitment'])
+
+
+def pack_bytes(image):
+    """
+    Pack the bytes of an image in field elements as ImageHashEnc: row major order, 28 big endian bytes per element,
+    the last element padded with a 7 followed by zeros
+    :param image: uint8 array of shape (height, width, 3)
+    :return: list of field elements
+    """
+    data = np.ascontiguousarray(image, dtype=np.uint8).ravel()
+    padding = -data.size % BYTES_PER_ELEMENT
+    if padding:
+        pad = np.zeros(padding, dtype=np.uint8)
+        pad[0] = PADDING_BYTE
+        data = np.concatenate((data, pad))
+    data = data.tobytes()
+    return [int.from_bytes(data[i:i + BYTES_PER_ELEMENT], 'big') for i in range(0, len(data), BYTES_PER_ELEMENT)]
+
+
+def key_commitment(master_keys, randomness, n_outs=1):
+    """
+    Poseidon commitment of the Ciminion keys, Poseidon(master_key0, master_key1, randomness)
+    :param n_outs: 1 for the commitment of mint_token (PoseidonT4.hash), 2 for comm_ciminion_keys of the circuit
+    :return: the commitment, or the list of the n_outs commitments
+    """
+    return poseidon([int(master_keys[0]), int(master_keys[1]), int(randomness)], n_outs)
+
+
+def image_hash_enc(image, master_keys, nonce, iv):
+    """
+    Outputs of ByteHashEnc on an image: the sponge hash of the packed image and its Ciminion encryption.
+    The packed elements are encrypted with an additional zero when odd. ImageHashEnc exposes all the ciphertexts
+    but the last one.
+    :param image: uint8 array of shape (height, width, 3)
+    :param master_keys: the two master keys
+    :param nonce: nonce
+    :param iv: IV
+    :return: tuple with the hash, the ciphertext of each packed element and the tag
+    """
+    elements = pack_bytes(image)
+    plaintext = elements + [0] if len(elements) % 2 else elements
+    ciphertext, tag = encrypt([int(key) for key in master_keys], int(nonce), int(iv), plaintext)
+    return sponge_hash(elements), ciphertext[:len(elements)], tag
+
+
+def tile_outputs(tiles, master_keys, nonces, ivs, randomness, workers=None):
+    """
+    Outputs of resize_cnft for each tile, the tiles are computed in parallel processes
+    :param tiles: list of uint8 arrays of shape (height, width, 3)
+    :param master_keys: the two master keys
+    :param nonces: nonce of each tile
+    :param ivs: IV of each tile
+    :param randomness: randomness of the commitment of the keys
+    :param workers: number of processes, the number of cores as default
+    :return: list of TileOutputs, in the same order of tiles
+    """
+    commitment = key_commitment(master_keys, randomness, n_outs=2)
+    workers = min(workers or os.cpu_count(), len(tiles)) or 1
+    if workers == 1:
+        results = map(image_hash_enc, tiles, [master_keys] * len(tiles), nonces, ivs)
+        return [TileOutputs(*result, commitment) for result in results]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(image_hash_enc, tiles, [master_keys] * len(tiles), nonces, ivs)
+        return [TileOutputs(*result, commitment) for result in results]
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -2,56 +2,186 @@
 
 import os
 import cv2
-from scripts.image_ops.image_transformation import extract_image_vector
+import numpy as np
+from scripts.image_ops.image_transformation import image_cache, image_shape, npy_layout
+from scripts.proving_system.cost_model import load_cost_model, predict_constraints
 
+# rows of the image read at a time when extracting a tile of columns
+BAND_ROWS = 256
 
 
-def slice_image(image_path, pixels, save_tiles=None, dimension=None):
+def tile_bounds(height, width, pixels=None, dimension=None, plan=None):
     """
-    Slice an image into tiles of size pixels x pixels
-    :param image_path: path to image
+    Boundaries of the tiles along the sliced dimension, frames of pixels pixels and the remainder or the tiles of a plan
+    :param height: height of the image
+    :param width: width of the image
     :param pixels: number of pixels to divide in the gratest dimension of the frame
-    :param save_tiles: path to save tiles
     :param dimension: 0 for height, 1 for width
-    :return: dictionary with tiles, rows, cols, height, width
+    :param plan: plan returned by tile_planner.plan_tiles, if given it overrides pixels and dimension
+    :return: sliced dimension and list of (start, length, padding) of each tile
     """
-    image = cv2.imread(image_path)
-    height, width, _ = image.shape
+    if plan is not None:
+        return plan['dimension'], [tuple(tile) for tile in plan['tiles']]
 
     dimension = (height,width).index(max(height, width)) if dimension is None else dimension
-
     dimension_max = height if dimension == 0 else width
 
     num_frame = dimension_max // pixels
     remaining_pixels = dimension_max % pixels
 
-    frame_list = [image[(i * pixels):((i + 1) * pixels), :] if dimension == 0 else 
-                  image[:, (i * pixels):((i + 1) * pixels)] 
-                  for i in range(num_frame)]
-    
+    bounds = [(i * pixels, pixels, 0) for i in range(num_frame)]
     if remaining_pixels > 0:
-        last_frame = image[(num_frame * pixels):(num_frame * pixels + remaining_pixels), :] if dimension == 0 else \
-                     image[:, (num_frame * pixels):(num_frame * pixels + remaining_pixels)]
-        frame_list.append(last_frame)
-    
+        bounds.append((num_frame * pixels, remaining_pixels, 0))
+    return dimension, bounds
+
+
+def grid_axis(length, tile, step=1):
+    """
+    Tiles of a grid along one axis, each one of at most tile pixels that respects the resize divisibility rule.
+    With a sampling step greater than one the tiles start on sampled pixels and overlap by one pixel, so that the
+    resized tiles are exactly the pieces of the resized image
+    :param length: pixels of the image along the axis
+    :param tile: maximum pixels of a tile along the axis
+    :param step: sampling step of the resize along the axis
+    :return: list of (start, length) of each tile
+    """
+    if step == 1:
+        bounds = [(start, min(tile, length - start)) for start in range(0, length, tile)]
+        # a tile of one pixel cannot be resized, it takes one pixel from the previous tile
+        if len(bounds) > 1 and bounds[-1][1] == 1:
+            if tile < 3:
+                raise ValueError(f'{length} pixels cannot be split in tiles of {tile} pixels')
+            bounds[-2:] = [(bounds[-2][0], tile - 1), (bounds[-1][0] - 1, 2)]
+        return bounds
+    span = (tile - 1) // step * step
+    if span == 0:
+        raise ValueError(f'A tile of {tile} pixels cannot be resized with step {step}')
+    return [(start, min(span + 1, length - start)) for start in range(0, length - 1, span)]
+
+
+def iter_tiles(image_path, pixels=None, save_tiles=None, dimension=None, plan=None, band_rows=BAND_ROWS):
+    """
+    Yield the tiles of an image one at a time, in the same order and with the same shapes of slice_image.
+    The tiles are read from the decoded cache of the image (see image_cache): a tile of rows is read directly, a tile
+    of columns is gathered band_rows rows at a time, so the memory stays around one tile and one band
+    :param image_path: path to image
+    :param pixels: number of pixels to divide in the gratest dimension of the frame
+    :param save_tiles: path to save tiles
+    :param dimension: 0 for height, 1 for width
+    :param plan: plan returned by tile_planner.plan_tiles or plan_grid, if given it overrides pixels and dimension
+    :param band_rows: rows read at a time for the tiles of columns
+    :return: generator of tiles
+    """
     if save_tiles is not None:
         os.makedirs(save_tiles, exist_ok=True)
-        [cv2.imwrite(os.path.join(save_tiles, f'tile_{i}.png'), frame_list[i]) for i in range(len(frame_list))]
-    
-    return frame_list
 
+    with open(image_cache(image_path), 'rb') as image_file:
+        (height, width, channels), offset = npy_layout(image_file)
+        row_bytes = width * channels
+
+        if plan is not None and plan['strategy'] == 'grid':
+            # tiles in row major order, the rows of a band are read once for all its tiles
+            band, band_bounds = None, None
+            for i, (y, x, h, w) in enumerate(plan['tiles']):
+                if band_bounds != (y, h):
+                    band, band_bounds = np.empty((h, width, channels), dtype=np.uint8), (y, h)
+                    image_file.seek(offset + y * row_bytes)
+                    image_file.readinto(band)
+                frame = np.ascontiguousarray(band[:, x:x + w])
+                if save_tiles is not None:
+                    cv2.imwrite(os.path.join(save_tiles, f'tile_{i}.png'), frame)
+                yield frame
+            return
+
+        dimension, bounds = tile_bounds(height, width, pixels, dimension, plan)
+
+        for i, (start, length, padding) in enumerate(bounds):
+            if dimension == 0:
+                frame = np.zeros((length + padding, width, channels), dtype=np.uint8)
+                image_file.seek(offset + start * row_bytes)
+                image_file.readinto(frame[:length])
+            else:
+                frame = np.zeros((height, length + padding, channels), dtype=np.uint8)
+                band = np.empty((min(band_rows, height), width, channels), dtype=np.uint8)
+                for row in range(0, height, band_rows):
+                    rows = min(band_rows, height - row)
+                    image_file.seek(offset + row * row_bytes)
+                    image_file.readinto(band[:rows])
+                    frame[row:row + rows, :length] = band[:rows, start:start + length]
+            if save_tiles is not None:
+                cv2.imwrite(os.path.join(save_tiles, f'tile_{i}.png'), frame)
+            yield frame
 
-def max_pixels_per_frame(image_path, threshold=128**2*3):
+
+def slice_image(image_path, pixels, save_tiles=None, dimension=None, plan=None):
+    """
+    Slice an image into tiles of size pixels x pixels
+    :param image_path: path to image
+    :param pixels: number of pixels to divide in the gratest dimension of the frame
+    :param save_tiles: path to save tiles
+    :param dimension: 0 for height, 1 for width
+    :param plan: plan returned by tile_planner.plan_tiles or plan_grid, if given it overrides pixels and dimension
+    :return: list of tiles
+    """
+    return list(iter_tiles(image_path, pixels, save_tiles, dimension, plan))
+
+
+def max_pixels_per_frame(image_path, threshold=128**2*3, max_constraints=None, template='resize_cnft', step=(1, 1)):
     """
     Calculate the maximum number of pixels per frame
     :param image_path: path to image
     :param threshold: threshold to consider the image as a frame
+    :param max_constraints: if not None, the threshold is replaced by the constraints predicted by the cost model
+    :param template: circuit template used by the cost model
+    :param step: sampling step of the resize along height and width, the frame must be of step*k+1 pixels, k >= 1
     :return: dimension to divide the frame and the number of pixels to divide the frame
     """
-    image = extract_image_vector(image_path)
-    height, width, _ = image.shape
-    
-    return (height, width).index(max(height, width)), threshold // ((min(height, width))*3)
+    height, width, _ = image_shape(image_path)
+    dimension = (height, width).index(max(height, width))
+
+    if max_constraints is None:
+        return dimension, threshold // ((min(height, width))*3)
+
+    model = load_cost_model()
+    other = min(height, width)
+    s = step[dimension]
+
+    def constraints(pixels):
+        shape = (pixels, other) if dimension == 0 else (other, pixels)
+        return predict_constraints(template, shape[0], shape[1], (shape[0] - 1) // step[0] + 1,
+                                   (shape[1] - 1) // step[1] + 1, model)
+
+    # binary search on the number of steps, the constraints grow with the size of the frame
+    low, high = 0, (max(height, width) - 1) // s
+    while low < high:
+        middle = (low + high + 1) // 2
+        if constraints(middle * s + 1) <= max_constraints:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        raise ValueError(f'No frame of at least {s + 1} pixels fits in {max_constraints} constraints')
+    return dimension, low * s + 1
+
+
+def tile_resize_shape(tile_shape, image_shape, resize_shape):
+    """
+    Calculate the low resolution shape of a tile, keeping the same sampling step of the resize of the whole image
+    :param tile_shape: shape of the tile (height, width, ...)
+    :param image_shape: shape of the whole image (height, width, ...)
+    :param resize_shape: shape of the resized whole image (height, width)
+    :return: tuple with height and width of the resized tile
+    """
+    resized = []
+    for tile_dim, image_dim, resize_dim in zip(tile_shape[:2], image_shape[:2], resize_shape[:2]):
+        if (image_dim - 1) % (resize_dim - 1) != 0:
+            raise ValueError(f"The image cannot be resized to {resize_shape[0]}x{resize_shape[1]}")
+        step = (image_dim - 1) // (resize_dim - 1)
+        if (tile_dim - 1) % step != 0:
+            raise ValueError(f"A tile of {tile_dim} pixels cannot be resized with step {step}, "
+                             f"the tile must be of {step}*k+1 pixels")
+        resized.append((tile_dim - 1) // step + 1)
+    return tuple(resized)
 
 
 
@@ -1,16 +1,85 @@
 #!/usr/bin/env python3
 
+import hashlib
+import os
 from pathlib import Path
+import struct
 import cv2
 import numpy as np
-import os
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
-import tensorflow as tf
+
+IMAGE_CACHE_DIR = 'output/image_cache'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
 
 def extract_image_vector(image_path):
     return cv2.imread(image_path,cv2.IMREAD_COLOR)
 
 
+def image_cache(image_path, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Decode the image only once into a .npy cache, addressed by path, size and modification time of the image
+    :param image_path: path to the image, a .npy image is its own cache
+    :param cache_dir: folder of the decoded images
+    :return: path to the .npy of shape (height, width, 3) in BGR order, as extract_image_vector
+    """
+    if str(image_path).endswith('.npy'):
+        return Path(image_path)
+    stat = os.stat(image_path)
+    key = hashlib.sha256(f'{Path(image_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+    cache_path = Path(cache_dir) / f'{Path(image_path).stem}_{key}.npy'
+    if not cache_path.is_file():
+        image = extract_image_vector(str(image_path))
+        if image is None:
+            raise ValueError(f'Unable to decode the image {image_path}')
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as outfile:
+            np.save(outfile, image)
+        del image
+        os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def load_image(image_path, cache_dir=IMAGE_CACHE_DIR):
+    """
+    Memory map the decoded image from its cache, slicing it reads only the rows and columns that are used
+    :param image_path: path to the image
+    :param cache_dir: folder of the decoded images
+    :return: read only array of shape (height, width, 3) in BGR order
+    """
+    return np.load(image_cache(image_path, cache_dir), mmap_mode='r')
+
+
+def npy_layout(npy_file):
+    """
+    Read the header of an open .npy file
+    :return: shape of the array and offset of its data
+    """
+    version = np.lib.format.read_magic(npy_file)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npy_file)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npy_file)
+    if fortran_order or dtype != np.uint8:
+        raise ValueError('The image cache must be a C ordered uint8 array')
+    return shape, npy_file.tell()
+
+
+def image_shape(image_path):
+    """
+    Shape of the decoded image without decoding it, from the IHDR chunk of a png or the header of a .npy
+    :param image_path: path to the image
+    :return: tuple (height, width, 3)
+    """
+    if str(image_path).endswith('.npy'):
+        return np.load(image_path, mmap_mode='r').shape
+    with open(image_path, 'rb') as image_file:
+        header = image_file.read(24)
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', header[16:24])
+        return (height, width, 3)
+    return load_image(image_path).shape
+
+
 def crop_image(image_path, height, width, x=0, y=0,output_path=None):
     """
     Crop an image to the given dimensions.
@@ -33,6 +102,40 @@ def crop_image(image_path, height, width, x=0, y=0,output_path=None):
     return output_path,image
 
 
+def _interpolation_weights(out_size, in_size):
+    """
+    Source rows (or columns) and weights of the bilinear resize with aligned corners, in float32 as TensorFlow
+    :return: lower indices, upper indices and float32 weights of the upper ones
+    """
+    scale = np.float32(in_size - 1) / np.float32(out_size - 1) if out_size > 1 else np.float32(0)
+    position = np.arange(out_size, dtype=np.float32) * scale
+    lower = np.floor(position)
+    upper = np.minimum(np.ceil(position).astype(np.int64), in_size - 1)
+    return lower.astype(np.int64), upper, position - lower
+
+
+def bilinear_resize(image, height, width):
+    """
+    Bilinear resize with aligned corners, identical to tf.compat.v1.image.resize(..., align_corners=True)
+    :param image: image as an array of shape (h, w, channels)
+    :param height: height of the resized image
+    :param width: width of the resized image
+    :return: float32 resized image
+    """
+    original_height, original_width = image.shape[:2]
+    # with the divisibility rule every sample falls on a pixel, the resize is a strided slice
+    if height > 1 and width > 1 and (original_height - 1) % (height - 1) == 0 and (original_width - 1) % (width - 1) == 0:
+        return image[::(original_height - 1) // (height - 1), ::(original_width - 1) // (width - 1)].astype(np.float32)
+
+    top, bottom, y_lerp = _interpolation_weights(height, original_height)
+    left, right, x_lerp = _interpolation_weights(width, original_width)
+    x_lerp = x_lerp[None, :, None]
+    rows_top, rows_bottom = image[top].astype(np.float32), image[bottom].astype(np.float32)
+    top_row = rows_top[:, left] + (rows_top[:, right] - rows_top[:, left]) * x_lerp
+    bottom_row = rows_bottom[:, left] + (rows_bottom[:, right] - rows_bottom[:, left]) * x_lerp
+    return top_row + (bottom_row - top_row) * y_lerp[:, None, None]
+
+
 def resize_image(image_path, height, width, output_path=None):
     """
     Resize an image to the given dimensions.
@@ -43,7 +146,7 @@ def resize_image(image_path, height, width, output_path=None):
     :return: Path to the resized image and vectorized image.
     """
 
-    image = extract_image_vector(image_path)
+    image = load_image(image_path)
     original_height, original_width, _ = image.shape
 
     if (original_height-1) % (height-1) != 0 or (original_width-1) % (width-1) != 0:
@@ -52,19 +155,7 @@ def resize_image(image_path, height, width, output_path=None):
         raise ValueError(f"The image cannot be resized to the given dimensions.\n The height must be one of this numbers: {divisors_h}\
                           \n The width must be one of this numbers: {divisors_w}")
 
-    image = (
-        (
-            tf.compat.v1.image.resize(
-                image,
-                [height, width],
-                align_corners=True,
-                method=tf.image.ResizeMethod.BILINEAR,
-            )
-        )
-        .numpy()
-        .round()
-        .astype(np.uint8)
-    )
+    image = bilinear_resize(image, height, width).round().astype(np.uint8)
     if output_path is not None:
         cv2.imwrite(output_path, image)
     return output_path,image
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+from scripts.image_ops.image_splitter import grid_axis, max_pixels_per_frame
+from scripts.image_ops.image_transformation import image_shape
+from scripts.proving_system.cost_model import load_cost_model, planner_cost_fn, predict_constraints
+
+# Relative weight of each stage per pixel of the tile, compile and setup are paid once for each distinct shape
+COMPILE_WEIGHT = 1.0
+SETUP_WEIGHT = 2.0
+PROVE_WEIGHT = 1.0
+
+
+def pixel_cost(shape):
+    """
+    Relative cost of the stages of a tile, proportional to its number of pixels
+    :param shape: shape of the tile (height, width)
+    :return: dictionary with compile, setup and prove cost
+    """
+    pixels = shape[0] * shape[1]
+    return {'compile': COMPILE_WEIGHT * pixels, 'setup': SETUP_WEIGHT * pixels, 'prove': PROVE_WEIGHT * pixels}
+
+
+def plan_cost(shapes, cost_fn=pixel_cost):
+    """
+    Cost of a plan, compile and setup are paid once for each distinct shape while prove is paid for each tile
+    :param shapes: list with the shape (height, width) of each tile
+    :param cost_fn: function from a shape to a dictionary with compile, setup and prove cost
+    :return: total cost of the plan
+    """
+    costs = {shape: cost_fn(shape) for shape in set(shapes)}
+    return sum(c['compile'] + c['setup'] for c in costs.values()) + sum(costs[shape]['prove'] for shape in shapes)
+
+
+def _make_plan(strategy, dimension, lengths, other, padded_length=None):
+    """
+    Build a plan from the lengths of the tiles along the sliced dimension
+    """
+    tiles = []
+    start = 0
+    for length in lengths:
+        padding = 0 if padded_length is None else padded_length - length
+        tiles.append([start, length, padding])
+        start += length
+    shapes = [(l + p, other) if dimension == 0 else (other, l + p) for _, l, p in tiles]
+    return {'strategy': strategy, 'dimension': dimension, 'tiles': tiles, 'shapes': shapes}
+
+
+def candidate_plans(height, width, pixels, step=(1, 1), dimension=None):
+    """
+    Enumerate the tilings of an image along one dimension, where every tile respects the resize divisibility rule
+    (a tile of l pixels can be resized with step s only if (l - 1) % s == 0)
+    :param height: height of the image
+    :param width: width of the image
+    :param pixels: maximum number of pixels of a tile along the sliced dimension
+    :param step: sampling step of the resize along height and width
+    :param dimension: 0 for height, 1 for width, the greatest one as default
+    :return: list of plans
+    """
+    dimension = (height, width).index(max(height, width)) if dimension is None else dimension
+    length, other = (height, width) if dimension == 0 else (width, height)
+    s = step[dimension]
+    plans = []
+
+    # slice_image: full frames and a remainder frame, a remainder of one pixel cannot be resized and goes in the
+    # previous frame (with a step greater than one the merged frame breaks the divisibility rule and the plan is skipped)
+    lengths = [pixels] * (length // pixels) + ([length % pixels] if length % pixels else [])
+    if len(lengths) > 1 and lengths[-1] == 1:
+        lengths[-2:] = [lengths[-2] + lengths[-1]]
+    if all((l - 1) % s == 0 for l in lengths):
+        plans.append(_make_plan('slice', dimension, lengths, other))
+
+    # tiles of 1 + s*k pixels, as equal as possible: at most two distinct shapes
+    standard = ((pixels - 1) // s) * s + 1
+    min_tiles = -(-length // standard)
+    for n in range(min_tiles, min_tiles + s + 1):
+        if n > length or (length - n) % s != 0:
+            continue
+        q, r = divmod((length - n) // s, n)
+        if q == 0:
+            continue
+        lengths = [1 + s * (q + 1)] * r + [1 + s * q] * (n - r)
+        if max(lengths) <= pixels:
+            plans.append(_make_plan('equal', dimension, lengths, other))
+            break
+
+    # tiles of the standard shape, the last one padded: a single distinct shape
+    lengths = [standard] * (length // standard) + ([length % standard] if length % standard else [])
+    plans.append(_make_plan('padded', dimension, lengths, other, padded_length=standard))
+
+    return plans
+
+
+def valid_plan(plan, step):
+    """
+    Check that every tile of a plan (with its padding) has s*k+1 pixels along the sliced dimension, with k >= 1
+    :param plan: plan returned by candidate_plans
+    :param step: sampling step of the resize along height and width
+    :return: True if every tile can be resized
+    """
+    s = step[plan['dimension']]
+    return all(l + p > s and (l + p - 1) % s == 0 for _, l, p in plan['tiles'])
+
+
+def plan_tiles(image_path, pixels=None, resize_shape=None, dimension=None, cost_fn=None, template='resize_cnft'):
+    """
+    Choose the tiling of the image that minimizes the cost of compile, setup and prove
+    :param image_path: path to image
+    :param pixels: maximum number of pixels of a tile along the sliced dimension, from max_pixels_per_frame as default
+    :param resize_shape: shape (height, width) of the resized whole image, used for the divisibility rule
+    :param dimension: 0 for height, 1 for width, the greatest one as default
+    :param cost_fn: function from a shape to a dictionary with compile, setup and prove cost, the cost model as default
+    :param template: circuit template used by the cost model
+    :return: the cheapest plan, with its cost
+    """
+    height, width, _ = image_shape(image_path)
+    if pixels is None:
+        dimension, pixels = max_pixels_per_frame(image_path)
+
+    step = (1, 1)
+    if resize_shape is not None:
+        if (height - 1) % (resize_shape[0] - 1) != 0 or (width - 1) % (resize_shape[1] - 1) != 0:
+            raise ValueError(f"The image cannot be resized to {resize_shape[0]}x{resize_shape[1]}")
+        step = ((height - 1) // (resize_shape[0] - 1), (width - 1) // (resize_shape[1] - 1))
+
+    if cost_fn is None:
+        cost_fn = planner_cost_fn(template, step, load_cost_model())
+
+    plans = [plan for plan in candidate_plans(height, width, pixels, step, dimension) if valid_plan(plan, step)]
+    if not plans:
+        raise ValueError(f'No tiling of frames of at most {pixels} pixels can be resized with step {step}')
+    for plan in plans:
+        plan['cost'] = plan_cost(plan['shapes'], cost_fn)
+    return min(plans, key=lambda plan: plan['cost'])
+
+
+def plan_grid(image_path, tile_shape=None, resize_shape=None, max_constraints=None, cost_fn=None, template='resize_cnft'):
+    """
+    Tile the image in a grid of rows x cols, so that the size of the tiles doesn't depend on the aspect ratio
+    :param image_path: path to image
+    :param tile_shape: maximum (height, width) of a tile
+    :param resize_shape: shape (height, width) of the resized whole image, used for the divisibility rule
+    :param max_constraints: if tile_shape is None, the greatest tiles (with the same resized height and width)
+                            whose predicted constraints stay under this value
+    :param cost_fn: function from a shape to a dictionary with compile, setup and prove cost, the cost model as default
+    :param template: circuit template used by the cost model
+    :return: plan with the tiles as [y, x, height, width] in row major order, the grid [rows, cols] and its cost
+    """
+    height, width, _ = image_shape(image_path)
+    step = (1, 1)
+    if resize_shape is not None:
+        if (height - 1) % (resize_shape[0] - 1) != 0 or (width - 1) % (resize_shape[1] - 1) != 0:
+            raise ValueError(f"The image cannot be resized to {resize_shape[0]}x{resize_shape[1]}")
+        step = ((height - 1) // (resize_shape[0] - 1), (width - 1) // (resize_shape[1] - 1))
+
+    model = load_cost_model()
+    if tile_shape is None:
+        if max_constraints is None:
+            raise ValueError('The grid needs the shape of the tiles or the maximum constraints of a tile')
+
+        def constraints(samples):
+            h, w = min(step[0] * samples + 1, height), min(step[1] * samples + 1, width)
+            return predict_constraints(template, h, w, (h - 1) // step[0] + 1, (w - 1) // step[1] + 1, model)
+
+        # binary search on the resized side of the tile, the constraints grow with it
+        low, high = 1, max(height, width)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if constraints(middle) <= max_constraints:
+                low = middle
+            else:
+                high = middle - 1
+        tile_shape = (step[0] * low + 1, step[1] * low + 1)
+
+    rows = grid_axis(height, tile_shape[0], step[0])
+    cols = grid_axis(width, tile_shape[1], step[1])
+    tiles = [[y, x, h, w] for y, h in rows for x, w in cols]
+    plan = {'strategy': 'grid', 'grid': [len(rows), len(cols)], 'tiles': tiles,
+            'shapes': [(h, w) for _, _, h, w in tiles]}
+    if cost_fn is None:
+        cost_fn = planner_cost_fn(template, step, model)
+    plan['cost'] = plan_cost(plan['shapes'], cost_fn)
+    return plan
+
+
+def print_plan(plan):
+    """
+    Print the tiles of a plan and its predicted cost
+    :param plan: plan returned by plan_tiles
+    """
+    if plan['strategy'] == 'grid':
+        print(f"Tiling plan [grid]: {plan['grid'][0]}x{plan['grid'][1]} tiles, "
+              f"{len(set(plan['shapes']))} distinct shapes, predicted cost {plan['cost']:.2f}")
+        for i, (y, x, h, w) in enumerate(plan['tiles']):
+            print(f'  tile {i}: rows {y}-{y + h - 1}, columns {x}-{x + w - 1}, shape {h}x{w}')
+        return
+    axis = 'rows' if plan['dimension'] == 0 else 'columns'
+    print(f"Tiling plan [{plan['strategy']}]: {len(plan['tiles'])} tiles along the {axis}, "
+          f"{len(set(plan['shapes']))} distinct shapes, predicted cost {plan['cost']:.2f}")
+    for i, ((start, length, padding), shape) in enumerate(zip(plan['tiles'], plan['shapes'])):
+        padded = f' (padding {padding})' if padding else ''
+        print(f'  tile {i}: {axis} {start}-{start + length - 1}, shape {shape[0]}x{shape[1]}{padded}')
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+import fcntl
+import json
+import os
+import shutil
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from scripts.proving_system.circuit_cache import COMPILED_DIR, cache_lock, circuit_key, restore_circuit, store_circuit
+from scripts.proving_system.cost_model import load_cost_model, predict_constraints
+from scripts.proving_system.scheduler import R1CS_PATH, MemoryBudget, available_memory, estimate_memory
+from scripts.proving_system.zkey_store import SNARKJS_DIR, STORE_DIR, restore_zkey, store_zkey, zkey_key
+from scripts.resource_monitor import run_stage
+from scripts.util import extract_contraints
+
+QUEUE_PATH = 'output/batch_queue.sqlite'
+# one folder per image with image_info.json, low_image.png and tile_<i>/{vkey,public,proof}.json, as image_verify.py expects
+BATCH_DIR = 'output/batch'
+# the input stage tiles the whole image, the other stages run on each tile
+TILE_STAGES = ('compile', 'setup', 'witness', 'prove', 'verify', 'package')
+# stages whose peak memory grows with the constraints of the tile, the others are bound by the cpu
+MEMORY_STAGES = ('compile', 'setup', 'prove')
+CPU_STAGES = ('witness', 'verify', 'package')
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (name TEXT PRIMARY KEY, path TEXT NOT NULL, operation TEXT NOT NULL,
+                                   frame_pixel INTEGER, state TEXT NOT NULL DEFAULT 'pending',
+                                   attempts INTEGER NOT NULL DEFAULT 0, error TEXT);
+CREATE TABLE IF NOT EXISTS tiles (image TEXT NOT NULL, tile INTEGER NOT NULL, job TEXT NOT NULL, stage TEXT NOT NULL,
+                                  state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, error TEXT,
+                                  PRIMARY KEY (image, tile));
+"""
+
+
+class BatchQueue(object):
+    """
+    Durable queue of the images of a batch and of their tiles, in a sqlite database. A tile advances one stage at a
+    time and every stage is committed when it ends, so after a crash the queue resumes from the last completed
+    stage. Only one process at a time can run the queue.
+    """
+    def __init__(self, path=QUEUE_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.lock_file = open(f'{path}.lock', 'w')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock_file.close()
+            raise ValueError(f'The batch queue {path} is used by another process')
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+        fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+        self.lock_file.close()
+
+    def add_image(self, name, path, operation, frame_pixel=None):
+        """
+        Enqueue an image, an image already in the queue keeps its progress
+        :param name: name of the image, it names its circuits and its folder in BATCH_DIR
+        :param path: path to the image
+        :param operation: operation to prove, i.e. resize_22x22
+        :param frame_pixel: number of pixels to divide in the greatest dimension of the frame
+        """
+        row = self.connection.execute('SELECT path FROM images WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] != str(path):
+            raise ValueError(f'Images {row[0]} and {path} have the same name {name}')
+        with self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO images (name, path, operation, frame_pixel) VALUES (?, ?, ?, ?)',
+                                    (name, str(path), operation, frame_pixel))
+
+    def recover(self, retry_failed=False):
+        """
+        Put back in the queue the stages interrupted by a crash, and optionally the failed ones
+        :param retry_failed: if True the failed images and tiles are retried with new attempts
+        """
+        states = ('running', 'failed') if retry_failed else ('running',)
+        marks = ','.join('?' * len(states))
+        with self.connection:
+            if retry_failed:
+                self.connection.execute("UPDATE tiles SET attempts = 0, error = NULL WHERE state = 'failed'")
+                self.connection.execute("UPDATE images SET attempts = 0, error = NULL WHERE state = 'failed'")
+            self.connection.execute(f"UPDATE tiles SET state = 'pending' WHERE state IN ({marks})", states)
+            # an image with its tiles in the queue has already passed the input stage
+            self.connection.execute(f"UPDATE images SET state = CASE WHEN EXISTS (SELECT 1 FROM tiles WHERE image = name) "
+                                    f"THEN 'proving' ELSE 'pending' END WHERE state IN ({marks})", states)
+
+    def claim(self, stages):
+        """
+        Take the next pending task among the given stages, the tiles of the images already started come first so that
+        the images are completed in order
+        :param stages: tuple with the names of the stages, 'input' for the images
+        :return: dictionary with the task, None if there is no pending task
+        """
+        marks = ','.join('?' * len(stages))
+        with self.connection:
+            row = self.connection.execute(f"SELECT tiles.rowid, image, tile, job, stage FROM tiles JOIN images ON image = name "
+                                          f"WHERE tiles.state = 'pending' AND images.state = 'proving' AND stage IN ({marks}) "
+                                          f"ORDER BY images.rowid, tile LIMIT 1", stages).fetchone()
+            if row is not None:
+                self.connection.execute("UPDATE tiles SET state = 'running' WHERE rowid = ?", (row[0],))
+                return {'image': row[1], 'tile': row[2], 'job': json.loads(row[3]), 'stage': row[4]}
+            if 'input' not in stages:
+                return None
+            row = self.connection.execute("SELECT name, path, operation, frame_pixel FROM images WHERE state = 'pending' "
+                                          "ORDER BY rowid LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE images SET state = 'running' WHERE name = ?", (row[0],))
+            return {'image': row[0], 'path': row[1], 'operation': row[2], 'frame_pixel': row[3], 'stage': 'input'}
+
+    def complete(self, task, jobs=None):
+        """
+        Commit the end of a stage: the input stage enqueues the tiles of the image, the other ones move the tile to
+        the next stage, and the image is done with the package of its last tile
+        :param task: task returned by claim
+        :param jobs: for the input stage, list with the job of each tile (see scheduler.prove_tile)
+        """
+        with self.connection:
+            if task['stage'] == 'input':
+                self.connection.executemany("INSERT OR REPLACE INTO tiles (image, tile, job, stage) VALUES (?, ?, ?, ?)",
+                                            [(task['image'], i, json.dumps(job), TILE_STAGES[0]) for i, job in enumerate(jobs)])
+                self.connection.execute("UPDATE images SET state = 'proving' WHERE name = ?", (task['image'],))
+                return
+            following = TILE_STAGES.index(task['stage']) + 1
+            if following < len(TILE_STAGES):
+                self.connection.execute("UPDATE tiles SET stage = ?, state = 'pending', attempts = 0 WHERE image = ? AND tile = ?",
+                                        (TILE_STAGES[following], task['image'], task['tile']))
+                return
+            self.connection.execute("UPDATE tiles SET state = 'done' WHERE image = ? AND tile = ?", (task['image'], task['tile']))
+            self.connection.execute("UPDATE images SET state = 'done' WHERE name = ? AND NOT EXISTS "
+                                    "(SELECT 1 FROM tiles WHERE image = ? AND state != 'done')", (task['image'], task['image']))
+
+    def fail(self, task, error):
+        """
+        Record the failure of a stage, the stage is retried until MAX_ATTEMPTS, then the tile (and its image) fails
+        :param task: task returned by claim
+        :param error: message of the error
+        :return: True if the stage will be retried
+        """
+        table, where, keys = ('images', 'name = ?', (task['image'],)) if task['stage'] == 'input' else \
+                             ('tiles', 'image = ? AND tile = ?', (task['image'], task['tile']))
+        with self.connection:
+            self.connection.execute(f"UPDATE {table} SET attempts = attempts + 1, error = ?, "
+                                    f"state = CASE WHEN attempts + 1 < ? THEN 'pending' ELSE 'failed' END WHERE {where}",
+                                    (error, MAX_ATTEMPTS) + keys)
+            state = self.connection.execute(f'SELECT state FROM {table} WHERE {where}', keys).fetchone()[0]
+            if state == 'failed' and table == 'tiles':
+                self.connection.execute("UPDATE images SET state = 'failed', error = ? WHERE name = ?",
+                                        (f'tile {task["tile"]}: {error}', task['image']))
+        return state == 'pending'
+
+    def status(self):
+        """
+        :return: dictionary with the number of images in each state
+        """
+        return dict(self.connection.execute('SELECT state, COUNT(*) FROM images GROUP BY state').fetchall())
+
+
+def run_tile_stage(task, pot_path, budget, model, contract=None, verbose=True):
+    """
+    Run a stage of a tile, each stage is idempotent so that it can be run again after a crash
+    :param task: task returned by BatchQueue.claim
+    :param pot_path: path to the powers of tau file
+    :param budget: MemoryBudget shared by the memory bound stages
+    :param model: fitted cost model, used to estimate the memory of each stage
+    :param contract: if not None, name of the solidity verifier to export
+    :param verbose: if True prints the measures of each stage
+    """
+    job, stage = task['job'], task['stage']
+    name = job['circuit']
+    circuit_path = f'./circuits/benchmark/{name}.circom'
+
+    def run(label, command, memory_kb=0):
+        with budget.reserve(memory_kb):
+            record, stderr = run_stage(command)
+        if record.returncode != 0:
+            raise ValueError(f'[{name}] {label} failed with exit code {record.returncode}:\n{stderr}')
+        if verbose:
+            print(f'[{name}] {label}: {record.wall_time:.2f} seconds, {record.peak_rss} KB')
+
+    def constraints():
+        if stage == 'compile':
+            return predict_constraints(job['template'], *job['shape'], model=model)
+        return extract_contraints(R1CS_PATH.format(name))
+
+    if stage == 'compile':
+        key = circuit_key(circuit_path)
+        with cache_lock(key):
+            if not restore_circuit(circuit_path, key):
+                run('Compile Circuit', f'./scripts/compile_circuit.sh {circuit_path} {job["input"]}',
+                    estimate_memory(constraints(), 'COMPILE', model))
+                store_circuit(circuit_path, key)
+    elif stage == 'setup':
+        key = zkey_key(R1CS_PATH.format(name), pot_path)
+        with cache_lock(key, STORE_DIR):
+            if not restore_zkey(name, key):
+                run('Setup Prover', f'./scripts/proving_system/setup_prover.sh {name} {pot_path}',
+                    estimate_memory(constraints(), 'SETUP', model))
+                store_zkey(name, key)
+    elif stage == 'witness':
+        # the compilation of a circuit not in the cache already generated the witness of this input
+        witness = Path(COMPILED_DIR.format(name)) / f'{name}_witness.wtns'
+        if not witness.is_file() or witness.stat().st_mtime < os.path.getmtime(job['input']):
+            run('Witness', f'./scripts/compile_circuit.sh {circuit_path} {job["input"]} --skip-compile')
+    elif stage == 'prove':
+        run('Prover', f'./scripts/proving_system/prover.sh {name}', estimate_memory(constraints(), 'PROVER', model))
+    elif stage == 'verify':
+        verifier = f'./scripts/proving_system/verifier.sh {name}'
+        run('Verifier', verifier if contract is None else f'{verifier} --generate-contract {contract}')
+    elif stage == 'package':
+        package_tile(task['image'], task['tile'], job, contract)
+    else:
+        raise ValueError(f'Stage {stage} is not implemented')
+
+
+def package_tile(image, tile, job, contract=None):
+    """
+    Copy the proof of a tile in the folder of its image, then remove the circuit, the keys and the input (with the
+    master keys) of the tile, that are not needed anymore (the circuit and the keys stay in the cache and in the store).
+    The files are removed only after all the copies, so a package run again after a crash skips the copied files
+    :param image: name of the image
+    :param tile: index of the tile
+    :param job: job of the tile, with its circuit and input
+    :param contract: if not None, name of the solidity verifier of the tile
+    """
+    circuit_name = job['circuit']
+    snarkjs_dir = Path(SNARKJS_DIR.format(circuit_name))
+    tile_dir = Path(BATCH_DIR) / image / f'tile_{tile}'
+    files = {'verification_key.json': 'vkey.json', 'public.json': 'public.json', 'proof.json': 'proof.json'}
+    if contract is not None:
+        files[f'Verifier_{contract}.sol'] = f'Verifier_{contract}.sol'
+
+    os.makedirs(tile_dir, exist_ok=True)
+    for source, target in files.items():
+        # a package interrupted after the removal: every file was already copied before it
+        if not (snarkjs_dir / source).is_file() and (tile_dir / target).is_file():
+            continue
+        shutil.copy2(snarkjs_dir / source, tile_dir / f'{target}.tmp')
+        os.replace(tile_dir / f'{target}.tmp', tile_dir / target)
+    shutil.rmtree(snarkjs_dir, ignore_errors=True)
+    shutil.rmtree(COMPILED_DIR.format(circuit_name), ignore_errors=True)
+    for path in (f'./circuits/benchmark/{circuit_name}.circom', job['input']):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_queue(queue, input_stage, pot_path, cpu_workers=None, memory_workers=None, memory_budget=None, contract=None, verbose=True):
+    """
+    Run the queue until no task is left: the input stage and the cpu bound stages (witness, verify, package) run on
+    cpu_workers threads, the memory bound ones (compile, setup, prove) on memory_workers threads, and they are also
+    admitted against the RAM budget
+    :param queue: BatchQueue
+    :param input_stage: function of the image task (see BatchQueue.claim) that writes the inputs of the tiles and
+                        returns their jobs
+    :param pot_path: path to the powers of tau file
+    :param cpu_workers: number of cpu bound stages at the same time, the number of cores as default
+    :param memory_workers: number of memory bound stages at the same time, a quarter of the cores as default
+    :param memory_budget: RAM budget in KB, 80% of the available memory as default
+    :param contract: if not None, prefix of the name of the solidity verifier of each tile
+    :param verbose: if True prints the measures of each stage
+    :return: dictionary with the number of images in each state
+    """
+    cpu_workers = cpu_workers or os.cpu_count()
+    memory_workers = memory_workers or max(1, os.cpu_count() // 4)
+    memory_budget = int(available_memory() * 0.8) if memory_budget is None else memory_budget
+    budget = MemoryBudget(memory_budget)
+    model = load_cost_model()
+
+    def run_task(task):
+        if task['stage'] == 'input':
+            return input_stage(task)
+        tile_contract = None if contract is None else f'{contract}_{task["image"]}_{task["tile"]}'
+        return run_tile_stage(task, pot_path, budget, model, tile_contract, verbose)
+
+    pools = {'cpu': (ThreadPoolExecutor(max_workers=cpu_workers), cpu_workers, ('input',) + CPU_STAGES),
+             'memory': (ThreadPoolExecutor(max_workers=memory_workers), memory_workers, MEMORY_STAGES)}
+    running = {}
+    try:
+        while True:
+            for pool_name, (executor, limit, stages) in pools.items():
+                while sum(pool == pool_name for pool, _ in running.values()) < limit:
+                    task = queue.claim(stages)
+                    if task is None:
+                        break
+                    running[executor.submit(run_task, task)] = (pool_name, task)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, task = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as error:
+                    retried = queue.fail(task, str(error))
+                    print(f'[{task["image"]}] {task["stage"]} failed{", retrying" if retried else ""}: {error}')
+                    continue
+                queue.complete(task, result)
+    finally:
+        for executor, _, _ in pools.values():
+            executor.shutdown(wait=True)
+    return queue.status()
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+
+# BN254 (alt_bn128) curve and optimal ate pairing, the curve of the Groth16 proofs of snarkjs
+# G1: y^2 = x^3 + 3 over Fp, G2: y^2 = x^3 + 3/(9+i) over Fp2 = Fp[i]/(i^2+1) (D-type twist)
+# Fp12 = Fp[w]/(w^12 - 18w^6 + 82), with w^6 = 9+i, so a+bi in Fp2 is (a-9b) + b*w^6 in Fp12
+
+FIELD_MODULUS = 21888242871839275222246405745257275088696311157297823662689037894645226208583
+CURVE_ORDER = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+ATE_LOOP_COUNT = 29793968203157093288
+
+P = FIELD_MODULUS
+
+G1 = (1, 2)
+G2 = ((10857046999023057135944570762232829481370756359578518086990519993285655852781,
+       11559732032986387107991004021392285783925812861821192530917403151452391805634),
+      (8495653923123431417604973247489272438418190587263600148770280649306958101930,
+       4082367875863433681332203403145435568316851327593401208105741076214120093531))
+
+
+# ---------------------------------------------------------------- Fp2 (tuples a + b*i)
+
+def fq2_add(a, b):
+    return ((a[0] + b[0]) % P, (a[1] + b[1]) % P)
+
+
+def fq2_sub(a, b):
+    return ((a[0] - b[0]) % P, (a[1] - b[1]) % P)
+
+
+def fq2_neg(a):
+    return (-a[0] % P, -a[1] % P)
+
+
+def fq2_mul(a, b):
+    t0, t1 = a[0] * b[0], a[1] * b[1]
+    return ((t0 - t1) % P, ((a[0] + a[1]) * (b[0] + b[1]) - t0 - t1) % P)
+
+
+def fq2_sqr(a):
+    return ((a[0] + a[1]) * (a[0] - a[1]) % P, 2 * a[0] * a[1] % P)
+
+
+def fq2_scalar(a, k):
+    return (a[0] * k % P, a[1] * k % P)
+
+
+def fq2_inv(a):
+    inverse = pow(a[0] * a[0] + a[1] * a[1], -1, P)
+    return (a[0] * inverse % P, -a[1] * inverse % P)
+
+
+def fq2_conj(a):
+    return (a[0], -a[1] % P)
+
+
+def fq2_pow(a, exponent):
+    result = (1, 0)
+    while exponent:
+        if exponent & 1:
+            result = fq2_mul(result, a)
+        a = fq2_sqr(a)
+        exponent >>= 1
+    return result
+
+
+XI = (9, 1)
+B1 = 3
+B2 = fq2_mul((3, 0), fq2_inv(XI))
+# Frobenius of a twisted point: (x, y)^p = (conj(x) * xi^((p-1)/3), conj(y) * xi^((p-1)/2))
+FROBENIUS_X = fq2_pow(XI, (P - 1) // 3)
+FROBENIUS_Y = fq2_pow(XI, (P - 1) // 2)
+
+
+# ---------------------------------------------------------------- G1 (affine tuples, None is the infinity)
+
+def g1_is_on_curve(point):
+    if point is None:
+        return True
+    x, y = point
+    return 0 <= x < P and 0 <= y < P and (y * y - x * x * x - B1) % P == 0
+
+
+def g1_neg(point):
+    return None if point is None else (point[0], -point[1] % P)
+
+
+def _jacobian_double(point):
+    X, Y, Z = point
+    if Y == 0:
+        return None
+    A = X * X % P
+    B = Y * Y % P
+    C = B * B % P
+    D = 2 * ((X + B) ** 2 - A - C) % P
+    E = 3 * A % P
+    X3 = (E * E - 2 * D) % P
+    return (X3, (E * (D - X3) - 8 * C) % P, 2 * Y * Z % P)
+
+
+def _jacobian_add_affine(point, other):
+    """
+    Mixed addition, Jacobian point plus affine point
+    """
+    if point is None:
+        return (other[0], other[1], 1)
+    X1, Y1, Z1 = point
+    Z1Z1 = Z1 * Z1 % P
+    H = (other[0] * Z1Z1 - X1) % P
+    r = 2 * (other[1] * Z1 * Z1Z1 - Y1) % P
+    if H == 0:
+        return _jacobian_double(point) if r == 0 else None
+    HH = H * H % P
+    I = 4 * HH % P
+    J = H * I % P
+    V = X1 * I % P
+    X3 = (r * r - J - 2 * V) % P
+    return (X3, (r * (V - X3) - 2 * Y1 * J) % P, ((Z1 + H) ** 2 - Z1Z1 - HH) % P)
+
+
+def _jacobian_add(point, other):
+    if point is None:
+        return other
+    if other is None:
+        return point
+    X1, Y1, Z1 = point
+    X2, Y2, Z2 = other
+    Z1Z1, Z2Z2 = Z1 * Z1 % P, Z2 * Z2 % P
+    U1, U2 = X1 * Z2Z2 % P, X2 * Z1Z1 % P
+    S1, S2 = Y1 * Z2 * Z2Z2 % P, Y2 * Z1 * Z1Z1 % P
+    H = (U2 - U1) % P
+    r = 2 * (S2 - S1) % P
+    if H == 0:
+        return _jacobian_double(point) if r == 0 else None
+    I = 4 * H * H % P
+    J = H * I % P
+    V = U1 * I % P
+    X3 = (r * r - J - 2 * V) % P
+    return (X3, (r * (V - X3) - 2 * S1 * J) % P, ((Z1 + Z2) ** 2 - Z1Z1 - Z2Z2) * H % P)
+
+
+def _to_affine(point):
+    if point is None:
+        return None
+    X, Y, Z = point
+    z_inv = pow(Z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+
+
+def g1_add(point, other):
+    if other is None:
+        return point
+    return _to_affine(_jacobian_add_affine(None if point is None else (point[0], point[1], 1), other))
+
+
+def g1_mul(point, scalar):
+    """
+    Multiply a G1 point by a scalar
+    :param point: affine point
+    :param scalar: integer scalar
+    :return: affine point
+    """
+    scalar %= CURVE_ORDER
+    result = None
+    if point is None:
+        return None
+    for bit in bin(scalar)[2:]:
+        if result is not None:
+            result = _jacobian_double(result)
+        if bit == '1':
+            result = _jacobian_add_affine(result, point)
+    return _to_affine(result)
+
+
+def g1_msm(points, scalars):
+    """
+    Multi scalar multiplication sum(scalar_i * point_i) with the bucket method of Pippenger
+    :param points: list of affine G1 points
+    :param scalars: list of integer scalars
+    :return: affine point
+    """
+    pairs = [(point, scalar % CURVE_ORDER) for point, scalar in zip(points, scalars)
+             if point is not None and scalar % CURVE_ORDER]
+    if len(pairs) == 0:
+        return None
+    window = max(2, len(pairs).bit_length() - 3)
+    mask = (1 << window) - 1
+    result = None
+    for shift in range((CURVE_ORDER.bit_length() - 1) // window * window, -1, -window):
+        for _ in range(window):
+            if result is not None:
+                result = _jacobian_double(result)
+        buckets = [None] * (mask + 1)
+        for point, scalar in pairs:
+            index = (scalar >> shift) & mask
+            if index:
+                buckets[index] = _jacobian_add_affine(buckets[index], point)
+        running = total = None
+        for bucket in reversed(buckets[1:]):
+            running = _jacobian_add(running, bucket)
+            total = _jacobian_add(total, running)
+        result = _jacobian_add(result, total)
+    return _to_affine(result)
+
+
+# ---------------------------------------------------------------- G2 (affine tuples of Fp2 on the twist)
+
+def g2_is_on_curve(point):
+    if point is None:
+        return True
+    x, y = point
+    if not all(0 <= c < P for c in x + y):
+        return False
+    return fq2_sub(fq2_sqr(y), fq2_add(fq2_mul(fq2_sqr(x), x), B2)) == (0, 0)
+
+
+def g2_neg(point):
+    return None if point is None else (point[0], fq2_neg(point[1]))
+
+
+def _g2_line(point, other):
+    """
+    Slope of the line through two twisted points (the tangent if they are equal)
+    :return: slope, None if the line is vertical
+    """
+    if point == other:
+        if point[1] == (0, 0):
+            return None
+        return fq2_mul(fq2_scalar(fq2_sqr(point[0]), 3), fq2_inv(fq2_scalar(point[1], 2)))
+    if point[0] == other[0]:
+        return None
+    return fq2_mul(fq2_sub(other[1], point[1]), fq2_inv(fq2_sub(other[0], point[0])))
+
+
+def _g2_add_slope(point, other, slope):
+    if slope is None:
+        return None
+    x3 = fq2_sub(fq2_sub(fq2_sqr(slope), point[0]), other[0])
+    return (x3, fq2_sub(fq2_mul(slope, fq2_sub(point[0], x3)), point[1]))
+
+
+def g2_add(point, other):
+    if point is None:
+        return other
+    if other is None:
+        return point
+    return _g2_add_slope(point, other, _g2_line(point, other))
+
+
+def g2_mul(point, scalar):
+    result = None
+    for bit in bin(scalar)[2:]:
+        result = g2_add(result, result)
+        if bit == '1':
+            result = g2_add(result, point)
+    return result
+
+
+def g2_in_subgroup(point):
+    """
+    Check that a twisted point is in the subgroup of order CURVE_ORDER (the twist has a cofactor)
+    """
+    return g2_is_on_curve(point) and g2_mul(point, CURVE_ORDER) is None
+
+
+def _g2_frobenius(point):
+    return (fq2_mul(fq2_conj(point[0]), FROBENIUS_X), fq2_mul(fq2_conj(point[1]), FROBENIUS_Y))
+
+
+# ---------------------------------------------------------------- Fp12 (lists of 12 coefficients of w)
+
+FQ12_ONE = [1] + [0] * 11
+
+
+def _reduce(product):
+    for k in range(len(product) - 1, 11, -1):
+        top = product[k]
+        product[k - 6] += 18 * top
+        product[k - 12] -= 82 * top
+    return [c % P for c in product[:12]]
+
+
+def fq12_mul(a, b):
+    product = [0] * 23
+    for i, ai in enumerate(a):
+        if ai:
+            for j, bj in enumerate(b):
+                product[i + j] += ai * bj
+    return _reduce(product)
+
+
+def fq12_sqr(a):
+    product = [0] * 23
+    for i in range(12):
+        ai = a[i]
+        if ai:
+            product[2 * i] += ai * ai
+            ai2 = 2 * ai
+            for j in range(i + 1, 12):
+                product[i + j] += ai2 * a[j]
+    return _reduce(product)
+
+
+def _fq12_mul_sparse(a, terms):
+    """
+    Multiply by an element with few non zero coefficients, given as (power of w, coefficient)
+    """
+    product = [0] * 23
+    for j, bj in terms:
+        for i, ai in enumerate(a):
+            product[i + j] += ai * bj
+    return _reduce(product)
+
+
+def fq12_conj(a):
+    """
+    a^(p^6), w^(p^6) = -w
+    """
+    return [c if k % 2 == 0 else -c % P for k, c in enumerate(a)]
+
+
+def _poly_degree(poly):
+    degree = len(poly) - 1
+    while degree and poly[degree] == 0:
+        degree -= 1
+    return degree
+
+
+def fq12_inv(a):
+    """
+    Inverse with the extended euclidean algorithm on polynomials modulo w^12 - 18w^6 + 82
+    """
+    low, high = list(a) + [0], [82, 0, 0, 0, 0, 0, -18 % P, 0, 0, 0, 0, 0, 1]
+    lm, hm = [1] + [0] * 12, [0] * 13
+    while _poly_degree(low):
+        # quotient of high / low
+        quotient = [0] * 13
+        remainder = list(high)
+        degree_low = _poly_degree(low)
+        inverse_lead = pow(low[degree_low], -1, P)
+        for i in range(_poly_degree(remainder) - degree_low, -1, -1):
+            q = remainder[degree_low + i] * inverse_lead % P
+            quotient[i] = q
+            for c in range(degree_low + 1):
+                remainder[c + i] = (remainder[c + i] - q * low[c]) % P
+        nm, new = list(hm), list(high)
+        for i in range(13):
+            for j in range(13 - i):
+                nm[i + j] -= lm[i] * quotient[j]
+                new[i + j] -= low[i] * quotient[j]
+        lm, low, hm, high = [c % P for c in nm], [c % P for c in new], lm, low
+    inverse_lead = pow(low[0], -1, P)
+    return [c * inverse_lead % P for c in lm[:12]]
+
+
+def fq12_pow(a, exponent):
+    result = FQ12_ONE
+    for bit in bin(exponent)[2:]:
+        result = fq12_sqr(result)
+        if bit == '1':
+            result = fq12_mul(result, a)
+    return result
+
+
+def _embed(a, power):
+    """
+    Terms of (a0 + a1*i) * w^power in Fp12
+    """
+    return [(power, (a[0] - 9 * a[1]) % P), (power + 6, a[1])]
+
+
+# w^(p^2) = w * xi^((p^2-1)/6), the frobenius a -> a^(p^2) maps w^k to (w^(p^2))^k
+_W_P2 = _fq12_mul_sparse(FQ12_ONE, _embed(fq2_pow(XI, (P * P - 1) // 6), 1))
+_FROBENIUS_P2 = [FQ12_ONE]
+for _ in range(11):
+    _FROBENIUS_P2.append(fq12_mul(_FROBENIUS_P2[-1], _W_P2))
+
+
+def _fq12_frobenius_p2(a):
+    result = [0] * 12
+    for k, c in enumerate(a):
+        if c:
+            for j, v in enumerate(_FROBENIUS_P2[k]):
+                result[j] += c * v
+    return [c % P for c in result]
+
+
+HARD_EXPONENT = (P ** 4 - P ** 2 + 1) // CURVE_ORDER
+
+
+def final_exponentiation(a):
+    """
+    a^((p^12 - 1) / r), split in the easy part (p^6 - 1)(p^2 + 1) and the hard part (p^4 - p^2 + 1) / r
+    """
+    a = fq12_mul(fq12_conj(a), fq12_inv(a))
+    a = fq12_mul(_fq12_frobenius_p2(a), a)
+    return fq12_pow(a, HARD_EXPONENT)
+
+
+# ---------------------------------------------------------------- optimal ate pairing
+
+def _loop_schedule():
+    """
+    For each line of the Miller loop, True if the accumulator is squared before it
+    """
+    schedule = []
+    for i in range(ATE_LOOP_COUNT.bit_length() - 2, -1, -1):
+        schedule.append(True)
+        if ATE_LOOP_COUNT >> i & 1:
+            schedule.append(False)
+    return schedule + [False, False]
+
+
+LOOP_SCHEDULE = _loop_schedule()
+
+
+def prepare_g2(point):
+    """
+    Precompute the lines of the Miller loop of a G2 point, they depend only on the point so they are reused
+    for every G1 point paired with it
+    :param point: affine twisted point
+    :return: list of lines, as (slope, slope * x - y) of the twisted points or (None, x) for a vertical line
+    """
+    lines = []
+    current = point
+
+    def step(other):
+        slope = _g2_line(current, other)
+        if slope is None:
+            lines.append((None, current[0]))
+        else:
+            lines.append((slope, fq2_sub(fq2_mul(slope, current[0]), current[1])))
+        return _g2_add_slope(current, other, slope)
+
+    for i in range(ATE_LOOP_COUNT.bit_length() - 2, -1, -1):
+        current = step(current)
+        if ATE_LOOP_COUNT >> i & 1:
+            current = step(point)
+    q1 = _g2_frobenius(point)
+    q2 = _g2_frobenius(q1)
+    current = step(q1)
+    step(g2_neg(q2))
+    return lines
+
+
+def _line_terms(line, xp, yp):
+    """
+    Line evaluated in a G1 point: yp - slope*xp*w + (slope*x - y)*w^3, or xp - x*w^2 if vertical
+    """
+    slope, c = line
+    if slope is None:
+        return [(0, xp)] + [(k, -v % P) for k, v in _embed(c, 2)]
+    return [(0, yp)] + _embed(fq2_scalar(slope, -xp % P), 1) + _embed(c, 3)
+
+
+def miller_loop(pairs):
+    """
+    Product of the Miller loops of many pairs, sharing the squarings of the accumulator
+    :param pairs: list of (G1 affine point, lines from prepare_g2)
+    :return: element of Fp12, to be raised with final_exponentiation
+    """
+    pairs = [(point, lines) for point, lines in pairs if point is not None]
+    f = FQ12_ONE
+    for k, square in enumerate(LOOP_SCHEDULE):
+        if square and k:
+            f = fq12_sqr(f)
+        for (xp, yp), lines in pairs:
+            f = _fq12_mul_sparse(f, _line_terms(lines[k], xp, yp))
+    return f
+
+
+def pairing(g2_point, g1_point):
+    """
+    Optimal ate pairing e(P, Q)
+    :param g2_point: affine point of G2
+    :param g1_point: affine point of G1
+    :return: element of Fp12
+    """
+    if g2_point is None or g1_point is None:
+        return FQ12_ONE
+    return final_exponentiation(miller_loop([(g1_point, prepare_g2(g2_point))]))
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
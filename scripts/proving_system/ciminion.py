@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+# Ciminion authenticated encryption over the scalar field of BN254, as the circuits in circuits/base/ciminion and
+# the ciminion_decrypt program: the round constants are the SHAKE256 digest of "GF(p)" read in little endian blocks
+# of 16 bytes, the last 4 * ROUNDS_R of them are also the constants of pR.
+
+import hashlib
+from scripts.proving_system.bn254 import CURVE_ORDER
+
+# GLOBAL_FIELD_P of circom
+P = CURVE_ORDER
+ROUNDS_N = 134
+ROUNDS_R = 10
+CONSTANT_SIZE = 16
+
+_DIGEST = hashlib.shake_256(f'GF({P})'.encode()).digest(4 * ROUNDS_N * CONSTANT_SIZE)
+CONSTANTS_N = tuple(tuple(int.from_bytes(_DIGEST[(4 * r + i) * CONSTANT_SIZE:(4 * r + i + 1) * CONSTANT_SIZE], 'little')
+                          for i in range(4)) for r in range(ROUNDS_N))
+CONSTANTS_R = CONSTANTS_N[-ROUNDS_R:]
+
+
+def permutation(a, b, c, constants):
+    """
+    Iterated permutation of Ciminion (IteratedPermutationN or IteratedPermutationR)
+    :param a, b, c: state
+    :param constants: round constants (RC0, RC1, RC2, RC3) of each round, CONSTANTS_N or CONSTANTS_R
+    :return: tuple with the permuted state
+    """
+    for rc0, rc1, rc2, rc3 in constants:
+        ab_c = a * b + c
+        a, b, c = (ab_c + rc2) % P, (a + rc3 * (ab_c + b) + rc0) % P, (ab_c + b + rc1) % P
+    return a, b, c
+
+
+def key_schedule(iv, master_key0, master_key1, count):
+    """
+    Subkeys of Ciminion, the first element of the state after each iteration of pN starting from (IV, MK0, MK1)
+    :param count: number of subkeys
+    :return: list of subkeys
+    """
+    state, keys = (iv, master_key0, master_key1), []
+    for _ in range(count):
+        state = permutation(*state, CONSTANTS_N)
+        keys.append(state[0])
+    return keys
+
+
+def _keystream(master_keys, nonce, iv, pairs):
+    """
+    :return: tuple with the subkeys, the keystream (two elements for each pair) and the state of pR for the tag
+    """
+    keys = key_schedule(iv, master_keys[0], master_keys[1], 2 * pairs + 3)
+    upper = permutation(nonce, keys[1], keys[2], CONSTANTS_N)
+    stream, (a, b, c) = [], upper
+    for i in range(pairs):
+        a, b = (a + keys[2 * i + 4]) % P, (b + keys[2 * i + 3]) % P
+        # rolling function
+        a, b, c = (c + a * b) % P, a, b
+        stream.extend(permutation(a, b, c, CONSTANTS_R)[:2])
+    return keys, stream, permutation(*upper, CONSTANTS_R)[0]
+
+
+def _tag(ciphertext, key, tag_mask):
+    accumulator = 0
+    for i in range(0, len(ciphertext), 2):
+        accumulator = ((accumulator + ciphertext[i]) * key % P + ciphertext[i + 1]) * key % P
+    return (accumulator + tag_mask) % P
+
+
+def encrypt(master_keys, nonce, iv, plaintext):
+    """
+    Encrypt and authenticate a message, as CiminionEnc
+    :param master_keys: the two master keys
+    :param nonce: nonce
+    :param iv: IV
+    :param plaintext: list with an even number of field elements
+    :return: tuple with the ciphertext and the tag
+    """
+    if len(plaintext) % 2 != 0:
+        raise ValueError('Ciminion expects an even number of field elements')
+    keys, stream, tag_mask = _keystream(master_keys, nonce, iv, len(plaintext) // 2)
+    ciphertext = [(m + k) % P for m, k in zip(plaintext, stream)]
+    return ciphertext, _tag(ciphertext, keys[0], tag_mask)
+
+
+def decrypt(master_keys, nonce, iv, ciphertext, tag):
+    """
+    Check the tag and decrypt a message, as DEC_Ciminion
+    :param master_keys: the two master keys
+    :param nonce: nonce
+    :param iv: IV
+    :param ciphertext: list with an even number of field elements
+    :param tag: tag of the ciphertext
+    :return: the plaintext
+    """
+    if len(ciphertext) % 2 != 0:
+        raise ValueError('Ciminion expects an even number of field elements')
+    keys, stream, tag_mask = _keystream(master_keys, nonce, iv, len(ciphertext) // 2)
+    if _tag(ciphertext, keys[0], tag_mask) != tag % P:
+        raise ValueError('Tag mismatch')
+    return [(c - k) % P for c, k in zip(ciphertext, stream)]
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
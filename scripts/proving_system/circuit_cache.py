@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+CACHE_DIR = 'output/circuit_cache'
+COMPILED_DIR = 'output/compiled_circuit/compiled_{0}'
+TEMPLATES_DIR = 'circuits/base'
+# same path used by compile_circuit.sh
+CIRCOMLIB_PATH = f'/home/{os.environ.get("USER", "")}/node_modules'
+
+
+def circomlib_version(circomlib_path=CIRCOMLIB_PATH):
+    """
+    Read the version of circomlib installed in the library path
+    :param circomlib_path: path to the node_modules folder that contains circomlib
+    :return: version of circomlib, 'unknown' if not found
+    """
+    package = Path(circomlib_path) / 'circomlib' / 'package.json'
+    if not package.is_file():
+        return 'unknown'
+    with open(package, 'r') as json_file:
+        return json.load(json_file).get('version', 'unknown')
+
+
+def _hash_sources(circuit_path, digest, visited):
+    """
+    Update the digest with the source of the circuit and, recursively, of the local files it includes
+    :param circuit_path: path to the circom file
+    :param digest: hashlib object to update
+    :param visited: set of the files already hashed
+    """
+    circuit_path = Path(circuit_path).resolve()
+    if circuit_path in visited:
+        return
+    visited.add(circuit_path)
+
+    source = circuit_path.read_bytes()
+    digest.update(source)
+    for include in re.findall(rb'^\s*include\s+"([^"]+)"', source, re.MULTILINE):
+        include = include.decode('utf-8')
+        # includes of circomlib are covered by its version
+        for base in (circuit_path.parent, Path(TEMPLATES_DIR)):
+            if (base / include).is_file():
+                _hash_sources(base / include, digest, visited)
+                break
+
+
+def circuit_key(circuit_path, circomlib_path=CIRCOMLIB_PATH):
+    """
+    Compute the content address of a rendered circuit, tiles with the same shape share the same key
+    :param circuit_path: path to the rendered circom file
+    :param circomlib_path: path to the node_modules folder that contains circomlib
+    :return: hex digest of the circuit sources and circomlib version
+    """
+    digest = hashlib.sha256()
+    _hash_sources(circuit_path, digest, set())
+    digest.update(circomlib_version(circomlib_path).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@contextmanager
+def cache_lock(key, cache_dir=CACHE_DIR):
+    """
+    Lock an entry of the cache, so that tiles of the same shape are compiled only once, also across processes
+    :param key: key of the entry
+    :param cache_dir: folder of the cache
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(Path(cache_dir) / f'{key}.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def link_file(src, dst):
+    """
+    Hard link src to dst, copying it when the link is not possible
+    """
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def restore_circuit(circuit_path, key=None):
+    """
+    Restore the r1cs, the witness generator and its .dat file from the cache into the compiled circuit folder
+    :param circuit_path: path to the rendered circom file
+    :param key: key of the circuit, computed if None
+    :return: True if the circuit was in the cache, False otherwise
+    """
+    key = circuit_key(circuit_path) if key is None else key
+    entry = Path(CACHE_DIR) / key
+    name = Path(circuit_path).stem
+    compiled_dir = Path(COMPILED_DIR.format(name))
+    targets = [compiled_dir / f'{name}.r1cs', compiled_dir / f'{name}_cpp' / name, compiled_dir / f'{name}_cpp' / f'{name}.dat']
+
+    if not (entry / 'circuit.r1cs').is_file():
+        # files linked by a previous restore must not be overwritten in place by the new compilation
+        for target in targets:
+            if target.exists():
+                os.remove(target)
+        return False
+
+    os.makedirs(compiled_dir / f'{name}_cpp', exist_ok=True)
+    # the witness generator reads <binary name>.dat, so the binary can be renamed
+    for source, target in zip(('circuit.r1cs', 'circuit', 'circuit.dat'), targets):
+        link_file(entry / source, target)
+    return True
+
+
+def store_circuit(circuit_path, key=None):
+    """
+    Store the compiled circuit in the cache, the entry is written in a temporary folder and then renamed
+    :param circuit_path: path to the rendered circom file, already compiled by compile_circuit.sh
+    :param key: key of the circuit, computed if None
+    """
+    key = circuit_key(circuit_path) if key is None else key
+    entry = Path(CACHE_DIR) / key
+    if entry.is_dir():
+        return
+
+    name = Path(circuit_path).stem
+    compiled_dir = Path(COMPILED_DIR.format(name))
+    tmp_entry = Path(CACHE_DIR) / f'{key}.tmp'
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+    shutil.copy2(compiled_dir / f'{name}.r1cs', tmp_entry / 'circuit.r1cs')
+    shutil.copy2(compiled_dir / f'{name}_cpp' / name, tmp_entry / 'circuit')
+    shutil.copy2(compiled_dir / f'{name}_cpp' / f'{name}.dat', tmp_entry / 'circuit.dat')
+    os.rename(tmp_entry, entry)
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
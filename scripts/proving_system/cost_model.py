@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import os
+from csv import DictReader
+
+COST_MODEL_PATH = 'output/cost_model.json'
+STAGES = ('COMPILE', 'SETUP', 'PROVER', 'VERIFIER')
+
+# Constraints of the circomlib/ciminion components, counted after the linear simplification of circom
+# (x^5 S-box = 3 constraints, IsEqual = 2 constraints, one Ciminion round = 2 multiplications)
+POSEIDON_PARTIAL_ROUNDS = [56, 57, 56, 60, 60, 63, 64, 63, 60, 66, 60, 65, 70, 60, 64, 68]
+PERMUTATION_N = 134 * 2
+PERMUTATION_R = 10 * 2
+ROLLING = 1
+MAC_PAIR = 2
+IS_EQUAL = 2
+
+
+def poseidon_constraints(inputs):
+    """
+    Constraints of circomlib Poseidon(inputs)
+    :param inputs: number of inputs of the hash
+    :return: number of constraints
+    """
+    t = inputs + 1
+    return 3 * (8 * t + POSEIDON_PARTIAL_ROUNDS[t - 2])
+
+
+def check_resize_constraints(h_resize, w_resize):
+    """
+    Constraints of Check_Resize, an IsEqual and its squared output for each channel of the resized image
+    """
+    return h_resize * w_resize * 3 * (IS_EQUAL + 1)
+
+
+def sponge_constraints(inputs_length):
+    """
+    Constraints of SpongeHash, a Poseidon(16) every 15 chained inputs and one for the last partial frame
+    """
+    blocks = 0 if inputs_length < 16 else 1 + (inputs_length - 16) // 15
+    if inputs_length % 16 != 0:
+        blocks += 1
+    return blocks * poseidon_constraints(16)
+
+
+def ciminion_constraints(input_size):
+    """
+    Constraints of ENC_Ciminion on input_size field elements
+    """
+    pairs = input_size // 2
+    key_schedule = (2 * pairs + 3) * PERMUTATION_N
+    return key_schedule + PERMUTATION_N + pairs * (ROLLING + PERMUTATION_R + MAC_PAIR) + PERMUTATION_R
+
+
+def packed_blocks(height, width):
+    """
+    Number of 28 bytes field elements of a padded image, as in ImageHashEnc
+    """
+    byte_count = height * width * 3
+    padding = 28 - (byte_count % 28) if byte_count % 28 else 0
+    return (byte_count + padding) // 28
+
+
+def image_hash_enc_constraints(height, width):
+    """
+    Constraints of ImageHashEnc, sponge hash and encryption of the packed image
+    """
+    blocks = packed_blocks(height, width)
+    return sponge_constraints(blocks) + ciminion_constraints(blocks + blocks % 2)
+
+
+TEMPLATES = {
+    'resize': lambda hf, wf, hr, wr: check_resize_constraints(hr, wr),
+    'poseidon_sponge': lambda hf, wf, hr, wr: sponge_constraints(hf * wf * 3),
+    'image_hash': lambda hf, wf, hr, wr: image_hash_enc_constraints(hf, wf),
+    'resize_cnft': lambda hf, wf, hr, wr: check_resize_constraints(hr, wr) + image_hash_enc_constraints(hf, wf)
+                                          + poseidon_constraints(3),
+    'resize_and_hash_optimized': lambda hf, wf, hr, wr: check_resize_constraints(hr, wr)
+                                                        + sponge_constraints(packed_blocks(hf, wf))
+                                                        + ciminion_constraints(hf * wf * 3) + poseidon_constraints(3),
+}
+
+
+def analytic_constraints(template, h_full, w_full, h_resize, w_resize):
+    """
+    Count the constraints of a circuits/base template without compiling it
+    :param template: name of the template, one of TEMPLATES
+    :return: number of constraints
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f'No constraints model for the template {template}, available: {list(TEMPLATES)}')
+    return TEMPLATES[template](h_full, w_full, h_resize, w_resize)
+
+
+def _template_of(circuit):
+    """
+    Find the template of a compiled circuit from its name, i.e. resize_cnft_4096 -> resize_cnft
+    """
+    for template in sorted(TEMPLATES, key=len, reverse=True):
+        if circuit.startswith(template):
+            return template
+    return None
+
+
+def _fit_power_law(xs, ys):
+    """
+    Least squares fit of y = a * x^b in log space
+    :return: [a, b]
+    """
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) == 0:
+        return None
+    if len(points) == 1 or len(set(x for x, _ in points)) == 1:
+        return [math.exp(sum(y - x for x, y in points) / len(points)), 1.0]
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    b = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+    return [math.exp(mean_y - b * mean_x), b]
+
+
+def fit_cost_model(csv_paths, output_path=COST_MODEL_PATH):
+    """
+    Fit the cost model from the csv files produced by append_to_csv: a scale of the analytic constraints for each
+    template, and a power law from constraints to time and memory of each stage
+    :param csv_paths: list of csv files with CIRCUIT, CONSTRAINTS, DIM_FULL, DIM_RES and the stage measures
+    :param output_path: path where to save the model as json, if not None
+    :return: dictionary with the model
+    """
+    rows = []
+    for csv_path in csv_paths:
+        with open(csv_path, 'r', newline='') as csv_file:
+            rows.extend(DictReader(csv_file))
+
+    model = {'scale': {}, 'stages': {}}
+    ratios = {}
+    for row in rows:
+        template = _template_of(row.get('CIRCUIT', ''))
+        if template is None or not row.get('DIM_FULL') or not row.get('DIM_RES'):
+            continue
+        h_full, w_full, _ = map(int, row['DIM_FULL'].split('*'))
+        h_resize, w_resize, _ = map(int, row['DIM_RES'].split('*'))
+        predicted = analytic_constraints(template, h_full, w_full, h_resize, w_resize)
+        ratios.setdefault(template, []).append((predicted, int(row['CONSTRAINTS'])))
+    for template, pairs in ratios.items():
+        model['scale'][template] = sum(p * c for p, c in pairs) / sum(p * p for p, _ in pairs)
+
+    for stage in STAGES:
+        for measure in ('TIME', 'MEMORY'):
+            xs, ys = [], []
+            for row in rows:
+                value = row.get(f'{stage}_{measure}', '')
+                if value not in ('', 'None') and row.get('CONSTRAINTS'):
+                    xs.append(int(row['CONSTRAINTS']))
+                    ys.append(float(value))
+            coefficients = _fit_power_law(xs, ys)
+            if coefficients is not None:
+                model['stages'][f'{stage}_{measure}'] = coefficients
+
+    if output_path is not None:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w') as outfile:
+            json.dump(model, outfile, indent=2)
+    return model
+
+
+def load_cost_model(model_path=COST_MODEL_PATH):
+    """
+    Load the fitted cost model
+    :param model_path: path to the json of the model
+    :return: dictionary with the model, None if it was never fitted
+    """
+    if not os.path.isfile(model_path):
+        return None
+    with open(model_path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def predict_constraints(template, h_full, w_full, h_resize, w_resize, model=None):
+    """
+    Predict the constraints of a template, the analytic count is corrected by the fitted scale if available
+    :return: predicted number of constraints
+    """
+    constraints = analytic_constraints(template, h_full, w_full, h_resize, w_resize)
+    if model is not None and template in model['scale']:
+        constraints *= model['scale'][template]
+    return int(round(constraints))
+
+
+def predict_stage(constraints, stage, measure, model):
+    """
+    Predict time (seconds) or memory (KB) of a stage from the constraints
+    :param stage: one of STAGES
+    :param measure: 'TIME' or 'MEMORY'
+    :return: predicted value, None if the model has no fit for the stage
+    """
+    if model is None or f'{stage}_{measure}' not in model['stages']:
+        return None
+    a, b = model['stages'][f'{stage}_{measure}']
+    return a * constraints ** b
+
+
+def predict_costs(template, h_full, w_full, h_resize, w_resize, model=None):
+    """
+    Predict constraints, and time and memory of every stage of a circuit
+    :return: dictionary with CONSTRAINTS and <STAGE>_<TIME|MEMORY> keys, as the csv produced by the prover
+    """
+    constraints = predict_constraints(template, h_full, w_full, h_resize, w_resize, model)
+    costs = {'CONSTRAINTS': constraints}
+    for stage in STAGES:
+        for measure in ('TIME', 'MEMORY'):
+            costs[f'{stage}_{measure}'] = predict_stage(constraints, stage, measure, model)
+    return costs
+
+
+def select_ptau_power(constraints, public_signals=0):
+    """
+    Smallest power of tau that can hold the circuit, the Groth16 domain must contain constraints and public signals
+    :param constraints: number of constraints
+    :param public_signals: number of public signals
+    :return: power k of the 2^k powers of tau
+    """
+    return max(1, math.ceil(math.log2(constraints + public_signals + 1)))
+
+
+def planner_cost_fn(template, step=(1, 1), model=None):
+    """
+    Build the cost function of the tile planner from the model, the cost of a stage is its predicted time
+    (or the constraints, for every stage, when the time of some stage was never measured)
+    :param template: name of the template
+    :param step: sampling step of the resize along height and width
+    :param model: fitted cost model
+    :return: function from a tile shape to a dictionary with compile, setup and prove cost
+    """
+    def cost_fn(shape):
+        h_resize, w_resize = (shape[0] - 1) // step[0] + 1, (shape[1] - 1) // step[1] + 1
+        constraints = predict_constraints(template, shape[0], shape[1], h_resize, w_resize, model)
+        costs = {key: predict_stage(constraints, stage, 'TIME', model)
+                 for key, stage in (('compile', 'COMPILE'), ('setup', 'SETUP'), ('prove', 'PROVER'))}
+        if None in costs.values():
+            return {key: constraints for key in costs}
+        return costs
+    return cost_fn
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
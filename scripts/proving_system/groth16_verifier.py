@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import secrets
+from scripts.proving_system.bn254 import (CURVE_ORDER, FQ12_ONE, final_exponentiation, fq12_mul, fq12_pow,
+                                          g1_is_on_curve, g1_msm, g1_mul, g1_neg, g2_in_subgroup,
+                                          g2_is_on_curve, miller_loop, prepare_g2)
+
+# verification keys by sha256 of vkey.json, tiles of the same shape share the key and its precomputation
+_VKEYS = {}
+
+
+def _g1(coordinates):
+    """
+    G1 point from the projective coordinates of snarkjs ["x", "y", "z"], z is 1 or 0 (infinity)
+    """
+    x, y, z = map(int, coordinates)
+    if z == 0:
+        return None
+    if z != 1:
+        raise ValueError('Only affine G1 points are supported')
+    return (x, y)
+
+
+def _g2(coordinates):
+    """
+    G2 point from the projective coordinates of snarkjs [["x0", "x1"], ["y0", "y1"], ["z0", "z1"]]
+    """
+    (x0, x1), (y0, y1), z = [[int(c) for c in pair] for pair in coordinates]
+    if z == [0, 0]:
+        return None
+    if z != [1, 0]:
+        raise ValueError('Only affine G2 points are supported')
+    return ((x0, x1), (y0, y1))
+
+
+def load_vkey(vkey_path):
+    """
+    Load a verification key of snarkjs and precompute the lines of beta, gamma, delta and e(alpha, beta)
+    :param vkey_path: path to vkey.json
+    :return: dictionary with the points of the key and the precomputation
+    """
+    with open(vkey_path, 'rb') as vkey_file:
+        content = vkey_file.read()
+    key = hashlib.sha256(content).hexdigest()
+    if key not in _VKEYS:
+        vkey = json.loads(content)
+        if vkey.get('protocol') != 'groth16' or vkey.get('curve') != 'bn128':
+            raise ValueError(f'{vkey_path} is not a groth16 bn128 verification key')
+        points = {'alpha': _g1(vkey['vk_alpha_1']),
+                  'beta': _g2(vkey['vk_beta_2']),
+                  'gamma': _g2(vkey['vk_gamma_2']),
+                  'delta': _g2(vkey['vk_delta_2']),
+                  'ic': [_g1(point) for point in vkey['IC']]}
+        if not all(map(g1_is_on_curve, [points['alpha']] + points['ic'])) or \
+                not all(map(g2_is_on_curve, (points['beta'], points['gamma'], points['delta']))):
+            raise ValueError(f'{vkey_path} has points that are not on the curve')
+        points['key'] = key
+        points['gamma_lines'] = prepare_g2(points['gamma'])
+        points['delta_lines'] = prepare_g2(points['delta'])
+        points['alphabeta'] = final_exponentiation(miller_loop([(points['alpha'], prepare_g2(points['beta']))]))
+        _VKEYS[key] = points
+    return _VKEYS[key]
+
+
+def load_proof(proof_path, public_path):
+    """
+    Load proof and public signals of snarkjs
+    :return: tuple with the points (A, B, C) and the list of public signals, None if they are malformed
+    """
+    with open(proof_path, 'r') as proof_file:
+        proof = json.load(proof_file)
+    with open(public_path, 'r') as public_file:
+        public = [int(signal) for signal in json.load(public_file)]
+    a, b, c = _g1(proof['pi_a']), _g2(proof['pi_b']), _g1(proof['pi_c'])
+    if not g1_is_on_curve(a) or not g1_is_on_curve(c) or b is None or not g2_in_subgroup(b):
+        return None
+    if not all(0 <= signal < CURVE_ORDER for signal in public):
+        return None
+    return (a, b, c), public
+
+
+def verify_batch(triples):
+    """
+    Verify many Groth16 proofs with one randomized multi pairing: for random r_i it checks
+    prod e(r_i*A_i, B_i) = prod e(alpha, beta)^(sum r_i) * e(sum r_i*vk_x_i, gamma) * e(sum r_i*C_i, delta),
+    the linear combinations are grouped by verification key, so the public signals of all the tiles with the same
+    key cost a single multi scalar multiplication
+    :param triples: list of (vkey path, public path, proof path) as written by snarkjs
+    :return: True if all the proofs are valid
+    """
+    groups = {}
+    pairs = []
+    for i, (vkey_path, public_path, proof_path) in enumerate(triples):
+        vkey = load_vkey(vkey_path)
+        loaded = load_proof(proof_path, public_path)
+        if loaded is None or len(loaded[1]) + 1 != len(vkey['ic']):
+            return False
+        (a, b, c), public = loaded
+        # the first proof does not need a random weight
+        r = 1 if i == 0 else secrets.randbits(128)
+        pairs.append((g1_mul(a, r), prepare_g2(b)))
+
+        group = groups.setdefault(vkey['key'], {'vkey': vkey, 'r': 0, 'scalars': [0] * len(vkey['ic']),
+                                                'c': [], 'weights': []})
+        group['r'] += r
+        group['scalars'][0] += r
+        for j, signal in enumerate(public):
+            group['scalars'][j + 1] += r * signal
+        group['c'].append(c)
+        group['weights'].append(r)
+
+    target = FQ12_ONE
+    for group in groups.values():
+        vkey = group['vkey']
+        vk_x = g1_msm(vkey['ic'], group['scalars'])
+        pairs.append((g1_neg(vk_x), vkey['gamma_lines']))
+        pairs.append((g1_neg(g1_msm(group['c'], group['weights'])), vkey['delta_lines']))
+        target = fq12_mul(target, fq12_pow(vkey['alphabeta'], group['r'] % CURVE_ORDER))
+
+    return final_exponentiation(miller_loop(pairs)) == target
+
+
+def verify(vkey_path, public_path, proof_path):
+    """
+    Verify a single Groth16 proof of snarkjs
+    :return: True if the proof is valid
+    """
+    return verify_batch([(vkey_path, public_path, proof_path)])
+
+
+def verify_many(triples):
+    """
+    Verify many proofs with the same interface of VerifierPool.verify_many: one batched check and, only if it
+    fails, a check of every proof to find the invalid ones
+    :param triples: list of (vkey path, public path, proof path)
+    :return: iterator over (index of the triple, (ok, error))
+    """
+    triples = list(triples)
+    batched = verify_batch(triples)
+    for i, triple in enumerate(triples):
+        ok = batched or verify(*triple)
+        yield i, (ok, None if ok else 'invalid proof')
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+# Poseidon over the scalar field of BN254 with the parameters of circomlib (x^5 S-box, 8 full rounds),
+# the round constants and the MDS matrix are generated with the Grain LFSR of the reference implementation
+# (generate_parameters_grain.sage 1 0 254 t 8 R_P p), which is what circomlib's poseidon_constants were built from.
+
+from functools import lru_cache
+from operator import mul
+import numpy as np
+from scripts.proving_system.bn254 import CURVE_ORDER
+
+# GLOBAL_FIELD_P of circom
+P = CURVE_ORDER
+ROUNDS_F = 8
+# partial rounds of circomlib for t = 2 ... 17
+ROUNDS_P = (56, 57, 56, 60, 60, 63, 64, 63, 60, 66, 60, 65, 70, 60, 64, 68)
+# inputs of a block of SpongeHash, Poseidon(16)
+SPONGE_WIDTH = 16
+# 18 bits steps of the Grain LFSR computed at a time
+GRAIN_BATCH = 1 << 14
+
+
+def _grain_elements(t, rounds_p):
+    """
+    Field sized integers from the Grain LFSR seeded with the field, S-box, field size, width and rounds: the first
+    160 bits are discarded, then for each pair of bits the second one is kept only if the first one is 1
+    :return: generator of 254 bits integers
+    """
+    state = int(f'01{0:04b}{254:012b}{t:012b}{ROUNDS_F:010b}{rounds_p:010b}' + '1' * 30, 2)
+    skip, pending = 160, ''
+    while True:
+        # the taps are at least 18 bits apart, so 18 bits of the 80 bits register are updated at once
+        chunks = []
+        for _ in range(GRAIN_BATCH):
+            bits = (state ^ state >> 11 ^ state >> 24 ^ state >> 39 ^ state >> 49 ^ state >> 62) & 0x3FFFF
+            state = (state << 18 | bits) & ((1 << 80) - 1)
+            chunks.append(bits)
+        raw = np.frombuffer(''.join(f'{bits:018b}' for bits in chunks)[skip:].encode(), dtype=np.uint8)
+        skip = 0
+        kept = raw[1::2][raw[0::2] == ord('1')]
+        pending += kept.tobytes().decode()
+        for start in range(0, len(pending) - 253, 254):
+            yield int(pending[start:start + 254], 2)
+        pending = pending[len(pending) - len(pending) % 254:]
+
+
+@lru_cache(maxsize=None)
+def poseidon_constants(t):
+    """
+    Round constants and MDS matrix of Poseidon with t field elements of state
+    :param t: width of the permutation, number of inputs + 1
+    :return: tuple with the (ROUNDS_F + ROUNDS_P) * t round constants and the t x t matrix
+    """
+    if not 2 <= t <= len(ROUNDS_P) + 1:
+        raise ValueError(f'Poseidon is defined for 1 to {len(ROUNDS_P)} inputs, not {t - 1}')
+    elements = _grain_elements(t, ROUNDS_P[t - 2])
+    constants = []
+    while len(constants) < (ROUNDS_F + ROUNDS_P[t - 2]) * t:
+        value = next(elements)
+        if value < P:
+            constants.append(value)
+    # Cauchy matrix 1 / (x_i + y_j)
+    xs_ys = [next(elements) % P for _ in range(2 * t)]
+    matrix = tuple(tuple(pow(x + y, P - 2, P) for y in xs_ys[t:]) for x in xs_ys[:t])
+    return tuple(constants), matrix
+
+
+def _inverse(matrix):
+    """
+    Inverse of a square matrix over the field, by Gauss-Jordan elimination
+    """
+    n = len(matrix)
+    rows = [list(row) + [int(i == j) for j in range(n)] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next(i for i in range(col, n) if rows[i][col] % P)
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        inverse_pivot = pow(rows[col][col], P - 2, P)
+        rows[col] = [value * inverse_pivot % P for value in rows[col]]
+        for i in range(n):
+            if i != col and rows[i][col]:
+                factor = rows[i][col]
+                rows[i] = [(value - factor * pivot_value) % P for value, pivot_value in zip(rows[i], rows[col])]
+    return [row[n:] for row in rows]
+
+
+def _mat_mul(a, b):
+    return [[sum(x * y for x, y in zip(row, col)) % P for col in zip(*b)] for row in a]
+
+
+@lru_cache(maxsize=None)
+def partial_rounds(t):
+    """
+    Equivalent form of the partial rounds (appendix B of the Poseidon paper): the constants added to the elements
+    without S-box are carried to the next round, and each MDS matrix is split in a dense matrix, carried to the next
+    round, and a sparse one [[a, v], [w, I]], so that a partial round costs 2t multiplications instead of t^2
+    :param t: width of the permutation
+    :return: tuple with the round constants of the full rounds (the first full round after the partial ones with
+             the carried constants), the constant of the first element of each partial round, the sparse matrices
+             as (a, v, w) and the dense matrix applied after the last partial round
+    """
+    constants, matrix = poseidon_constants(t)
+    half = ROUNDS_F // 2
+    rounds_p = ROUNDS_P[t - 2]
+    rounds = [list(constants[r * t:(r + 1) * t]) for r in range(ROUNDS_F + rounds_p)]
+
+    scalars = []
+    for r in range(half, half + rounds_p):
+        carry = [sum(m * c for m, c in zip(row[1:], rounds[r][1:])) % P for row in matrix]
+        rounds[r + 1] = [(c + k) % P for c, k in zip(rounds[r + 1], carry)]
+        scalars.append(rounds[r][0])
+
+    # with M = [[m, r], [c, M_hat]] the matrices of the k-th partial round are a = m, v = r M_hat^k,
+    # w = M_hat^-(k+1) c, and the dense matrix left after the last one is [[1, 0], [0, M_hat^rounds_p]]
+    block = [list(row[1:]) for row in matrix[1:]]
+    inverse = _inverse(block)
+    v, w = list(matrix[0][1:]), [row[0] for row in matrix[1:]]
+    power = [[int(i == j) for j in range(t - 1)] for i in range(t - 1)]
+    sparse = []
+    for _ in range(rounds_p):
+        w = [sum(map(mul, row, w)) % P for row in inverse]
+        sparse.append((matrix[0][0], tuple(v), tuple(w)))
+        v = [sum(map(mul, v, col)) % P for col in zip(*block)]
+        power = _mat_mul(block, power)
+    dense = [[1] + [0] * (t - 1)] + [[0] + row for row in power]
+    full = tuple(tuple(rounds[r]) for r in list(range(half)) + list(range(half + rounds_p, ROUNDS_F + rounds_p)))
+    return full, tuple(scalars), tuple(sparse), tuple(tuple(row) for row in dense)
+
+
+def permutation(state):
+    """
+    Poseidon permutation
+    :param state: list of t field elements
+    :return: permuted state
+    """
+    t = len(state)
+    _, matrix = poseidon_constants(t)
+    full, scalars, sparse, dense = partial_rounds(t)
+    half = ROUNDS_F // 2
+
+    def full_round(state, constants, matrix):
+        state = [pow(s + c, 5, P) for s, c in zip(state, constants)]
+        return [sum(map(mul, row, state)) % P for row in matrix]
+
+    for r in range(half):
+        state = full_round(state, full[r], matrix)
+    for scalar, (a, v, w) in zip(scalars, sparse):
+        first = pow(state[0] + scalar, 5, P)
+        rest = state[1:]
+        state = [(a * first + sum(map(mul, v, rest))) % P] + [(x * first + s) % P for x, s in zip(w, rest)]
+    state = [sum(map(mul, row, state)) % P for row in dense]
+    for r in range(half, ROUNDS_F):
+        state = full_round(state, full[r], matrix)
+    return state
+
+
+def poseidon(inputs, n_outs=1):
+    """
+    Poseidon hash of circomlib (PoseidonEx with a zero initial state)
+    :param inputs: list of 1 to 16 field elements
+    :param n_outs: number of outputs
+    :return: the hash, or the list of the first n_outs elements of the state if n_outs > 1
+    """
+    state = permutation([0] + [value % P for value in inputs])
+    return state[0] if n_outs == 1 else state[:n_outs]
+
+
+def sponge_hash(elements):
+    """
+    Hash of SpongeHash (poseidon_sponge.circom): a first block of 16 inputs, then blocks of the previous hash and
+    15 inputs, the last block is padded with zeros. As in the circuit, when the number of inputs is a multiple of 16
+    the last hash is returned without absorbing the remaining inputs.
+    :param elements: list of field elements
+    :return: the hash
+    """
+    block, hash_value = [], None
+    for element in elements:
+        block.append(element)
+        if len(block) == SPONGE_WIDTH:
+            hash_value = poseidon(block)
+            block = [hash_value]
+    if len(elements) % SPONGE_WIDTH == 0:
+        return hash_value
+    return poseidon(block + [0] * (SPONGE_WIDTH - len(block)))
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
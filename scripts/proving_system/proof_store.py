@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+from scripts.proving_system.circuit_cache import circuit_key
+from scripts.proving_system.zkey_store import SNARKJS_DIR, file_sha256
+
+STORE_DIR = 'output/proof_store'
+PROOF_FILES = ('proof.json', 'public.json', 'verification_key.json')
+
+
+def tile_key(tile, shape, circuit_path, proof_input):
+    """
+    Compute the key of the proof of a tile: the hash of its pixels, of the rendered circuit and of the parameters,
+    a tile is proved again only when one of them changes
+    :param tile: uint8 array of the tile
+    :param shape: shape of the tile [HFULL, WFULL, HRESIZE, WRESIZE]
+    :param circuit_path: path to the rendered circom file of the tile
+    :param proof_input: dictionary with commitment randomness and ciminion keys
+    :return: hex digest of the inputs of the tile
+    """
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(tile).tobytes())
+    digest.update(json.dumps({'tile_shape': list(tile.shape), 'shape': list(shape),
+                              'circuit': circuit_key(circuit_path),
+                              'randomness': str(proof_input['commitment_randomness']),
+                              'keys': [str(key) for key in proof_input['ciminion_keys']]}).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_manifest(image_name):
+    """
+    Load the manifest of the proofs of an image
+    :param image_name: name of the image
+    :return: dictionary from the tile index (as a string) to its key and the sha256 of its proof files
+    """
+    manifest_file = Path(STORE_DIR) / image_name / 'manifest.json'
+    if not manifest_file.is_file():
+        return {}
+    with open(manifest_file, 'r') as json_file:
+        return json.load(json_file)
+
+
+def save_manifest(image_name, manifest):
+    """
+    Save the manifest of the proofs of an image, written in a temporary file and then renamed
+    :param image_name: name of the image
+    :param manifest: dictionary from the tile index to its entry (see load_manifest)
+    """
+    manifest_file = Path(STORE_DIR) / image_name / 'manifest.json'
+    os.makedirs(manifest_file.parent, exist_ok=True)
+    with open(f'{manifest_file}.tmp', 'w') as json_file:
+        json.dump(manifest, json_file)
+    os.replace(f'{manifest_file}.tmp', manifest_file)
+
+
+def restore_proof(image_name, tile, key, circuit_name, manifest, contract=None):
+    """
+    Restore proof.json, public.json and verification_key.json of a tile into the snarkjs folder of its circuit,
+    if the manifest has the same key and the stored files match their sha256
+    :param image_name: name of the image
+    :param tile: index of the tile
+    :param key: key of the tile (see tile_key)
+    :param circuit_name: name of the circuit of the tile
+    :param manifest: manifest of the image
+    :param contract: if not None, name of the solidity verifier that must be stored with the proof
+    :return: True if the proof was restored, False if the tile must be proved
+    """
+    entry = manifest.get(str(tile))
+    tile_dir = Path(STORE_DIR) / image_name / f'tile_{tile}'
+    if entry is None or entry['key'] != key:
+        return False
+    if contract is not None and f'Verifier_{contract}.sol' not in entry['files']:
+        return False
+    for file_name, sha256 in entry['files'].items():
+        if not (tile_dir / file_name).is_file() or file_sha256(tile_dir / file_name) != sha256:
+            return False
+
+    # copied and not linked, prover.sh overwrites proof.json and public.json in place
+    snarkjs_dir = Path(SNARKJS_DIR.format(circuit_name))
+    os.makedirs(snarkjs_dir, exist_ok=True)
+    for file_name in entry['files']:
+        if (snarkjs_dir / file_name).exists():
+            os.remove(snarkjs_dir / file_name)
+        shutil.copy2(tile_dir / file_name, snarkjs_dir / file_name)
+    return True
+
+
+def store_proof(image_name, tile, key, circuit_name, manifest, contract=None):
+    """
+    Store the proof of a tile produced by prover.sh and record it in the manifest
+    :param image_name: name of the image
+    :param tile: index of the tile
+    :param key: key of the tile (see tile_key)
+    :param circuit_name: name of the circuit of the tile
+    :param manifest: manifest of the image, updated and saved
+    :param contract: if not None, name of the solidity verifier of the tile, stored with the proof
+    """
+    snarkjs_dir = Path(SNARKJS_DIR.format(circuit_name))
+    tile_dir = Path(STORE_DIR) / image_name / f'tile_{tile}'
+    file_names = list(PROOF_FILES)
+    if contract is not None:
+        file_names.append(f'Verifier_{contract}.sol')
+
+    shutil.rmtree(tile_dir, ignore_errors=True)
+    os.makedirs(tile_dir)
+    for file_name in file_names:
+        shutil.copy2(snarkjs_dir / file_name, tile_dir / file_name)
+    manifest[str(tile)] = {'key': key, 'files': {file_name: file_sha256(tile_dir / file_name) for file_name in file_names}}
+    save_manifest(image_name, manifest)
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import collections
+import json
+import os
+from pathlib import Path
+import numpy as np
+
+# public.bin: a header followed by one 32 bytes little endian limb for each public signal of public.json
+MAGIC = b'PSIG'
+VERSION = 1
+LIMB_SIZE = 32
+SECTIONS = ('hash', 'commitment', 'tag', 'ciphertext', 'low_image', 'nonce', 'iv')
+HEADER = np.dtype([('magic', 'S4'),
+                   ('version', '<u4'),
+                   ('count', '<u8'),
+                   ('source_size', '<u8'),
+                   ('source_mtime', '<i8'),
+                   ('sections', '<u8', (len(SECTIONS), 2)),
+                   ('reserved', 'V16')])
+
+PublicSignals = collections.namedtuple('PublicSignals', 'limbs sections')
+PublicSignals.__doc__ = """
+Memory mapped public signals: limbs is a (count, 32) uint8 array, sections maps each name of SECTIONS to (start, length)
+"""
+
+
+def section_index(count, tile_shape):
+    """
+    Sections of the public signals of a tile: hash, commitment, tag, one ciphertext for each byte of the tile,
+    the low resolution image, nonce and IV
+    :param count: number of public signals
+    :param tile_shape: height and width of the tile
+    :return: dictionary from section name to (start, length)
+    """
+    ciphertext = tile_shape[0] * tile_shape[1] * 3
+    low_image = count - 5 - ciphertext
+    if low_image < 0:
+        raise ValueError(f'{count} public signals are too few for a tile of shape {tile_shape[:2]}')
+    lengths = (1, 1, 1, ciphertext, low_image, 1, 1)
+    starts = np.cumsum((0,) + lengths[:-1])
+    return {name: (int(start), length) for name, start, length in zip(SECTIONS, starts, lengths)}
+
+
+def sidecar_path(public_path):
+    return Path(public_path).with_suffix('.bin')
+
+
+def write_public_bin(public_path, tile_shape):
+    """
+    Convert public.json into the binary sidecar public.bin, parsing the decimal strings only once
+    :param public_path: path to public.json
+    :param tile_shape: height and width of the tile
+    :return: path to public.bin
+    """
+    stat = os.stat(public_path)
+    with open(public_path, 'r') as public_file:
+        public = json.load(public_file)
+
+    header = np.zeros(1, dtype=HEADER)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['count'] = len(public)
+    header['source_size'] = stat.st_size
+    header['source_mtime'] = stat.st_mtime_ns
+    header['sections'] = [section_index(len(public), tile_shape)[name] for name in SECTIONS]
+
+    bin_path = sidecar_path(public_path)
+    tmp_path = bin_path.with_suffix('.bin.tmp')
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(header.tobytes())
+        outfile.write(b''.join(int(signal).to_bytes(LIMB_SIZE, 'little') for signal in public))
+    os.replace(tmp_path, bin_path)
+    return bin_path
+
+
+def _read_header(bin_path):
+    with open(bin_path, 'rb') as bin_file:
+        header = np.frombuffer(bin_file.read(HEADER.itemsize), dtype=HEADER)
+    if len(header) == 0 or header['magic'][0] != MAGIC or header['version'][0] != VERSION:
+        return None
+    return header[0]
+
+
+def public_bin(public_path, tile_shape):
+    """
+    Path of the binary sidecar of public.json, converted if it doesn't exist or public.json has changed since
+    :param public_path: path to public.json
+    :param tile_shape: height and width of the tile
+    :return: path to public.bin
+    """
+    bin_path = sidecar_path(public_path)
+    if bin_path.is_file():
+        header = _read_header(bin_path)
+        stat = os.stat(public_path)
+        if header is not None and header['source_size'] == stat.st_size and header['source_mtime'] == stat.st_mtime_ns:
+            return bin_path
+    return write_public_bin(public_path, tile_shape)
+
+
+def load_public_signals(public_path, tile_shape):
+    """
+    Memory map the public signals of a tile, from the binary sidecar
+    :param public_path: path to public.json
+    :param tile_shape: height and width of the tile
+    :return: PublicSignals
+    """
+    bin_path = public_bin(public_path, tile_shape)
+    header = _read_header(bin_path)
+    limbs = np.memmap(bin_path, dtype=np.uint8, mode='r', offset=HEADER.itemsize, shape=(int(header['count']), LIMB_SIZE))
+    sections = {name: (int(start), int(length)) for name, (start, length) in zip(SECTIONS, header['sections'])}
+    return PublicSignals(limbs, sections)
+
+
+def section(signals, name):
+    """
+    Limbs of a section of the public signals
+    :return: (length, 32) uint8 array
+    """
+    start, length = signals.sections[name]
+    return signals.limbs[start:start + length]
+
+
+def to_uint8(limbs):
+    """
+    Values of limbs that hold bytes, i.e. the pixels of the low resolution image
+    :return: uint8 array, None if some value doesn't fit in a byte
+    """
+    if np.any(limbs[:, 1:]):
+        return None
+    return np.asarray(limbs[:, 0])
+
+
+def to_ints(limbs):
+    """
+    Values of limbs as python integers
+    """
+    return [int.from_bytes(limb.tobytes(), 'little') for limb in limbs]
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
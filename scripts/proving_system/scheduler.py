@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from scripts.proving_system.cost_model import load_cost_model, predict_constraints, predict_stage
+from scripts.proving_system.circuit_cache import cache_lock, circuit_key, restore_circuit, store_circuit
+from scripts.proving_system.zkey_store import STORE_DIR, restore_zkey, store_zkey, zkey_key
+from scripts.resource_monitor import run_stage
+from scripts.util import append_to_csv, extract_contraints
+
+R1CS_PATH = 'output/compiled_circuit/compiled_{0}/{0}.r1cs'
+# per stage records (with the RSS sampled over time) of each tile
+RECORDS_DIR = 'output/stage_records'
+
+# Linear estimate of the peak memory (KB) of a snarkjs/rapidsnark stage, it is deliberately pessimistic
+BASE_MEMORY_KB = 512 * 1024
+MEMORY_PER_CONSTRAINT_KB = 4
+
+
+def estimate_memory(constraints, stage=None, model=None):
+    """
+    Estimate the peak memory of a proving stage from the number of constraints of the circuit
+    :param constraints: number of constraints of the circuit (0 if still unknown)
+    :param stage: stage of the cost model (COMPILE, SETUP, PROVER, VERIFIER)
+    :param model: fitted cost model, if None (or without the stage) a linear estimate is used
+    :return: estimated peak memory in KB
+    """
+    predicted = None if stage is None or constraints == 0 else predict_stage(constraints, stage, 'MEMORY', model)
+    if predicted is not None:
+        return int(predicted)
+    return BASE_MEMORY_KB + MEMORY_PER_CONSTRAINT_KB * constraints
+
+
+def available_memory():
+    """
+    Read the memory currently available on the machine
+    :return: available memory in KB
+    """
+    with open('/proc/meminfo', 'r') as meminfo:
+        for line in meminfo:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1])
+    return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
+class MemoryBudget(object):
+    """
+    Counting semaphore over KB of RAM, a stage starts only when its estimated peak fits in the remaining budget.
+    A stage bigger than the whole budget is admitted alone.
+    """
+    def __init__(self, budget_kb):
+        self.budget = budget_kb
+        self.available = budget_kb
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, kb):
+        kb = min(kb, self.budget)
+        with self.condition:
+            self.condition.wait_for(lambda: self.available >= kb)
+            self.available -= kb
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.available += kb
+                self.condition.notify_all()
+
+
+def prove_tile(job, pot_path, budget, contract=None, verbose=True, model=None):
+    """
+    Run compile (with witness generation), setup, prove and verify for a single tile
+    :param job: dictionary with the circuit name, the input path and the shape [HFULL, WFULL, HRESIZE, WRESIZE]
+    :param pot_path: path to the powers of tau file
+    :param budget: MemoryBudget shared by all the tiles
+    :param contract: if not None, name of the solidity verifier to export
+    :param verbose: if True prints the measures of each stage
+    :param model: fitted cost model, used to estimate the memory of each stage
+    :return: dictionary with the measures of the tile
+    """
+    name = job['circuit']
+    shape = job['shape']
+    template = job.get('template')
+    predicted = 0 if template is None else predict_constraints(template, *shape, model=model)
+
+    records = {}
+
+    def stage(label, command, memory_kb):
+        with budget.reserve(memory_kb):
+            record, stderr = run_stage(command)
+        records[label] = record._asdict()
+        if record.returncode != 0:
+            raise ValueError(f'[{name}] {label} failed with exit code {record.returncode}:\n{stderr}')
+        if verbose:
+            print(f'[{name}] {label}: {record.wall_time:.2f} seconds '
+                  f'(user {record.user_time:.2f}, sys {record.sys_time:.2f}), {record.peak_rss} KB')
+        return record.wall_time, record.peak_rss
+
+    circuit_path = f'./circuits/benchmark/{name}.circom'
+    key = circuit_key(circuit_path)
+    with cache_lock(key):
+        cached = restore_circuit(circuit_path, key)
+        if not cached:
+            t_c, m_c = stage('Compile Circuit', f'./scripts/compile_circuit.sh {circuit_path} {job["input"]}', estimate_memory(predicted, 'COMPILE', model))
+            store_circuit(circuit_path, key)
+    if cached:
+        t_c, m_c = stage('Witness (cached circuit)', f'./scripts/compile_circuit.sh {circuit_path} {job["input"]} --skip-compile', estimate_memory(predicted, 'COMPILE', model))
+    constraints = extract_contraints(R1CS_PATH.format(name))
+    if verbose:
+        print(f'[{name}] Constraints: {constraints}')
+
+    zkey = zkey_key(R1CS_PATH.format(name), pot_path)
+    with cache_lock(zkey, STORE_DIR):
+        reused = restore_zkey(name, zkey)
+        if not reused:
+            t_sp, m_sp = stage('Setup Prover', f'./scripts/proving_system/setup_prover.sh {name} {pot_path}', estimate_memory(constraints, 'SETUP', model))
+            store_zkey(name, zkey)
+    if reused:
+        t_sp, m_sp = 0.0, 0.0
+        if verbose:
+            print(f'[{name}] Setup Prover: reused proving key {zkey[:12]}')
+    t_p, m_p = stage('Prover', f'./scripts/proving_system/prover.sh {name}', estimate_memory(constraints, 'PROVER', model))
+    verifier = f'./scripts/proving_system/verifier.sh {name}'
+    if contract is not None:
+        verifier += f' --generate-contract {contract}'
+    t_v, m_v = stage('Verifier', verifier, estimate_memory(constraints, 'VERIFIER', model))
+
+    os.makedirs(RECORDS_DIR, exist_ok=True)
+    with open(os.path.join(RECORDS_DIR, f'{name}.json'), 'w') as outfile:
+        json.dump(records, outfile)
+
+    def cpu_time(label):
+        return records[label]['user_time'] + records[label]['sys_time'] if label in records else 0.0
+
+    return {'CIRCUIT': name,
+            'INPUT SIZE': shape[0] * shape[1],
+            'RESIZE SIZE': shape[2] * shape[3],
+            'CONSTRAINTS': constraints,
+            'COMPILE_CACHED': cached,
+            'COMPILE_TIME': t_c,
+            'COMPILE_MEMORY': m_c,
+            'COMPILE_CPU_TIME': cpu_time('Compile Circuit') + cpu_time('Witness (cached circuit)'),
+            'SETUP_REUSED': reused,
+            'SETUP_TIME': t_sp,
+            'SETUP_MEMORY': m_sp,
+            'SETUP_CPU_TIME': cpu_time('Setup Prover'),
+            'PROVER_TIME': t_p,
+            'PROVER_MEMORY': m_p,
+            'PROVER_CPU_TIME': cpu_time('Prover'),
+            'VERIFIER_TIME': t_v,
+            'VERIFIER_MEMORY': m_v,
+            'VERIFIER_CPU_TIME': cpu_time('Verifier'),
+            'DIM_FULL': f'{shape[0]}*{shape[1]}*3',
+            'DIM_RES': f'{shape[2]}*{shape[3]}*3'}
+
+
+def prove_tiles(jobs, pot_path, workers=None, memory_budget=None, csv_path=None, contract=None, verbose=True, on_proved=None):
+    """
+    Prove the tiles concurrently, while a tile is generating its witness another one can be in the prover.
+    Every stage is admitted against a RAM budget, so that concurrent snarkjs/rapidsnark processes do not swap.
+    :param jobs: list (or iterable) of dictionaries with circuit, input, shape and optionally template and tile index
+                 of each tile (see prove_tile), the position in jobs is used when the index is missing
+    :param pot_path: path to the powers of tau file
+    :param workers: number of tiles processed at the same time, the number of cores as default
+    :param memory_budget: RAM budget in KB, 80% of the available memory as default
+    :param csv_path: if not None, the measures of each tile are appended to this csv file
+    :param contract: if not None, name of the solidity verifier to export for each tile
+    :param verbose: if True prints the measures of each stage
+    :param on_proved: if not None, called with the tile index, the job and the contract name of each proved tile
+    :return: list with the measures of each tile, in the order of the tile index
+    """
+    workers = os.cpu_count() if workers is None else workers
+    memory_budget = int(available_memory() * 0.8) if memory_budget is None else memory_budget
+    budget = MemoryBudget(memory_budget)
+    model = load_cost_model()
+
+    measures = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # jobs can be a generator, each tile is submitted as soon as it is produced
+        futures = {}
+        for n, job in enumerate(jobs):
+            i = job.get('tile', n)
+            tile_contract = None if contract is None else f'{contract}_{i}'
+            futures[executor.submit(prove_tile, job, pot_path, budget, tile_contract, verbose, model)] = (i, job, tile_contract)
+        for future in as_completed(futures):
+            i, job, tile_contract = futures[future]
+            measures[i] = future.result()
+            if csv_path is not None:
+                append_to_csv(measures[i], csv_path)
+            if on_proved is not None:
+                on_proved(i, job, tile_contract)
+    return [measures[i] for i in sorted(measures)]
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import queue
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+WORKER_SCRIPT = Path(__file__).resolve().parent / 'verifier_worker.js'
+
+
+def _node_env():
+    """
+    Environment of the workers, snarkjs is resolved from the global node_modules as the snarkjs command
+    """
+    env = dict(os.environ)
+    global_root = subprocess.getoutput('npm root -g').strip()
+    env['NODE_PATH'] = os.pathsep.join(p for p in (env.get('NODE_PATH', ''), global_root) if p)
+    return env
+
+
+class VerifierWorker(object):
+    """
+    Long lived node process that verifies Groth16 proofs with snarkjs, loading the curve only once
+    """
+    def __init__(self, env=None):
+        self.process = subprocess.Popen(['node', str(WORKER_SCRIPT)],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        text=True,
+                                        env=_node_env() if env is None else env)
+
+    def verify(self, vkey_path, public_path, proof_path):
+        """
+        Verify a proof
+        :return: tuple with True if the proof is valid and the error message of snarkjs (None if there is none)
+        """
+        job = {'vkey': str(vkey_path), 'public': str(public_path), 'proof': str(proof_path)}
+        self.process.stdin.write(json.dumps(job) + '\n')
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise ValueError('The verifier worker terminated unexpectedly')
+        result = json.loads(line)
+        return result['ok'], result.get('error')
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+class VerifierPool(object):
+    """
+    Pool of long lived verifier workers, the proofs are verified concurrently across the cores
+    """
+    def __init__(self, workers=None):
+        workers = os.cpu_count() if workers is None else workers
+        env = _node_env()
+        self.workers = [VerifierWorker(env) for _ in range(workers)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def _verify(self, triple):
+        worker = self.idle.get()
+        try:
+            return worker.verify(*triple)
+        finally:
+            self.idle.put(worker)
+
+    def verify_many(self, triples):
+        """
+        Verify many proofs
+        :param triples: iterable of (vkey path, public path, proof path)
+        :return: iterator over (index of the triple, (ok, error)) in order of completion
+        """
+        with ThreadPoolExecutor(max_workers=len(self.workers)) as executor:
+            futures = {executor.submit(self._verify, triple): i for i, triple in enumerate(triples)}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -0,0 +1,31 @@
+#!/usr/bin/env node
+// Long lived Groth16 verifier: the curve is built once by snarkjs and reused for every proof.
+// It reads one job per line from stdin {"vkey": path, "public": path, "proof": path}
+// and writes one result per line to stdout {"ok": bool, "error": string}.
+
+const fs = require('fs');
+const readline = require('readline');
+const snarkjs = require('snarkjs');
+
+const readJson = (path) => JSON.parse(fs.readFileSync(path, 'utf8'));
+
+const lines = readline.createInterface({input: process.stdin});
+let queue = Promise.resolve();
+
+lines.on('line', (line) => {
+    queue = queue.then(async () => {
+        let result;
+        try {
+            const job = JSON.parse(line);
+            const ok = await snarkjs.groth16.verify(readJson(job.vkey), readJson(job.public), readJson(job.proof));
+            result = {ok: ok === true};
+        } catch (error) {
+            result = {ok: false, error: String(error)};
+        }
+        process.stdout.write(JSON.stringify(result) + '\n');
+    });
+});
+
+lines.on('close', () => {
+    queue.then(() => process.exit(0));
+});
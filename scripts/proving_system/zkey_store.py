@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from scripts.proving_system.circuit_cache import link_file
+
+STORE_DIR = 'output/zkey_store'
+SNARKJS_DIR = 'output/snarkjs_circuit/{0}'
+KEY_FILES = ('circuit_final.zkey', 'verification_key.json')
+ZKEY_MAGIC = b'zkey'
+
+_ptau_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=1 << 24):
+    """
+    Compute the sha256 of a file reading it in chunks
+    :param path: path to the file
+    :param chunk_size: number of bytes read at each step
+    :return: hex digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ptau_sha256(pot_path):
+    """
+    Compute the sha256 of the powers of tau file, the digest is remembered by path, size and modification time
+    since hashing a 2^28 ptau takes minutes
+    :param pot_path: path to the powers of tau file
+    :return: hex digest of the powers of tau file
+    """
+    pot_path = Path(pot_path).resolve()
+    stat = pot_path.stat()
+    signature = f'{pot_path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+    # called by every tile thread: the ptau is hashed once and the other threads read the result
+    with _ptau_lock:
+        hashes_file = Path(STORE_DIR) / 'ptau_hashes.json'
+        hashes = {}
+        if hashes_file.is_file():
+            with open(hashes_file, 'r') as json_file:
+                hashes = json.load(json_file)
+
+        if signature not in hashes:
+            hashes[signature] = file_sha256(pot_path)
+            os.makedirs(STORE_DIR, exist_ok=True)
+            # unique temporary name, other processes may write the same file
+            fd, tmp_path = tempfile.mkstemp(dir=STORE_DIR, prefix='ptau_hashes.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as json_file:
+                json.dump(hashes, json_file)
+            os.replace(tmp_path, hashes_file)
+        return hashes[signature]
+
+
+def zkey_key(r1cs_path, pot_path):
+    """
+    Compute the key of the proving key, every circuit with the same r1cs and ptau shares it
+    :param r1cs_path: path to the r1cs of the circuit
+    :param pot_path: path to the powers of tau file
+    :return: hex digest of the pair (r1cs hash, ptau hash)
+    """
+    return hashlib.sha256(f'{file_sha256(r1cs_path)}:{ptau_sha256(pot_path)}'.encode('utf-8')).hexdigest()
+
+
+def check_entry(entry):
+    """
+    Check the integrity of an entry of the store against its manifest, so that a truncated zkey is never reused
+    :param entry: path to the entry
+    :return: True if every file has the size and the sha256 recorded in the manifest
+    """
+    manifest_file = Path(entry) / 'manifest.json'
+    if not manifest_file.is_file():
+        return False
+    with open(manifest_file, 'r') as json_file:
+        manifest = json.load(json_file)
+
+    for file_name in KEY_FILES:
+        path = Path(entry) / file_name
+        if file_name not in manifest or not path.is_file():
+            return False
+        if path.stat().st_size != manifest[file_name]['size']:
+            return False
+        if file_sha256(path) != manifest[file_name]['sha256']:
+            return False
+
+    with open(Path(entry) / KEY_FILES[0], 'rb') as zkey:
+        return zkey.read(len(ZKEY_MAGIC)) == ZKEY_MAGIC
+
+
+def restore_zkey(circuit_name, key):
+    """
+    Restore circuit_final.zkey and verification_key.json from the store into the snarkjs folder of the circuit.
+    A corrupted entry is removed, so that the setup is run again.
+    :param circuit_name: name of the circuit
+    :param key: key of the proving key (see zkey_key)
+    :return: True if the keys were restored, False otherwise
+    """
+    entry = Path(STORE_DIR) / key
+    snarkjs_dir = Path(SNARKJS_DIR.format(circuit_name))
+    targets = [snarkjs_dir / file_name for file_name in KEY_FILES]
+
+    if not check_entry(entry):
+        shutil.rmtree(entry, ignore_errors=True)
+        # files linked by a previous restore must not be overwritten in place by the new setup
+        for target in targets:
+            if target.exists():
+                os.remove(target)
+        return False
+
+    os.makedirs(snarkjs_dir, exist_ok=True)
+    for file_name, target in zip(KEY_FILES, targets):
+        link_file(entry / file_name, target)
+    return True
+
+
+def store_zkey(circuit_name, key):
+    """
+    Store the proving and verification keys produced by setup_prover.sh, with a manifest for the integrity checks
+    :param circuit_name: name of the circuit
+    :param key: key of the proving key (see zkey_key)
+    """
+    entry = Path(STORE_DIR) / key
+    if check_entry(entry):
+        return
+
+    snarkjs_dir = Path(SNARKJS_DIR.format(circuit_name))
+    tmp_entry = Path(STORE_DIR) / f'{key}.tmp'
+    shutil.rmtree(tmp_entry, ignore_errors=True)
+    shutil.rmtree(entry, ignore_errors=True)
+    os.makedirs(tmp_entry)
+
+    manifest = {}
+    for file_name in KEY_FILES:
+        shutil.copy2(snarkjs_dir / file_name, tmp_entry / file_name)
+        manifest[file_name] = {'size': (tmp_entry / file_name).stat().st_size,
+                               'sha256': file_sha256(tmp_entry / file_name)}
+    with open(tmp_entry / 'manifest.json', 'w') as json_file:
+        json.dump(manifest, json_file)
+    os.rename(tmp_entry, entry)
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
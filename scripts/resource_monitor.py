@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import collections
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+PAGE_SIZE_KB = os.sysconf('SC_PAGE_SIZE') // 1024
+
+StageRecord = collections.namedtuple('StageRecord', 'command returncode wall_time user_time sys_time peak_rss samples')
+StageRecord.__doc__ = """
+Resources used by a stage: wall, user and sys time in seconds, peak RSS in KB of the whole process tree and
+the RSS of the tree sampled over time as a list of (seconds from the start, KB)
+"""
+
+
+def _children(pid):
+    """
+    Read the children of a process from procfs
+    """
+    children = []
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children', 'r') as children_file:
+            children = [int(child) for child in children_file.read().split()]
+    except OSError:
+        pass
+    return children
+
+
+def tree_rss(pid):
+    """
+    Resident memory of a process and of all its descendants
+    :param pid: pid of the root of the tree
+    :return: RSS in KB
+    """
+    rss = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/statm', 'r') as statm:
+                rss += int(statm.read().split()[1]) * PAGE_SIZE_KB
+        except OSError:
+            continue
+        stack.extend(_children(current))
+    return rss
+
+
+def run_stage(command, sample_interval=0.2, cwd=None):
+    """
+    Run a stage without a shell and account its resources: wall time, user/sys CPU and peak RSS from the rusage
+    of the process tree, and the RSS of the tree sampled over time
+    :param command: command to run, as a string (split like a shell would) or a list of arguments, a .sh script is
+    run with bash
+    :param sample_interval: seconds between two samples of the RSS
+    :param cwd: working directory of the command
+    :return: StageRecord of the stage, stderr of the command
+    """
+    args = shlex.split(command) if isinstance(command, str) else list(command)
+    # prover.sh and setup_prover.sh have no shebang, the shell used to run them
+    if args[0].endswith('.sh'):
+        args = ['bash'] + args
+    start = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=cwd)
+
+    samples = []
+    stop = threading.Event()
+
+    def sampler():
+        while not stop.wait(sample_interval):
+            samples.append((round(time.perf_counter() - start, 3), tree_rss(process.pid)))
+
+    sampling = threading.Thread(target=sampler, daemon=True)
+    sampling.start()
+
+    stderr = process.stderr.read().decode('utf-8', errors='replace')
+    process.stderr.close()
+    # wait4 gives the rusage of the child, which includes the descendants it has waited for
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall_time = time.perf_counter() - start
+    stop.set()
+    sampling.join()
+
+    peak_rss = max([rusage.ru_maxrss] + [rss for _, rss in samples])
+    record = StageRecord(command=' '.join(args),
+                         returncode=process.returncode,
+                         wall_time=wall_time,
+                         user_time=rusage.ru_utime,
+                         sys_time=rusage.ru_stime,
+                         peak_rss=peak_rss,
+                         samples=samples)
+    return record, stderr
+
+
+if __name__ == '__main__':
+    raise ValueError('This script is not meant to be run directly.')
@@ -1,18 +1,14 @@
+from contextlib import nullcontext
 from csv import DictWriter
 import json
 import os
 from pathlib import Path
+import re
 import secrets
 import subprocess
-import cv2
-import numpy as np
-import requests
-from pathlib import Path
-from alive_progress import alive_bar
-import re
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-import tensorflow as tf
-
+from scripts.resource_monitor import run_stage
+# numpy, cv2, requests, alive_progress and the verifiers are imported by the functions that use them, so the
+# short-lived CLIs (key management, verification) don't pay their import at startup
 
 GREEN_TEXT = "\033[32m"
 RESET_COLOR = "\033[0m"
@@ -28,22 +24,11 @@ def measure_command(command, time = True, memory = True):
 
     :return: A tuple containing the elapsed time (if time=True) and memory usage (if memory=True).
     """
-    command = f'/usr/bin/time -p -f "%e %M" {command} > /dev/null'
-
-    process = subprocess.Popen(command, 
-                               shell=True,
-                               stdout=subprocess.PIPE,
-                               stderr=subprocess.PIPE)
-    
-
-    command_output = process.communicate()[1].decode('utf-8')
-    print(command_output)
-    numbers = re.findall(r"(\d+\.\d+|\d+)", command_output)
-    t,mem =  tuple(numbers[-2:]) #command_output.split('\n')[0].split(' ')
-    t = float(t)
-    m = float(mem)
+    record, stderr = run_stage(command)
+    if stderr:
+        print(stderr)
     
-    return t if time else None, m if memory else None
+    return record.wall_time if time else None, record.peak_rss if memory else None
 
 def generate_circuit(info, circuit_template, id = None):
     """
@@ -77,12 +62,13 @@ def generate_random_image(height, width = None):
     :param width: Width of the image.
     :return: the random image.
     """
+    import numpy as np
     if width is None:
         width = height
     rimg =  np.random.randint(0, 256, size=(height, width, 3), dtype=np.uint8)
     return rimg
 
-def generate_input(output_path,f_height,f_width,r_height, r_width, commitment_randomness,master_keys):
+def generate_input(output_path,f_height,f_width,r_height, r_width, commitment_randomness,master_keys, image=None):
     """
     Generate the input for the circuit and save it to a json file
     :param output_path: path to the output file
@@ -90,19 +76,38 @@ def generate_input(output_path,f_height,f_width,r_height, r_width, commitment_ra
     :param low_image: low image
     :param commitment_randomness: randomness used to generate the commitment
     :param master_keys: list with the two master keys for the ciminion authenticated encryption scheme
+    :param image: image (or tile) of size f_height x f_width to prove, a random one if None
     """
 
-    img = generate_random_image(f_height,f_width)
+    img = generate_random_image(f_height,f_width) if image is None else image
     rsz = resize_image(img,r_height,r_width)
     json_input = {'master_key0':str(master_keys[0]),
                   'master_key1':str(master_keys[1]),
                   'nonce':str(generate_random_field_element()),
                   'IV':str(generate_random_field_element()),
-                  'randomness':str(commitment_randomness),
-                  'full_image':img.astype(str).tolist(), 
-                  'resize_image':rsz.astype(str).tolist() }
+                  'randomness':str(commitment_randomness)}
+    write_input(output_path, json_input, {'full_image':img, 'resize_image':rsz})
+
+def write_input(output_path, fields, images):
+    """
+    Stream the input of the circuit to a json file, the images are written row by row straight from their uint8
+    buffers as json numbers (accepted by the witness generator as the decimal strings), so the memory stays flat.
+    Each row is rendered by a single %-format of the whole row, without a python object per pixel.
+    :param output_path: path to the output file
+    :param fields: dictionary with the scalar signals (field elements as strings)
+    :param images: dictionary with the image signals (uint8 arrays of shape height x width x 3)
+    """
     with open(output_path, 'w') as outfile:
-        json.dump(json_input, outfile)
+        outfile.write('{' + ','.join(f'{json.dumps(k)}:{json.dumps(v)}' for k,v in fields.items()))
+        for n,(k,image) in enumerate(images.items()):
+            outfile.write(f'{"," if n > 0 or fields else ""}{json.dumps(k)}:[')
+            row_format = '[' + ','.join(['[' + ','.join(['%d'] * image.shape[2]) + ']'] * image.shape[1]) + ']'
+            for i in range(image.shape[0]):
+                if i > 0:
+                    outfile.write(',')
+                outfile.write(row_format % tuple(image[i].ravel().tolist()))
+            outfile.write(']')
+        outfile.write('}')
 
 def parse_operation(operation):
     """
@@ -135,19 +140,9 @@ def resize_image(image, height, width):
         raise ValueError(f"The image cannot be resized to the given dimensions.\n The height must be one of this numbers: {divisors_h}\
                           \n The width must be one of this numbers: {divisors_w}")
 
-    return (
-        (
-            tf.compat.v1.image.resize(
-                image,
-                [height, width],
-                align_corners=True,
-                method=tf.image.ResizeMethod.BILINEAR,
-            )
-        )
-        .numpy()
-        .round()
-        .astype(np.uint8)
-    )
+    import numpy as np
+    from scripts.image_ops.image_transformation import bilinear_resize
+    return bilinear_resize(image, height, width).round().astype(np.uint8)
 
 def append_to_csv(row,csv_path):
     """
@@ -193,6 +188,7 @@ def upload_proof(proof_path, JWT, image_info, lowimage_path, verbose=False):
     :param verbose: if True prints the IPFS link
     :return: IPFS link
     """
+    import requests
     PINATA_BASE_URL = "https://api.pinata.cloud"
     PINATA_UPLOAD_URL = f"{PINATA_BASE_URL}/pinning/pinFileToIPFS"
     PINATA_WATCH_URL = f"https://gateway.pinata.cloud/ipfs/"
@@ -240,11 +236,19 @@ def extract_contraints(r1cs_file):
     infos = subprocess.check_output(f'snarkjs r1cs info {r1cs_file}',shell=True).decode('utf-8')
     return int(re.search(r'# of Constraints: (\d+)',infos).group(1))
 
-def verify_proof(proof_path):
+def verify_proof(proof_path, workers=None, native=False):
     """
     This function verify the proof locally
     :param proof_path: path to the proof file 
+    :param workers: number of verifier workers, by default one per core (at most one per tile)
+    :param native: verify all the tiles with one batched pairing check in python, without snarkjs
     """
+    import cv2
+    import numpy as np
+    from alive_progress import alive_bar
+    from scripts.proving_system import groth16_verifier
+    from scripts.proving_system.public_signals import load_public_signals, section, to_uint8
+    from scripts.proving_system.verifier_pool import VerifierPool
     print("Verification process ...")
     main_directory = Path(proof_path)
 
@@ -258,28 +262,40 @@ def verify_proof(proof_path):
     low_image_file = main_directory / 'low_image.png'
     if not low_image_file.exists():
         raise ValueError("The file low_image.png doesn't exist in the proof directory")
-    low_image = cv2.imread(f'{low_image_file}',cv2.IMREAD_COLOR).flatten()
+    low_image_grid = cv2.imread(f'{low_image_file}',cv2.IMREAD_COLOR)
+    low_image = low_image_grid.flatten()
     print('Image info and low image loaded ...')
     
 
     dir_list = [x for x in main_directory.iterdir() if x.is_dir()]
-    
+    triples = [(d / 'vkey.json', d / 'public.json', d / 'proof.json') for d in dir_list]
+    workers = min(workers or os.cpu_count(), len(dir_list)) or 1
 
-    with alive_bar(total=len(dir_list), bar = 'smooth',spinner = 'waves2') as bar:
-        for i in range(len(dir_list)):
+    pool = nullcontext() if native else VerifierPool(workers)
+    with pool, alive_bar(total=len(dir_list), bar = 'smooth',spinner = 'waves2') as bar:
+        results = groth16_verifier.verify_many(triples) if native else pool.verify_many(triples)
+        for i, (verified, error) in results:
             subdirectory = dir_list[i]
-            verify_proof = subprocess.getoutput(f'snarkjs groth16 verify {subdirectory}/vkey.json {subdirectory}/public.json {subdirectory}/proof.json')
             
-            with open(f'{subdirectory}/public.json', 'r') as file:
-                public = json.load(file)
             tiles_idx = int(subdirectory.name.split('_')[1])
-            low_image_offset = 3 + image_info['tiles_size'][tiles_idx][0] * image_info['tiles_size'][tiles_idx][1] * 3
-            check_low_image = np.array_equal(np.array(public[low_image_offset:low_image_offset + len(low_image)]).astype(np.uint8),low_image.astype(np.uint8))  
+            signals = load_public_signals(subdirectory / 'public.json', image_info['tiles_size'][tiles_idx])
+            if 'tiles_offset' in image_info:
+                # grid tiles start on sampled pixels, their resize is the piece of the low image at the same offset
+                (y, x), (h, w) = image_info['tiles_offset'][tiles_idx], image_info['tiles_size'][tiles_idx]
+                step_h, step_w = image_info['resize_step']
+                expected_low_image = low_image_grid[y // step_h:y // step_h + (h - 1) // step_h + 1,
+                                                    x // step_w:x // step_w + (w - 1) // step_w + 1].flatten()
+                public_low_image = to_uint8(section(signals, 'low_image'))
+            else:
+                expected_low_image = low_image
+                low_image_offset = signals.sections['low_image'][0]
+                public_low_image = to_uint8(signals.limbs[low_image_offset:low_image_offset + len(low_image)])
+            check_low_image = public_low_image is not None and np.array_equal(public_low_image, expected_low_image.astype(np.uint8))
 
             bar()
             bar.text(f'Tile [{tiles_idx+1}]:{GREEN_TEXT} √{RESET_COLOR}')
 
-            if 'OK!' not in verify_proof or not check_low_image:
-                raise ValueError(f'[Tile {subdirectory}] not verified')
+            if not verified or not check_low_image:
+                raise ValueError(f'[Tile {subdirectory}] not verified' + (f': {error}' if error else ''))
     print(f'\nAll tiles verified {GREEN_TEXT}√{RESET_COLOR}\n')
 
@@ -29,6 +29,8 @@ contract PrivacyPreservingNFT is ERC721URIStorage, Ownable{
     PoseidonT4 poseidon;
     Secp256k1 secp;
 
+    event BidPlaced(uint256 indexed tokenId, address indexed bidder, uint256[2] publickey, uint256 amount);
+
     constructor(address _poseidonLib, address _secp256k1) ERC721("PrivacyPreservingNFT","PPN") Ownable(msg.sender) {
         token_ID = 0;
         poseidon = PoseidonT4(_poseidonLib);
@@ -102,18 +104,21 @@ contract PrivacyPreservingNFT is ERC721URIStorage, Ownable{
             payable(token_bid.bidder).transfer(token_bid.amount);
 
         id_to_token[tokenId].highest_bid = Bid(msg.sender,bidder_publickey,msg.value);
+        emit BidPlaced(tokenId, msg.sender, bidder_publickey, msg.value);
     }
 
     /*
     * @dev accept a bid on a token
     * @param tokenId id of the token
     * @param enc_keys encrypted keys of the token in order to decrypt the keys used to encrypt the token
+    * @param bidder_publickey public key the keys were encrypted for, it must be the one of the highest bid
     */
-    function accept_bid(uint256 tokenId, uint256[3] memory enc_keys) public onlyNFTOwner(tokenId) solvedNFT(tokenId){
+    function accept_bid(uint256 tokenId, uint256[3] memory enc_keys, uint256[2] memory bidder_publickey) public onlyNFTOwner(tokenId) solvedNFT(tokenId){
         Token memory token = id_to_token[tokenId];
         Bid memory token_bid = token.highest_bid;
 
         require(token_bid.bidder != address(0),"no bids recived yet");
+        require(token_bid.publickey[0] == bidder_publickey[0] && token_bid.publickey[1] == bidder_publickey[1], "a higher bid was placed");
         id_to_token[tokenId].highest_bid = Bid(address(0),[uint256(0),uint256(0)],0);
         id_to_token[tokenId].publickey = token_bid.publickey;
         id_to_token[tokenId].on_sale = false;
@@ -1,7 +1,8 @@
 #https://github.com/zcash-hackworks/zcash-test-vectors
 
 #!/usr/bin/env python3
-from .sapling_utils import i2lebsp, leos2ip, i2leosp
+from functools import lru_cache
+from .sapling_utils import cldiv, i2lebsp, leos2ip, i2leosp
 
 
 import pdb
@@ -20,6 +21,8 @@ r_j = 2**252 + 27742317777372353535851937790883648493
 #
 
 class FieldElement(object):
+    __slots__ = ('t', 's', 'm')
+
     def __init__(self, t, s, modulus, strict=False):
         if strict and not (0 <= s and s < modulus):
             raise ValueError
@@ -41,17 +44,11 @@ class FieldElement(object):
         return self * a.inv()
 
     def exp(self, e):
-        e = format(e, '0256b')
-        ret = self.t(1)
-        for c in e:
-            ret = ret * ret
-            if int(c):
-                ret = ret * self
-        return ret
+        return self.t(pow(self.s, e, self.m))
 
     def inv(self):
-
-        return self.exp(self.m - 2)
+        # raises ValueError for 0
+        return self.t(pow(self.s, -1, self.m))
 
     def bits(self, l):
         return i2lebsp(l, self.s)
@@ -65,6 +62,8 @@ class FieldElement(object):
 
 
 class Fq(FieldElement):
+    __slots__ = ()
+
     @staticmethod
     def from_bytes(buf):
         return Fq(leos2ip(buf), strict=True)
@@ -79,56 +78,14 @@ class Fq(FieldElement):
         return(self.s)
 
     def sqrt(self):
-        # Tonelli-Shank's algorithm for q mod 16 = 1
-        # https://eprint.iacr.org/2012/685.pdf (page 12, algorithm 5)
-
-        a = self.exp(qm1d2)
-        if a == self.ONE:
-            c = Fq(10238227357739495823651030575849232062558860180284477541189508159991286009131)
-            # 21888242871839275222246405745257275088548364400416034343698204186575808495617 // 8589934591
-            # = 2548126838447922149288273404183046483985545449471285076948056144584
-
-            r = self.exp(2548126838447922149288273404183046483985545449471285076948056144584)
-
-            # 21888242871839275222246405745257275088548364400416034343698204186575808495617 // 4294967296
-            # = 5096253676302562286669017222071363378443840053029366383258766538131
-            t = self.exp(5096253676302562286669017222071363378443840053029366383258766538131)
-            # math.log2(4294967296)
-            # 32.0
-            m = 32
-
-            # 7: while b != 1 do
-            while t != self.ONE:
-                # 8: Find least integer k >= 0 such that b^(2^k) == 1
-                i = 1
-                t2i = t * t
-                while t2i != self.ONE:
-                    t2i = t2i * t2i
-                    i += 1
-                assert i < m
-
-                # 9:
-                # w <- z^(2^(v-k-1))
-                for _ in range(0, m - i - 1):
-                    c = c * c
-                # b <- bz
-                r = r * c
-                # z <- w^2
-                c = c * c
-                # x <- xw
-                t = t * c
-                # v <- k
-                m = i
-            assert r * r == self
-            return r
-        elif a == self.MINUS_ONE:
-            print("return none")
-            return None
-        
-        #return self.ZERO
+        # Tonelli-Shank's algorithm with the precomputed constants of q, None if self is not a square
+        r = _sqrt(self.s)
+        return None if r is None else Fq(r)
 
 
 class Fr(FieldElement):
+    __slots__ = ()
+
     def __init__(self, s, strict=False):
         FieldElement.__init__(self, Fr, s, r_j, strict=strict)
     def __str__(self):
@@ -142,6 +99,37 @@ r_j = 27360303589799094027808007181571593860768139721585672592002156609484473730
 
 qm1d2 = (21888242871839275222246405745257275088548364400416034343698204186575808495617 - 1)//2
 
+# Tonelli-Shanks constants: q - 1 = 2^SQRT_S * SQRT_Q with SQRT_Q odd, and SQRT_C = z^SQRT_Q for the smallest
+# quadratic non residue z (https://eprint.iacr.org/2012/685.pdf, algorithm 5)
+SQRT_S = ((q_j - 1) & -(q_j - 1)).bit_length() - 1
+SQRT_Q = (q_j - 1) >> SQRT_S
+SQRT_C = pow(next(z for z in range(2, q_j) if pow(z, qm1d2, q_j) == q_j - 1), SQRT_Q, q_j)
+
+
+def _sqrt(a):
+    a %= q_j
+    if a == 0:
+        return 0
+    # w = a^((Q-1)/2), so that r = a^((Q+1)/2) and t = a^Q with a single exponentiation
+    w = pow(a, (SQRT_Q - 1) // 2, q_j)
+    r = a * w % q_j
+    t = r * w % q_j
+    m, c = SQRT_S, SQRT_C
+    while t != 1:
+        # least i such that t^(2^i) == 1, a non residue reaches m
+        i, t2i = 1, t * t % q_j
+        while t2i != 1:
+            t2i = t2i * t2i % q_j
+            i += 1
+            if i == m:
+                return None
+        b = pow(c, 1 << (m - i - 1), q_j)
+        m, c = i, b * b % q_j
+        t = t * c % q_j
+        r = r * b % q_j
+    return r
+
+
 JUBJUB_A = Fq(168700)
 JUBJUB_D = Fq(168696)
 JUBJUB_COFACTOR = Fr(8)
@@ -177,6 +165,8 @@ assert Fq.ONE * Fq.ZERO == Fq.ZERO
 #
 
 class Point(object):
+    __slots__ = ('u', 'v')
+
     @staticmethod
     def from_bytes(buf):
         assert len(buf) == 32
@@ -204,38 +194,18 @@ class Point(object):
         self.v = v
 
     def __add__(self, a):
-        (u1, v1) = (self.u, self.v)
-        (u2, v2) = (a.u, a.v)
-
-        u3 = (u1*v2 + v1*u2) / (Fq.ONE + JUBJUB_D*u1*u2*v1*v2)
-        v3 = (v1*v2 - JUBJUB_A*u1*u2) / (Fq.ONE - JUBJUB_D*u1*u2*v1*v2)
-        return Point(u3, v3)
+        return _to_affine(_add_extended(_to_extended(self), _to_extended(a)))
 
     def double(self):
-        return self + self
+        return _to_affine(_double_extended(_to_extended(self)))
 
     def __mul__(self, s):
-        # something weird is happenign here. When it ry to format int
-        #s = '1000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000001'
-        # as binary it gives me
-        # 0001111100110111011000110001101000111101100111001011111110101100100011110101111101110100100100101111110011111101010011110100010110101111100110000010111101101111000011001000110100011110110111010111100000111100000101001101100000011111111111111111111111111111 256  
-        # not sure what is causing this but will make a bug when i create repo
-        # in the mean time you can gen test input by putting s = '10000...0001'
-        s = format(s.s, '0253b')
-        ret = self.ZERO
-        for c in s:
-            ret = ret.double()
-               
-            if int(c):
-                ret = ret + self
-            
-        return ret
+        # windowed NAF in extended coordinates, a single inversion at the end
+        return _to_affine(_mul_extended(_to_extended(self), s.s))
 
     def __bytes__(self):
-        buf = bytes(self.v)
-        if self.u.s % 2 == 1:
-            buf = buf[:31] + bytes([buf[31] | (1 << 7)])
-        return buf
+        # v in little endian with the parity of u in the top bit
+        return (self.v.s | (self.u.s & 1) << 255).to_bytes(32, byteorder='little')
 
     def __eq__(self, a):
         return self.u == a.u and self.v == a.v
@@ -255,8 +225,249 @@ class Point(object):
 
 
 
+#
+# Extended coordinates (x, y, t, z) with x = X/Z, y = Y/Z, x*y = T/Z, on plain integers mod q.
+# The formulas are the ones of Hisil, Wong, Carter, Dawson "Twisted Edwards curves revisited" (add-2008-hwcd,
+# dbl-2008-hwcd) for a generic a, they are complete since a is a square and d is not.
+#
+
+WNAF_WIDTH = 5
+FIXED_BASE_WINDOW = 8
+SCALAR_BITS = 254
+
+_A = JUBJUB_A.s
+_D = JUBJUB_D.s
+_IDENTITY = (0, 1, 0, 1)
+
+
+def _to_extended(p):
+    return (p.u.s, p.v.s, p.u.s * p.v.s % q_j, 1)
+
+
+def _to_affine(p):
+    x, y, _, z = p
+    assert z % q_j != 0
+    z_inv = pow(z, -1, q_j)
+    return Point(Fq(x * z_inv), Fq(y * z_inv))
+
+
+def _add_extended(p1, p2):
+    x1, y1, t1, z1 = p1
+    x2, y2, t2, z2 = p2
+    a = x1 * x2 % q_j
+    b = y1 * y2 % q_j
+    c = _D * t1 % q_j * t2 % q_j
+    d = z1 * z2 % q_j
+    e = ((x1 + y1) * (x2 + y2) - a - b) % q_j
+    f = d - c
+    g = d + c
+    h = b - _A * a
+    return (e * f % q_j, g * h % q_j, e * h % q_j, f * g % q_j)
+
+
+def _double_extended(p):
+    x1, y1, _, z1 = p
+    a = x1 * x1 % q_j
+    b = y1 * y1 % q_j
+    c = 2 * z1 * z1 % q_j
+    d = _A * a % q_j
+    e = ((x1 + y1) * (x1 + y1) - a - b) % q_j
+    g = d + b
+    f = g - c
+    h = d - b
+    return (e * f % q_j, g * h % q_j, e * h % q_j, f * g % q_j)
+
+
+def _neg_extended(p):
+    x, y, t, z = p
+    return (-x % q_j, y, -t % q_j, z)
+
+
+def _wnaf(k, width=WNAF_WIDTH):
+    """
+    Windowed non adjacent form of a scalar, least significant digit first: every non zero digit is odd and
+    smaller than 2^(width-1) in absolute value, and it is followed by at least width-1 zeros
+    """
+    digits = []
+    while k:
+        digit = 0
+        if k & 1:
+            digit = k & ((1 << width) - 1)
+            if digit >= 1 << (width - 1):
+                digit -= 1 << width
+            k -= digit
+        digits.append(digit)
+        k >>= 1
+    return digits
+
+
+def _mul_extended(p, k, width=WNAF_WIDTH):
+    # odd multiples p, 3p, ..., (2^(width-1) - 1)p
+    odd = [p]
+    twice = _double_extended(p)
+    for _ in range((1 << (width - 2)) - 1):
+        odd.append(_add_extended(odd[-1], twice))
+
+    ret = _IDENTITY
+    for digit in reversed(_wnaf(k, width)):
+        ret = _double_extended(ret)
+        if digit > 0:
+            ret = _add_extended(ret, odd[digit >> 1])
+        elif digit < 0:
+            ret = _add_extended(ret, _neg_extended(odd[-digit >> 1]))
+    return ret
+
+
+# Generator of EIP-2494 (https://eips.ethereum.org/EIPS/eip-2494)
+JUBJUB_GENERATOR = Point(Fq(995203441582195749578291179787384436505546430278305826713579947235728471134),
+                         Fq(5472060717959818805561601436314318772137091100104008585924551046643952123905))
+
+
+@lru_cache(maxsize=None)
+def _generator_table(window=FIXED_BASE_WINDOW):
+    # table[i][j] = j * 2^(window*i) * G, so that a multiple of G costs one addition per window and no doubling
+    table = []
+    base = _to_extended(JUBJUB_GENERATOR)
+    for _ in range(cldiv(SCALAR_BITS, window)):
+        row = [_IDENTITY, base]
+        for _ in range((1 << window) - 2):
+            row.append(_add_extended(row[-1], base))
+        table.append(row)
+        base = _add_extended(row[-1], base)
+    return table
+
+
+def generator_mul(s, window=FIXED_BASE_WINDOW):
+    """
+    Multiply the generator of EIP-2494 by a scalar with the precomputed table, same result of JUBJUB_GENERATOR * s
+    :param s: scalar, Fq or integer (reduced mod q as Fq)
+    :return: Point
+    """
+    return _to_affine(_generator_mul_extended((s if isinstance(s, FieldElement) else Fq(s)).s, window))
+
+
+def _generator_mul_extended(k, window=FIXED_BASE_WINDOW):
+    ret = _IDENTITY
+    mask = (1 << window) - 1
+    for row in _generator_table(window):
+        if k & mask:
+            ret = _add_extended(ret, row[k & mask])
+        k >>= window
+    return ret
+
+
+
+#
+# Batch APIs, many points are normalized with a single inversion
+#
+
+def batch_inverse(values, modulus=q_j):
+    """
+    Inverses of many integers with Montgomery's trick: one inversion and 3(n-1) multiplications
+    :param values: list of integers, not multiple of the modulus
+    :param modulus: prime modulus
+    :return: list of the inverses
+    """
+    prefix, acc = [], 1
+    for value in values:
+        if value % modulus == 0:
+            raise ValueError('0 has no inverse')
+        prefix.append(acc)
+        acc = acc * value % modulus
+    inv = pow(acc, -1, modulus)
+    ret = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        ret[i] = prefix[i] * inv % modulus
+        inv = inv * values[i] % modulus
+    return ret
+
+
+def batch_inv(elements):
+    """
+    Inverses of many field elements of the same field, as [e.inv() for e in elements]
+    """
+    if not elements:
+        return []
+    t, m = elements[0].t, elements[0].m
+    return [t(value) for value in batch_inverse([e.s for e in elements], m)]
+
+
+def batch_to_affine(points):
+    """
+    Normalize many points in extended coordinates with a single inversion
+    :param points: list of (x, y, t, z) tuples
+    :return: list of Point
+    """
+    z_inv = batch_inverse([p[3] for p in points])
+    return [Point(Fq(x * zi), Fq(y * zi)) for (x, y, _, _), zi in zip(points, z_inv)]
+
+
+def batch_mul(points, scalars):
+    """
+    Multiply each point by its scalar, as [p * s for p, s in zip(points, scalars)], normalized together
+    :param points: list of Point
+    :param scalars: list of Fq
+    :return: list of Point
+    """
+    return batch_to_affine([_mul_extended(_to_extended(p), s.s) for p, s in zip(points, scalars)])
+
+
+def batch_generator_mul(scalars, window=FIXED_BASE_WINDOW):
+    """
+    Multiply the generator of EIP-2494 by each scalar, as [generator_mul(s) for s in scalars], normalized together
+    :param scalars: list of Fq or integers
+    :return: list of Point
+    """
+    return batch_to_affine([_generator_mul_extended((s if isinstance(s, FieldElement) else Fq(s)).s, window)
+                            for s in scalars])
+
+
+def encode_points(points):
+    """
+    Compress many points in a contiguous buffer, 32 bytes per point as bytes(Point)
+    :param points: list of Point or of (u, v) tuples of integers
+    :return: bytes of length 32 * len(points)
+    """
+    buf = bytearray(32 * len(points))
+    for i, p in enumerate(points):
+        u, v = (p.u.s, p.v.s) if isinstance(p, Point) else p
+        buf[32 * i:32 * (i + 1)] = (v % q_j | (u % q_j & 1) << 255).to_bytes(32, byteorder='little')
+    return bytes(buf)
+
+
+def decode_points(buf):
+    """
+    Decompress a contiguous buffer of 32 bytes points, as Point.from_bytes on each of them: the denominators of u^2
+    are inverted together and the square roots use the precomputed Tonelli-Shanks constants
+    :param buf: bytes-like object of length multiple of 32
+    :return: list of (u, v) tuples of integers, None for the invalid points
+    """
+    buf = memoryview(buf).cast('B')
+    if len(buf) % 32 != 0:
+        raise ValueError(f'The buffer is not made of 32 bytes points: {len(buf)} bytes')
+    a, d = JUBJUB_A.s, JUBJUB_D.s
+    encoded = [int.from_bytes(buf[i:i + 32], byteorder='little') for i in range(0, len(buf), 32)]
+    vs = [value & ((1 << 255) - 1) for value in encoded]
+    # u^2 = (v^2 - 1) / (d v^2 - a), a zero denominator (or v >= q) is an invalid point
+    denominators = [(v * v * d - a) % q_j if v < q_j else 0 for v in vs]
+    valid = [i for i, denominator in enumerate(denominators) if denominator]
+    inverses = dict(zip(valid, batch_inverse([denominators[i] for i in valid])))
+
+    points = [None] * len(vs)
+    for i, inverse in inverses.items():
+        v = vs[i]
+        u = _sqrt((v * v - 1) * inverse)
+        if u is None:
+            continue
+        if u % 2 != encoded[i] >> 255:
+            u = (q_j - u) % q_j
+        points[i] = (u, v)
+    return points
+
+
 Point.ZERO = Point(Fq.ZERO, Fq.ONE)
 
+
 assert Point.ZERO + Point.ZERO == Point.ZERO
 
 
@@ -50,6 +50,7 @@ def get_DH_key_sec256(private_key, public_key):
 def generate_keys(DH_key,number_of_keys = 3):
     """
     Generate a list of keys from a Diffie-Hellman key, for the BabyJubjub curve.
+    The keys are the ones deny_transfer derives, keccak256(abi.encodePacked(DH_x, DH_y, uint8 i)).
     :param DH_key: Diffie-Hellman key (x,y) tuple of integers
     :param number_of_keys: Number of keys to generate
     :return: List of keys (integers)
@@ -59,7 +60,7 @@ def generate_keys(DH_key,number_of_keys = 3):
         keccak_hash = keccak_256()
         keccak_hash.update(DH_key[0].to_bytes(32, byteorder='big'))
         keccak_hash.update(DH_key[1].to_bytes(32, byteorder='big'))
-        keccak_hash.update(i.to_bytes(32, byteorder='big'))
+        keccak_hash.update(i.to_bytes(1, byteorder='big'))
         bytes_key = keccak_hash.digest()
         keys.append(int.from_bytes(bytes_key, byteorder='big'))
     return keys
@@ -42,7 +42,7 @@ def main():
     print("DH", DH_KEY)
     print("SESS_KEY", sess_key)
     print("ENC", ENC_KEYS)
-    gas = accept_bid(contract, ENC_KEYS, account, token_first)
+    gas = accept_bid(contract, ENC_KEYS, account, token_first, BUYER_PUBLICKEY)
     print("Gas for accepting a bid", gas)
 
     gas = confirm_transfer(contract, token_first, buyer_account)
@@ -54,7 +54,7 @@ def main():
     DH_KEY = get_DH_key_sec256(BUYER_PRIVATEKEY, NFT_PUBLICKEY)
     sess_key = generate_keys(DH_KEY)
     ENC_KEYS = otp_message(sess_key, [6378989569467225567309534547136303686644419554308519296145321495775954212673, CIM_KEYS[1], CIM_KEYS[2]])
-    accept_bid(contract, ENC_KEYS, account, token_second)
+    accept_bid(contract, ENC_KEYS, account, token_second, BUYER_PUBLICKEY)
 
     gas = deny_transfer(contract, token_second, BUYER_PRIVATEKEY, buyer_account)
     print("Gas for denying a bid", gas)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import json
+import math
+import os
+import random
+import sys
+import click
+from ape import accounts, project
+from ape.cli import ConnectedProviderCommand
+from .util import append_to_csv
+from .contract_management import generate_keypair_sec256, generate_keys, get_DH_key_sec256, otp_message
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gas_baseline.json')
+PERCENTILES = (50, 90, 99)
+PATHS = ('confirm', 'deny', 'change_publickey')
+
+
+def percentile(values, q):
+    """
+    :param values: sorted list
+    :param q: percentile in [0, 100]
+    :return: nearest-rank percentile of values
+    """
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def run_lifecycle(mints, bids, paths):
+    """
+    Deploy the contracts, mint the tokens, place the bids and end the sale of each token on one of the paths, in turn
+    :param mints: number of tokens minted
+    :param bids: number of increasing bids placed on each token
+    :param paths: paths of the tokens: confirm (accept_bid, confirm_transfer), deny (accept_bid, deny_transfer) or
+    change_publickey (the seller changes the key of the token and keeps it)
+    :return: dictionary from the function to the gas used by each of its transactions
+    """
+    seller, bidders = accounts.test_accounts[0], accounts.test_accounts[1:]
+    gas = {}
+
+    poseidon = project.PoseidonT4.deploy(sender=seller)
+    secp = project.Secp256k1.deploy(sender=seller)
+    contract = project.PrivacyPreservingNFT.deploy(poseidon, secp, sender=seller)
+    for name, deployed in (('deploy_PoseidonT4', poseidon), ('deploy_Secp256k1', secp),
+                           ('deploy_PrivacyPreservingNFT', contract)):
+        gas[name] = [deployed.receipt.gas_used]
+
+    def record(function, receipt):
+        gas.setdefault(function, []).append(receipt.gas_used)
+
+    for n in range(mints):
+        publickey, private_key = generate_keypair_sec256()
+        ciminion_keys = [random.getrandbits(253) for _ in range(3)]
+        token_id = contract.token_ID()
+        record('mint_token', contract.mint_token(seller, 'https://prova.com', publickey, poseidon.hash(ciminion_keys),
+                                                 sender=seller))
+
+        for amount in range(1, bids + 1):
+            bidder = bidders[(n + amount) % len(bidders)]
+            bidder_publickey, bidder_private_key = generate_keypair_sec256()
+            record('place_bid', contract.place_bid(token_id, bidder_publickey, sender=bidder, value=amount * 10 ** 9))
+
+        path = paths[n % len(paths)]
+        if path == 'change_publickey' or bids == 0:
+            record('change_publickey', contract.change_publickey(token_id, generate_keypair_sec256()[0], sender=seller))
+            continue
+        DH_key = get_DH_key_sec256(private_key, bidder_publickey)
+        record('accept_bid', contract.accept_bid(token_id, otp_message(generate_keys(DH_key), ciminion_keys),
+                                                 bidder_publickey, sender=seller))
+        if path == 'confirm':
+            record('confirm_transfer', contract.confirm_transfer(token_id, sender=bidder))
+        else:
+            record('deny_transfer', contract.deny_transfer(token_id, bidder_private_key, sender=bidder))
+    return gas
+
+
+def summarize(gas):
+    """
+    :param gas: dictionary from the function to the gas used by each of its transactions
+    :return: dictionary from the function to the number of calls, min, mean, percentiles and max of the gas used
+    """
+    summary = {}
+    for function, values in gas.items():
+        values = sorted(values)
+        summary[function] = {'calls': len(values), 'min': values[0], 'mean': round(sum(values) / len(values))}
+        summary[function].update({f'p{q}': percentile(values, q) for q in PERCENTILES})
+        summary[function]['max'] = values[-1]
+    return summary
+
+
+def over_baseline(summary, baseline, tolerance):
+    """
+    Compare the median and the max gas of each function with the baseline
+    :param tolerance: allowed relative increase, e.g. 0.01 for 1%
+    :return: list with the functions above the baseline, and why
+    """
+    regressions = []
+    for function, stats in summary.items():
+        for key in ('p50', 'max'):
+            reference = baseline.get(function, {}).get(key)
+            if reference is not None and stats[key] > reference * (1 + tolerance):
+                regressions.append(f'{function} {key} {stats[key]} > {reference}')
+    return regressions
+
+
+@click.command(cls=ConnectedProviderCommand)
+@click.option('--mints', type=int, default=12, help='number of tokens minted')
+@click.option('--bids', type=int, default=3, help='increasing bids placed on each token')
+@click.option('--paths', multiple=True, type=click.Choice(PATHS), default=PATHS,
+              help='paths that end the sale of the tokens, in turn (repeat the option for more paths)')
+@click.option('--baseline', 'baseline_path', default=BASELINE_PATH, help='json file with the gas baseline')
+@click.option('--seed', type=int, default=0, help='seed of the keys and of the commitments, the gas of deny_transfer '
+                                                   'and of the calldata depends on them')
+@click.option('--tolerance', type=float, default=0.0, help='allowed relative increase over the baseline, e.g. 0.01')
+@click.option('--update-baseline', is_flag=True, help='write the results as the new baseline')
+@click.option('--csv', 'csv_path', help='append the results to this csv file')
+def cli(mints, bids, paths, baseline_path, seed, tolerance, update_baseline, csv_path):
+    """
+    Gas used by each function of the NFT lifecycle on a local node (hardhat or anvil), with its percentiles,
+    exits with an error when a function costs more than its baseline
+    """
+    # generate_keypair_sec256 draws from random too
+    random.seed(seed)
+    summary = summarize(run_lifecycle(mints, bids, list(paths)))
+    for function, stats in summary.items():
+        print(f"[{function}] {stats['calls']} calls | min {stats['min']} | mean {stats['mean']} | " +
+              ' | '.join(f'p{q} {stats[f"p{q}"]}' for q in PERCENTILES) + f" | max {stats['max']}")
+        if csv_path is not None:
+            append_to_csv({'FUNCTION': function, 'MINTS': mints, 'BIDS': bids, 'PATHS': ' '.join(paths), 'SEED': seed,
+                           **{key.upper(): value for key, value in stats.items()}}, csv_path)
+
+    parameters = {'mints': mints, 'bids': bids, 'paths': list(paths), 'seed': seed}
+    if update_baseline:
+        with open(baseline_path, 'w') as baseline_file:
+            json.dump({'parameters': parameters, 'gas': summary}, baseline_file, indent=2)
+        print(f'Baseline written to {baseline_path}')
+        return
+    if not os.path.isfile(baseline_path):
+        print(f'No baseline in {baseline_path}, run with --update-baseline to store one')
+        sys.exit(1)
+    with open(baseline_path, 'r') as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline['parameters'] != parameters:
+        print(f"The baseline was measured with {baseline['parameters']}, run with the same parameters")
+        sys.exit(1)
+    regressions = over_baseline(summary, baseline['gas'], tolerance)
+    if regressions:
+        print(f'Over baseline: {regressions}')
+        sys.exit(1)
+    print('Gas within the baseline')
@@ -31,27 +31,21 @@ def inverse_mod(k, p):
     if k == 0:
         raise ZeroDivisionError('division by zero')
 
-    if k < 0:
-        # k ** -1 = p - (-k) ** -1  (mod p)
-        return p - inverse_mod(-k, p)
-
-    # Extended Euclidean algorithm.
-    s, old_s = 0, 1
-    t, old_t = 1, 0
-    r, old_r = p, k
-
-    while r != 0:
-        quotient = old_r // r
-        old_r, r = r, old_r - quotient * r
-        old_s, s = s, old_s - quotient * s
-        old_t, t = t, old_t - quotient * t
-
-    gcd, x, y = old_r, old_s, old_t
-
-    assert gcd == 1
-    assert (k * x) % p == 1
-
-    return x % p
+    return pow(k, -1, p)
+
+
+def batch_inverse_mod(values, p):
+    """Returns the inverses of the values modulo p with a single inversion (Montgomery's trick)."""
+    prefix, acc = [], 1
+    for value in values:
+        prefix.append(acc)
+        acc = acc * value % p
+    inv = inverse_mod(acc, p)
+    result = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        result[i] = prefix[i] * inv % p
+        inv = inv * values[i] % p
+    return result
 
 
 # Functions that work on curve points #########################################
@@ -68,6 +62,18 @@ def is_on_curve(point):
     return (y * y - x * x * x - curve.a * x - curve.b) % curve.p == 0
 
 
+def point_neg(point):
+    """Returns -point."""
+    assert is_on_curve(point)
+
+    if point is None:
+        # -0 = 0
+        return None
+
+    x, y = point
+    return (x, -y % curve.p)
+
+
 def point_add(point1, point2):
     """Returns the result of point1 + point2 according to the group law."""
     assert is_on_curve(point1)
@@ -80,53 +86,149 @@ def point_add(point1, point2):
         # point1 + 0 = point1
         return point1
 
-    x1, y1 = point1
-    x2, y2 = point2
+    return _to_affine(_jacobian_add_affine((point1[0], point1[1], 1), point2))
+
 
-    if x1 == x2 and y1 != y2:
-        # point1 + (-point1) = 0
+def scalar_mult(k, point):
+    """Returns k * point, with the comb table for the base point and wNAF for any other point.
+    The point is checked once here, the arithmetic in between works on Jacobian coordinates."""
+    assert is_on_curve(point)
+
+    k %= curve.n
+    if k == 0 or point is None:
         return None
 
-    if x1 == x2:
-        # This is the case point1 == point2.
-        m = (3 * x1 * x1 + curve.a) * inverse_mod(2 * y1, curve.p)
-    else:
-        # This is the case point1 != point2.
-        m = (y1 - y2) * inverse_mod(x1 - x2, curve.p)
+    if point == curve.g:
+        return _to_affine(_comb_mult(k))
+    return _to_affine(_wnaf_mult(k, point))
 
-    x3 = m * m - x1 - x2
-    y3 = y1 + m * (x3 - x1)
-    result = (x3 % curve.p, -y3 % curve.p)
 
-    assert is_on_curve(result)
+# Jacobian coordinates ########################################################
+# (X, Y, Z) is the affine point (X / Z^2, Y / Z^3), Z = 0 is the point at infinity.
+# Doubling is dbl-2009-l and addition is a mixed addition with an affine point, both for a = 0.
 
-    return result
+WNAF_WIDTH = 5
+COMB_TEETH = 8
+COMB_SPACING = -(-curve.n.bit_length() // COMB_TEETH)
 
+_INFINITY = (1, 1, 0)
 
-def scalar_mult(k, point):
-    """Returns k * point computed using the double and point_add algorithm."""
-    assert is_on_curve(point)
 
-    if k % curve.n == 0 or point is None:
-        return None
+def _jacobian_double(point):
+    x, y, z = point
+    if z == 0 or y == 0:
+        return _INFINITY
+    p = curve.p
+    a = x * x % p
+    b = y * y % p
+    c = b * b % p
+    d = 2 * ((x + b) * (x + b) - a - c) % p
+    e = 3 * a % p
+    x3 = (e * e - 2 * d) % p
+    y3 = (e * (d - x3) - 8 * c) % p
+    z3 = 2 * y * z % p
+    return (x3, y3, z3)
 
-    if k < 0:
-        # k * point = -k * (-point)
-        return scalar_mult(-k, point_neg(point))
 
-    result = None
-    addend = point
+def _jacobian_add_affine(point1, point2):
+    x1, y1, z1 = point1
+    x2, y2 = point2
+    if z1 == 0:
+        return (x2, y2, 1)
+    p = curve.p
+    z1z1 = z1 * z1 % p
+    h = (x2 * z1z1 - x1) % p
+    r = (y2 * z1 * z1z1 - y1) % p
+    if h == 0:
+        # point1 == point2 or point1 == -point2
+        return _jacobian_double(point1) if r == 0 else _INFINITY
+    hh = h * h % p
+    hhh = h * hh % p
+    v = x1 * hh % p
+    x3 = (r * r - hhh - 2 * v) % p
+    y3 = (r * (v - x3) - y1 * hhh) % p
+    return (x3, y3, z1 * h % p)
+
+
+def _to_affine(point):
+    x, y, z = point
+    if z == 0:
+        return None
+    z_inv = inverse_mod(z, curve.p)
+    z_inv2 = z_inv * z_inv % curve.p
+    return (x * z_inv2 % curve.p, y * z_inv2 * z_inv % curve.p)
+
+
+def _batch_to_affine(points):
+    """Normalizes many finite points with a single inversion."""
+    p = curve.p
+    result = []
+    for (x, y, _), z_inv in zip(points, batch_inverse_mod([z for _, _, z in points], p)):
+        z_inv2 = z_inv * z_inv % p
+        result.append((x * z_inv2 % p, y * z_inv2 * z_inv % p))
+    return result
 
+
+def _wnaf(k, width=WNAF_WIDTH):
+    """Returns the width-w non adjacent form of k, least significant digit first."""
+    digits = []
     while k:
+        digit = 0
         if k & 1:
-            # Add.
-            result = point_add(result, addend)
-
-        # Double.
-        addend = point_add(addend, addend)
-
+            digit = k & ((1 << width) - 1)
+            if digit >= 1 << (width - 1):
+                digit -= 1 << width
+            k -= digit
+        digits.append(digit)
         k >>= 1
+    return digits
+
+
+def _wnaf_mult(k, point, width=WNAF_WIDTH):
+    # odd multiples point, 3 point, ..., (2^(width-1) - 1) point, in affine coordinates for the mixed additions
+    twice = _to_affine(_jacobian_double((point[0], point[1], 1)))
+    odd = [(point[0], point[1], 1)]
+    for _ in range((1 << (width - 2)) - 1):
+        odd.append(_jacobian_add_affine(odd[-1], twice))
+    # an odd multiple smaller than the order is never the point at infinity
+    odd = _batch_to_affine(odd)
+
+    result = _INFINITY
+    for digit in reversed(_wnaf(k, width)):
+        result = _jacobian_double(result)
+        if digit > 0:
+            result = _jacobian_add_affine(result, odd[digit >> 1])
+        elif digit < 0:
+            x, y = odd[-digit >> 1]
+            result = _jacobian_add_affine(result, (x, -y % curve.p))
+    return result
 
-    assert is_on_curve(result)
 
-    return result
\ No newline at end of file
+_comb_table = []
+
+
+def _comb_mult(k):
+    # table[i] = sum of 2^(j * COMB_SPACING) g over the bits j of i, built at the first use
+    if not _comb_table:
+        teeth = [(curve.g[0], curve.g[1], 1)]
+        for _ in range(COMB_TEETH - 1):
+            tooth = teeth[-1]
+            for _ in range(COMB_SPACING):
+                tooth = _jacobian_double(tooth)
+            teeth.append(tooth)
+        teeth = _batch_to_affine(teeth)
+        table = [_INFINITY]
+        for i in range(1, 1 << COMB_TEETH):
+            top = i.bit_length() - 1
+            table.append(_jacobian_add_affine(table[i ^ (1 << top)], teeth[top]))
+        _comb_table.extend([None] + _batch_to_affine(table[1:]))
+
+    result = _INFINITY
+    for i in range(COMB_SPACING - 1, -1, -1):
+        result = _jacobian_double(result)
+        index = 0
+        for j in range(COMB_TEETH):
+            index |= ((k >> (i + j * COMB_SPACING)) & 1) << j
+        if index:
+            result = _jacobian_add_affine(result, _comb_table[index])
+    return result
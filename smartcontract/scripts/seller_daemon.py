@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import asyncio
+import collections
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import click
+from ape import chain, project
+from ape.cli import ConnectedProviderCommand, account_option
+from .util import append_to_csv
+from .contract_management import generate_keys, get_DH_key_sec256, otp_message
+
+PlacedBid = collections.namedtuple('PlacedBid', 'token_id bidder publickey amount block_number log_index')
+AcceptedBid = collections.namedtuple('AcceptedBid', 'token_id bidder enc_keys txn_hash')
+
+
+def encrypt_keys(jobs):
+    """
+    Compute the encrypted Ciminion keys of a chunk of bids, as done by hand in deploy_ppnft.py:
+    get_DH_key_sec256 -> generate_keys -> otp_message
+    :param jobs: list of (token_id, seller private key, bidder public key, ciminion keys)
+    :return: list of (token_id, encrypted keys)
+    """
+    return [(token_id, otp_message(generate_keys(get_DH_key_sec256(private_key, publickey)), ciminion_keys))
+            for token_id, private_key, publickey, ciminion_keys in jobs]
+
+
+def load_seller_keys(keys_path):
+    """
+    Load the secrets of the tokens on sale
+    :param keys_path: json file {"<token id>": {"private_key": ..., "ciminion_keys": [k0, k1, k2]}}
+    :return: dictionary from the token id to (private key, ciminion keys)
+    """
+    with open(keys_path, 'r') as keys_file:
+        keys = json.load(keys_file)
+    return {int(token_id): (int(entry['private_key']), [int(key) for key in entry['ciminion_keys']])
+            for token_id, entry in keys.items()}
+
+
+class NonceManager(object):
+    """
+    Nonces of the seller account: a nonce is consumed only when its transaction reaches the node, so a transaction
+    that fails before being sent (e.g. reverted in the gas estimation) leaves no gap that stalls the following ones
+    """
+
+    def __init__(self, account):
+        self.account = account
+        self.web3 = chain.provider.web3
+        self.sync()
+
+    def sync(self):
+        self.next_nonce = self.web3.eth.get_transaction_count(self.account.address, 'pending')
+
+    def send(self, contract, bid, enc_keys):
+        """
+        Sign and send accept_bid without waiting for its receipt, it reverts if the bid is not the highest anymore
+        :return: hash of the transaction
+        """
+        for attempt in range(2):
+            txn = contract.accept_bid.as_transaction(bid.token_id, enc_keys, bid.publickey, sender=self.account,
+                                                     nonce=self.next_nonce)
+            signed = self.account.sign_transaction(txn)
+            try:
+                txn_hash = self.web3.eth.send_raw_transaction(signed.serialize_transaction())
+            except Exception as e:
+                # the account was used by someone else meanwhile
+                if attempt or 'nonce' not in str(e).lower():
+                    raise
+                self.sync()
+                continue
+            self.next_nonce += 1
+            return txn_hash
+
+
+class SellerDaemon(object):
+    """
+    Accept the bids placed on the tokens of a seller: the BidPlaced events are polled from the chain, the pending
+    bids are collected for --batch-interval seconds, their keys are encrypted in parallel processes and the
+    accept_bid transactions are sent back to back with consecutive nonces, then their receipts are awaited together
+    """
+
+    def __init__(self, contract, account, seller_keys, workers=None, batch_interval=0.5, poll_interval=0.5):
+        self.contract = contract
+        self.account = account
+        self.seller_keys = seller_keys
+        self.workers = workers or os.cpu_count()
+        self.batch_interval = batch_interval
+        self.poll_interval = poll_interval
+        self.latest = {}
+        self.accepted = []
+        self.sold = set()
+        self.failed = {}
+        self.started = None
+        self.finished = None
+        self.pending = asyncio.Queue()
+        # web3 calls of the watcher and of the sender run in one thread, the receipts are awaited in the others
+        self.chain_executor = ThreadPoolExecutor(max_workers=1)
+        self.receipt_executor = ThreadPoolExecutor(max_workers=8)
+        self.nonces = None
+
+    def fetch_bids(self, start_block):
+        head = chain.blocks.head.number
+        if head < start_block:
+            return [], start_block
+        logs = self.contract.BidPlaced.range(start_block, head + 1)
+        return [PlacedBid(log.tokenId, log.bidder, [int(x) for x in log.publickey], log.amount, log.block_number,
+                          log.log_index) for log in logs], head + 1
+
+    async def watch(self, start_block):
+        """
+        Poll the BidPlaced events from start_block, only the highest (latest) bid of each token is kept
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            bids, start_block = await loop.run_in_executor(self.chain_executor, self.fetch_bids, start_block)
+            for bid in bids:
+                if bid.token_id not in self.seller_keys or bid.token_id in self.sold:
+                    continue
+                # accept_bid of the previous bid reverted because of this one
+                self.failed.pop(bid.token_id, None)
+                if bid.token_id not in self.latest:
+                    self.pending.put_nowait(bid.token_id)
+                self.latest[bid.token_id] = bid
+            await asyncio.sleep(self.poll_interval)
+
+    async def next_batch(self):
+        """
+        :return: the tokens with a pending bid, the ones received in batch_interval seconds after the first one
+        """
+        tokens = {await self.pending.get()}
+        if self.started is None:
+            self.started = time.perf_counter()
+        await asyncio.sleep(self.batch_interval)
+        while not self.pending.empty():
+            tokens.add(self.pending.get_nowait())
+        return sorted(tokens)
+
+    def send_batch(self, bids, enc_keys):
+        hashes = {}
+        for bid in bids:
+            try:
+                hashes[bid.token_id] = self.nonces.send(self.contract, bid, enc_keys[bid.token_id])
+            except Exception as e:
+                self.failed[bid.token_id] = str(e)
+        return hashes
+
+    def wait_receipt(self, txn_hash):
+        return chain.provider.web3.eth.wait_for_transaction_receipt(txn_hash).status
+
+    async def process(self, pool, max_bids=None):
+        """
+        Encrypt the keys and accept the bids of the pending tokens, batch after batch
+        """
+        loop = asyncio.get_running_loop()
+        self.nonces = await loop.run_in_executor(self.chain_executor, NonceManager, self.account)
+        while True:
+            if max_bids is not None and len(self.accepted) + len(self.failed) >= max_bids:
+                # an accept_bid reverted by a higher bid is tried again when the event of that bid is read
+                await asyncio.sleep(2 * self.poll_interval)
+                if self.pending.empty():
+                    break
+            bids = [self.latest.pop(token_id) for token_id in await self.next_batch()]
+            jobs = [(bid.token_id, self.seller_keys[bid.token_id][0], bid.publickey, self.seller_keys[bid.token_id][1])
+                    for bid in bids]
+            chunk = -(-len(jobs) // self.workers)
+            chunks = await asyncio.gather(*(loop.run_in_executor(pool, encrypt_keys, jobs[i:i + chunk])
+                                            for i in range(0, len(jobs), chunk)))
+            enc_keys = dict(pair for result in chunks for pair in result)
+
+            # a higher bid arrived while the keys were encrypted: its token was queued again by the watcher
+            bids = [bid for bid in bids if bid.token_id not in self.latest]
+
+            hashes = await loop.run_in_executor(self.chain_executor, self.send_batch, bids, enc_keys)
+            sent = [bid for bid in bids if bid.token_id in hashes]
+            statuses = await asyncio.gather(*(loop.run_in_executor(self.receipt_executor, self.wait_receipt,
+                                                                   hashes[bid.token_id]) for bid in sent))
+            for bid, status in zip(sent, statuses):
+                txn_hash = hashes[bid.token_id].hex()
+                if status == 1:
+                    self.accepted.append(AcceptedBid(bid.token_id, bid.bidder, enc_keys[bid.token_id], txn_hash))
+                    self.sold.add(bid.token_id)
+                else:
+                    self.failed[bid.token_id] = f'transaction {txn_hash} reverted'
+            self.finished = time.perf_counter()
+
+    async def run(self, start_block, max_bids=None, report_interval=10):
+        """
+        Run the watcher and the processing until max_bids bids are accepted (or failed), forever if None
+        :return: tuple with the accepted bids and the time from the first bid received to the last one accepted
+        """
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            watcher = asyncio.create_task(self.watch(start_block))
+            processor = asyncio.create_task(self.process(pool, max_bids))
+            while not processor.done():
+                done, _ = await asyncio.wait([processor, watcher], timeout=report_interval,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if watcher in done:
+                    processor.cancel()
+                    watcher.result()
+                if self.started is not None and not processor.done():
+                    print(f'{len(self.accepted)} bids accepted, {len(self.failed)} failed, '
+                          f'{len(self.accepted) / (time.perf_counter() - self.started):.2f} bids/s')
+            watcher.cancel()
+            processor.result()
+        self.chain_executor.shutdown()
+        self.receipt_executor.shutdown()
+        if self.finished is None:
+            return self.accepted, 0
+        return self.accepted, self.finished - self.started
+
+
+@click.command(cls=ConnectedProviderCommand)
+@account_option()
+@click.option('--contract', 'address', required=True, help='address of the PrivacyPreservingNFT contract')
+@click.option('--keys', 'keys_path', required=True, help='json file with the secp256k1 private key and the ciminion '
+                                                         'keys of each token on sale')
+@click.option('--start-block', type=int, help='first block to read the bids from, the head of the chain as default')
+@click.option('--workers', type=int, help='processes that encrypt the keys, the number of cores as default')
+@click.option('--batch-interval', type=float, default=0.5, help='seconds to collect the bids of a batch')
+@click.option('--poll-interval', type=float, default=0.5, help='seconds between two reads of the events')
+@click.option('--max-bids', type=int, help='stop after this number of bids, run forever as default')
+@click.option('--csv', 'csv_path', help='append the results to this csv file')
+def cli(account, address, keys_path, start_block, workers, batch_interval, poll_interval, max_bids, csv_path):
+    contract = project.PrivacyPreservingNFT.at(address)
+    daemon = SellerDaemon(contract, account, load_seller_keys(keys_path), workers, batch_interval, poll_interval)
+    start_block = chain.blocks.head.number if start_block is None else start_block
+    accepted, elapsed = asyncio.run(daemon.run(start_block, max_bids))
+    for token_id, error in daemon.failed.items():
+        print(f'Token {token_id} not accepted: {error}')
+    if elapsed:
+        print(f'{len(accepted)} bids accepted in {elapsed:.2f} s, {len(accepted) / elapsed:.2f} bids/s')
+        if csv_path is not None:
+            append_to_csv({'BIDS': len(accepted), 'FAILED': len(daemon.failed), 'WORKERS': daemon.workers,
+                           'TIME': elapsed, 'BIDS_S': len(accepted) / elapsed}, csv_path)
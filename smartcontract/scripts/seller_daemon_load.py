@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import asyncio
+import random
+import click
+from ape import accounts, chain, project
+from ape.cli import ConnectedProviderCommand
+from .util import append_to_csv
+from .contract_management import generate_keypair_sec256, generate_keys, get_DH_key_sec256, otp_message
+from .seller_daemon import SellerDaemon
+
+
+@click.command(cls=ConnectedProviderCommand)
+@click.option('--tokens', type=int, default=20, help='number of tokens minted to the seller')
+@click.option('--bids-per-token', type=int, default=2, help='increasing bids placed on each token')
+@click.option('--workers', type=int, help='processes that encrypt the keys, the number of cores as default')
+@click.option('--batch-interval', type=float, default=0.5, help='seconds to collect the bids of a batch')
+@click.option('--csv', 'csv_path', help='append the results to this csv file')
+def cli(tokens, bids_per_token, workers, batch_interval, csv_path):
+    """
+    Deploy the contracts on a local node (hardhat or anvil), mint --tokens tokens to the first test account, place the
+    bids from the other test accounts, then accept all of them with the seller daemon and check that each token went to
+    its highest bidder with keys that the bidder decrypts
+    """
+    seller, bidders = accounts.test_accounts[0], accounts.test_accounts[1:]
+    poseidon = project.PoseidonT4.deploy(sender=seller)
+    secp = project.Secp256k1.deploy(sender=seller)
+    contract = project.PrivacyPreservingNFT.deploy(poseidon, secp, sender=seller)
+    start_block = chain.blocks.head.number
+
+    seller_keys, bids = {}, {}
+    for _ in range(tokens):
+        publickey, private_key = generate_keypair_sec256()
+        ciminion_keys = [random.getrandbits(253) for _ in range(3)]
+        token_id = contract.token_ID()
+        contract.mint_token(seller, 'https://prova.com', publickey, random.getrandbits(253), sender=seller)
+        seller_keys[token_id] = (private_key, ciminion_keys)
+        for amount in range(1, bids_per_token + 1):
+            bidder = bidders[(token_id * bids_per_token + amount) % len(bidders)]
+            bidder_publickey, bidder_private_key = generate_keypair_sec256()
+            contract.place_bid(token_id, bidder_publickey, sender=bidder, value=amount * 10 ** 9)
+            bids[token_id] = (bidder.address, bidder_private_key, publickey)
+    print(f'{tokens} tokens minted and {tokens * bids_per_token} bids placed')
+
+    daemon = SellerDaemon(contract, seller, seller_keys, workers, batch_interval)
+    accepted, elapsed = asyncio.run(daemon.run(start_block, max_bids=tokens))
+    assert not daemon.failed, f'bids not accepted: {daemon.failed}'
+    for token_id, bidder, enc_keys, _ in accepted:
+        bidder_address, bidder_private_key, publickey = bids[token_id]
+        assert bidder == bidder_address and contract.ownerOf(token_id) == bidder_address, \
+            f'token {token_id} not sold to its highest bidder'
+        keys = otp_message(generate_keys(get_DH_key_sec256(bidder_private_key, publickey)), enc_keys)
+        assert keys == seller_keys[token_id][1], f'the bidder of token {token_id} decrypts different keys'
+
+    print(f'{len(accepted)} bids accepted and decrypted by their bidders in {elapsed:.2f} s, '
+          f'{len(accepted) / elapsed:.2f} bids/s')
+    if csv_path is not None:
+        append_to_csv({'TOKENS': tokens, 'BIDS_PER_TOKEN': bids_per_token, 'WORKERS': daemon.workers,
+                       'TIME': elapsed, 'BIDS_S': len(accepted) / elapsed}, csv_path)
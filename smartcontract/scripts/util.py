@@ -58,9 +58,9 @@ def place_bid(contract, bidder_pk, bidder_eth, NFT_ID, bid):
         print("Transaction failed.")
     return gas_cost
 
-def accept_bid(contract, enc_keys, seller_eth, NFT_ID):
-    gas_cost = contract.accept_bid.estimate_gas_cost(NFT_ID, enc_keys, sender=seller_eth)
-    tx_receipt = contract.accept_bid(NFT_ID, enc_keys, sender=seller_eth)
+def accept_bid(contract, enc_keys, seller_eth, NFT_ID, bidder_pk):
+    gas_cost = contract.accept_bid.estimate_gas_cost(NFT_ID, enc_keys, bidder_pk, sender=seller_eth)
+    tx_receipt = contract.accept_bid(NFT_ID, enc_keys, bidder_pk, sender=seller_eth)
 
     # Check the status of the transaction
     if tx_receipt.status == 1: